@@ -3,64 +3,189 @@ This script applies MiniBatchKMeans clustering to GNSS (latitude, longitude) dat
 from multiple preprocessed CSV files. It calculates cluster groupings and average
 quality metrics per cluster, then saves the results to separate output files.
 
-Steps:
-1. Load each CSV file from the input folder.
-2. Perform clustering with MiniBatchKMeans (k=3000, batch size=32768).
-3. Append cluster labels to the original data.
-4. Compute average values for each cluster group.
-5. Save the result to individual CSV files.
+Steps (CLUSTER_MODE = 'per_file', one model per file):
+1. Load each CSV file from the input folder (N_WORKERS > 1: files are processed in parallel worker processes).
+2. Perform clustering with MiniBatchKMeans (default k=3000, batch size=32768).
+3. Take the cluster label of every point.
+4. Compute count, mean, std and quality percentiles for each cluster group (cluster_sketch.py).
+5. Save the result to individual CSV files named after the input file, and the fitted
+   centroids with version metadata to 'models/<input name>' in the artifact folder
+   (see centroid_model.py).
+
+Steps (CLUSTER_MODE = 'global', one model for all files, bounded memory):
+1. Stream all files once and keep a uniform random sample of the points; seed the
+   centroids with k-means++ on that sample, so they cover every file.
+2. Stream all files in chunks (N_EPOCHS times) and update one model with partial_fit
+   on shuffled mini-batches of BATCH_SIZE points.
+3. Stream every file again (in N_WORKERS worker processes), assign labels with the
+   global codebook, write the labelled points and the per-cluster sketch of every file
+   (count, sums, min/max, quality histogram; 'sketches' subfolder) to the artifact folder.
+4. Merge the sketches of all files and save the global per-cluster statistics and the
+   global centroid model ('model_global' in the artifact folder), which assign_clusters.py
+   uses to label new files.
+Cluster IDs then refer to the same location in every file.
+
+The output folder only receives the per-cluster statistics tables (the input of the merge
+step); models, label files and sketches go to the artifact folder (GNSS_CLUSTER_ARTIFACTS_DIR).
 """
 
 import pandas as pd
 import time
-from joblib import parallel_backend  # For multiprocessing
+from threadpoolctl import threadpool_limits  # Avoid thread oversubscription inside worker processes
+from concurrent.futures import ProcessPoolExecutor  # One worker process per file
 import numpy as np
 import glob  # For automatic file handling
 import os
-from sklearn.cluster import MiniBatchKMeans  # For clustering
+import sys
+from sklearn.cluster import MiniBatchKMeans, kmeans_plusplus  # For clustering
 
-start = time.time()  # Start timing
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_preprocessing'))
+from tuda_schema import read_preprocessed_csv  # Compact typed schema (float32 coordinates)
+from point_sample import iter_chunks, sample_points  # Chunked reading and streaming bottom-k sample
+from cluster_sketch import build_sketch, merge_sketches, summarize, write_sketch  # Mergeable per-cluster statistics
+from centroid_model import CentroidModel  # Persisted centroids with KD-tree assignment
 
-# Input folder (preprocessed longterm data) and output folder (result)
-file_pathr = r"E:\MLA(GROUP WORK)\Data\Longterm_preprocessed\*.csv"
-file_pathw = r"E:\MLA(GROUP WORK)\Data\GNSS"
+# Input folder (preprocessed longterm data) and output folder (result); environment variables override them
+file_pathr = os.environ.get('GNSS_PREPROCESSED_GLOB', r"E:\MLA(GROUP WORK)\Data\Longterm_preprocessed\*.csv")
+file_pathw = os.environ.get('GNSS_CLUSTERED_DIR', r"E:\MLA(GROUP WORK)\Data\GNSS")
+# Models, labelled points and sketches (kept apart from the per-cluster tables in file_pathw)
+file_patha = os.environ.get('GNSS_CLUSTER_ARTIFACTS_DIR', r"E:\MLA(GROUP WORK)\Data\GNSS_artifacts")
 
-# Get list of input CSV file paths
-csv_listr = glob.glob(file_pathr)
+# Clustering parameters
+N_CLUSTERS = int(os.environ.get('N_CLUSTERS', 3000))
+BATCH_SIZE = int(os.environ.get('BATCH_SIZE', 32768))
 
-# Process each file in the list
-for i in range(len(csv_listr)):
-    with open(csv_listr[i]) as r:
-        data = pd.read_csv(r)  # Load CSV
+# 'per_file': separate model per file; 'global': one streamed model for all files
+CLUSTER_MODE = os.environ.get('CLUSTER_MODE', 'per_file')
+CHUNK_ROWS = 1_000_000  # Rows read at a time in global mode (bounds the memory use)
+N_EPOCHS = 3  # Passes over all files with partial_fit in global mode
+INIT_SAMPLE = 20 * N_CLUSTERS  # Size of the random sample used to seed the centroids
 
-        # Extract only the latitude and longitude columns
-        x = data.iloc[:, :2]
+# Output names of the value columns (as expected by the merge step)
+OUTPUT_COLUMNS = {'lat': 'latitude', 'lon': 'longitude', 'quality': 'signal_quality'}
 
-        # Parallel processing context
-        with parallel_backend('threading', n_jobs=-1):
-            mod = MiniBatchKMeans(n_clusters=3000, batch_size=32768, random_state=42)
-            y_pre = mod.fit_predict(x)
+# Number of files clustered in parallel (default 1 = serial: every worker holds a whole file in per-file mode);
+# each worker gets an equal share of the CPU threads
+N_WORKERS = int(os.environ.get('N_WORKERS', 1))
 
-    end = time.time()
-    print(f"[File {i+1}] run time = {end - start:.2f} seconds")
 
-    # Count points in each cluster
-    r1 = pd.Series(mod.labels_).value_counts()
+# Cluster one preprocessed file and write its per-cluster means; output name comes from the input name
+def cluster_file(csv_path):
+    start = time.time()
+    name = os.path.splitext(os.path.basename(csv_path))[0]
 
-    # Get cluster centers
-    r2 = pd.DataFrame(mod.cluster_centers_)
+    data = read_preprocessed_csv(csv_path)  # Load CSV
 
-    # Combine center coordinates and cluster counts
-    r = pd.concat([r2, r1], axis=1)
-    r.columns = ['lat', 'lon', 'n']
+    # Extract only the latitude and longitude columns
+    x = data.iloc[:, :2]
 
-    # Assign cluster labels to the original data
-    labels = pd.DataFrame(mod.labels_, index=data.index, columns=['group'])
-    Final_data = pd.concat([data, labels], axis=1)
+    # Native threads (BLAS/OpenMP) limited to this worker's share of the cores
+    with threadpool_limits(limits=max(1, os.cpu_count() // N_WORKERS)):
+        mod = MiniBatchKMeans(n_clusters=N_CLUSTERS, batch_size=BATCH_SIZE, random_state=42)
+        mod.fit(x)
+
+    end = time.time()
+    print(f"[{name}] run time = {end - start:.2f} seconds")
 
-    # Calculate mean values per group
-    quality_mean = Final_data.groupby(['group']).agg([np.mean])
+    # Statistics per group straight from the labels (no labelled copy of the data)
+    values = data.iloc[:, :3].rename(columns=OUTPUT_COLUMNS)
+    sketch = build_sketch(mod.labels_, values, quantile_column='signal_quality')
+    quality_mean = summarize(sketch, list(OUTPUT_COLUMNS.values()), quantile_column='signal_quality')
 
     # Save to individual CSV file
-    output_filename = f"GNSS_minibatch_k=3000_batchsize=32768_file{i+1}.csv"
+    output_filename = f"GNSS_minibatch_k={N_CLUSTERS}_batchsize={BATCH_SIZE}_{name}.csv"
+    quality_mean.to_csv(os.path.join(file_pathw, output_filename), index=None)
+
+    # Save the centroids, so new data can be labelled without refitting
+    model = CentroidModel.from_kmeans(mod, sources=[csv_path], n_points=len(data))
+    model.save(os.path.join(file_patha, 'models', name))
+    return output_filename
+
+
+# Fit one MiniBatchKMeans model on all files with partial_fit
+def fit_global(csv_list):
+    rng = np.random.default_rng(42)
+    sample = sample_points(csv_list, INIT_SAMPLE, rng, CHUNK_ROWS)
+    if len(sample) < N_CLUSTERS:
+        raise ValueError(f"{len(sample)} points in all files, fewer than N_CLUSTERS={N_CLUSTERS}")
+    centers, _ = kmeans_plusplus(sample, n_clusters=N_CLUSTERS, random_state=42)
+    mod = MiniBatchKMeans(n_clusters=N_CLUSTERS, batch_size=BATCH_SIZE, init=centers, n_init=1, random_state=42)
+
+    # The first partial_fit needs at least N_CLUSTERS points: small batches are buffered until then
+    pending = []
+    for epoch in range(N_EPOCHS):
+        start = time.time()
+        for csv_path in csv_list:
+            for chunk in iter_chunks(csv_path, CHUNK_ROWS):
+                x = chunk.iloc[:, :2].to_numpy()
+                x = x[rng.permutation(len(x))]  # Shuffle: consecutive rows come from the same wagon and area
+                for i in range(0, len(x), BATCH_SIZE):
+                    batch = x[i:i + BATCH_SIZE]
+                    if not hasattr(mod, 'cluster_centers_'):
+                        pending.append(batch)
+                        if sum(len(b) for b in pending) < N_CLUSTERS:
+                            continue
+                        batch = np.concatenate(pending)
+                        pending = []
+                    mod.partial_fit(batch)
+        print(f"[epoch {epoch + 1}] run time = {time.time() - start:.2f} seconds")
+    return mod
+
+
+# Label one file with the global codebook; writes and returns the per-cluster sketch of the file
+def label_file(csv_path, mod):
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    output_file = os.path.join(file_patha, f"GNSS_minibatch_global_labels_{name}.csv")
+    sketches = []
+    first = True
+    with threadpool_limits(limits=max(1, os.cpu_count() // N_WORKERS)):
+        for chunk in iter_chunks(csv_path, CHUNK_ROWS):
+            labels = mod.predict(chunk.iloc[:, :2].to_numpy())
+            sketches.append(build_sketch(labels, chunk.rename(columns=OUTPUT_COLUMNS),
+                                         quantile_column='signal_quality'))
+            chunk.assign(group=labels).to_csv(output_file, mode='w' if first else 'a', header=first, index=None)
+            first = False
+    sketch = merge_sketches(sketches)
+    write_sketch(sketch, os.path.join(file_patha, 'sketches', f"GNSS_minibatch_global_sketch_{name}.csv"))
+    print(f"[{name}] labelled")
+    return sketch
+
+
+# Global mode: one model for all files, then labels and per-cluster means in a streaming pass
+def cluster_global(csv_list):
+    start = time.time()
+    mod = fit_global(csv_list)
+
+    # Labelling pass, one sketch per file
+    os.makedirs(os.path.join(file_patha, 'sketches'), exist_ok=True)
+    if N_WORKERS > 1:
+        with ProcessPoolExecutor(max_workers=N_WORKERS) as pool:
+            sketches = list(pool.map(label_file, csv_list, [mod] * len(csv_list)))
+    else:
+        sketches = [label_file(csv_path, mod) for csv_path in csv_list]
+
+    # Statistics per cluster over the whole dataset (clusters without points are left out)
+    sketch = merge_sketches(sketches)
+    quality_mean = summarize(sketch, list(OUTPUT_COLUMNS.values()), quantile_column='signal_quality')
+    output_filename = f"GNSS_minibatch_global_k={N_CLUSTERS}_batchsize={BATCH_SIZE}.csv"
     quality_mean.to_csv(os.path.join(file_pathw, output_filename), index=None)
+
+    model = CentroidModel.from_kmeans(mod, sources=csv_list, n_points=int(sketch['n'].sum()), n_epochs=N_EPOCHS)
+    model.save(os.path.join(file_patha, 'model_global'))
+    print(f"[global] run time = {time.time() - start:.2f} seconds")
+    return output_filename
+
+
+if __name__ == '__main__':
+    # Get list of input CSV file paths (sorted so every run processes them in the same order)
+    csv_listr = sorted(glob.glob(file_pathr))
+
+    # Process each file in the list
+    if CLUSTER_MODE == 'global':
+        cluster_global(csv_listr)
+    elif N_WORKERS > 1:
+        with ProcessPoolExecutor(max_workers=N_WORKERS) as pool:
+            list(pool.map(cluster_file, csv_listr))
+    else:
+        for i in range(len(csv_listr)):
+            cluster_file(csv_listr[i])
@@ -0,0 +1,79 @@
+"""
+This script bins the preprocessed GNSS (lat, lon, quality) points into equal-area
+grid cells and averages the signal quality per cell. It is a fast alternative to
+the k-means scripts: every point is assigned to its cell in one vectorized pass
+instead of iterating over thousands of centroids.
+
+Steps:
+1. Read each preprocessed CSV file in chunks (serially, or in N_WORKERS worker processes).
+2. Sum count, coordinates and quality per cell of CELL_SIZE_M metres (level 0).
+3. Save the mean position and quality per cell to an individual CSV file named after
+   the input file (same columns as the clustering output, so the merge step can read it).
+4. Add up the cell sums of all files and save the global per-cell means of level 0 and
+   of N_LEVELS - 1 coarser levels (2x, 4x, ... the cell size) to the 'levels' subfolder.
+"""
+
+import pandas as pd
+import time
+import glob  # For automatic file handling
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor  # One worker process per file
+
+import spatial_binning  # Equal-area multi-resolution grid
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_preprocessing'))
+from tuda_schema import PREPROCESSED_DTYPES  # Compact typed schema (float32 coordinates)
+
+# Input folder (preprocessed longterm data) and output folder (result); environment variables override them
+file_pathr = os.environ.get('GNSS_PREPROCESSED_GLOB', r"E:\MLA(GROUP WORK)\Data\Longterm_preprocessed\*.csv")
+file_pathw = os.environ.get('GNSS_CLUSTERED_DIR', r"E:\MLA(GROUP WORK)\Data\GNSS")
+
+# Grid parameters
+CELL_SIZE_M = float(os.environ.get('CELL_SIZE_M', 1000))  # Cell width of level 0 in metres
+N_LEVELS = int(os.environ.get('N_LEVELS', 4))  # Number of resolutions in the global output
+CHUNK_ROWS = 1_000_000  # Rows read at a time
+
+# Number of files binned in parallel (default 1 = serial)
+N_WORKERS = int(os.environ.get('N_WORKERS', 1))
+
+
+# Bin one preprocessed file, write its per-cell means and return its per-cell sums
+def bin_file(csv_path):
+    start = time.time()
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+
+    sums = []
+    for chunk in pd.read_csv(csv_path, chunksize=CHUNK_ROWS, dtype=PREPROCESSED_DTYPES):
+        sums.append(spatial_binning.bin_points(chunk.iloc[:, 0], chunk.iloc[:, 1], chunk.iloc[:, 2],
+                                               cell_size_m=CELL_SIZE_M))
+    sums = spatial_binning.combine(sums)
+
+    output_filename = f"GNSS_grid_cell={CELL_SIZE_M:g}m_{name}.csv"
+    spatial_binning.cell_means(sums).to_csv(os.path.join(file_pathw, output_filename), index=None)
+    print(f"[{name}] {len(sums)} cells, run time = {time.time() - start:.2f} seconds")
+    return sums
+
+
+if __name__ == '__main__':
+    # Get list of input CSV file paths (sorted so every run processes them in the same order)
+    csv_listr = sorted(glob.glob(file_pathr))
+
+    # Process each file in the list
+    if N_WORKERS > 1:
+        with ProcessPoolExecutor(max_workers=N_WORKERS) as pool:
+            file_sums = list(pool.map(bin_file, csv_listr))
+    else:
+        file_sums = [bin_file(csv_listr[i]) for i in range(len(csv_listr))]
+
+    # Global per-cell means at every resolution, each computed from the sums of the previous one
+    levels_dir = os.path.join(file_pathw, 'levels')
+    os.makedirs(levels_dir, exist_ok=True)
+    sums = spatial_binning.combine(file_sums)
+    for level in range(N_LEVELS):
+        if level > 0:
+            sums = spatial_binning.coarsen(sums)
+        size = CELL_SIZE_M * 2 ** level
+        spatial_binning.cell_means(sums).to_csv(os.path.join(levels_dir, f"GNSS_grid_cell={size:g}m.csv"),
+                                                index=None)
+        print(f"[level {level}] {len(sums)} cells of {size:g} m")
@@ -6,25 +6,39 @@ signal quality per cluster.
 Steps:
 1. Load preprocessed CSV containing GPS and signal quality data.
 2. Drop irrelevant columns and extract latitude/longitude features.
-3. Run KMeans clustering (2000 clusters).
-4. Append cluster labels back to the original data.
-5. Compute average quality metrics for each cluster and save to CSV.
+3. Run KMeans clustering (2000 clusters). KMEANS_MODE 'warm_start' seeds the centroids
+   from a stratified subsample and refines them on all points (kmeans_warmstart.py);
+   'full' is the plain KMeans with k-means++ seeding over all points.
+4. Report the Calinski-Harabasz score on a sample of the labelled points.
+5. Compute count, mean, std and quality percentiles for each cluster from the labels
+   (cluster_sketch.py; no labelled copy of the data) and save to CSV.
+6. Save the centroids with version metadata (centroid_model.py), so assign_clusters.py
+   can label new data without refitting.
 """
 
 import matplotlib.pyplot as plt
-from sklearn.datasets._samples_generator import make_blobs
 from sklearn.cluster import KMeans
-from sklearn.metrics import calinski_harabasz_score
 import pandas as pd
 import time
+import os
+import sys
 import numpy as np
 from joblib import parallel_backend
 import gc
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_preprocessing'))
+from tuda_schema import read_preprocessed_csv  # Compact typed schema (float32 coordinates)
+from cluster_sketch import build_sketch, summarize, SIGNAL_QUALITY_EDGES  # Mergeable per-cluster statistics
+from centroid_model import CentroidModel  # Persisted centroids with KD-tree assignment
+from kmeans_warmstart import warm_start_kmeans, sample_score  # Subsample-seeded KMeans
+
+KMEANS_MODE = 'warm_start'  # 'warm_start' or 'full'
+N_CLUSTERS = 2000  # k_sweep.py compares the cost and quality of other values
+
 start = time.time()  # Start timing
 
 # Read preprocessed data, indexed by 'wagon_ID'
-data = pd.read_csv(r"D:\MLAP\PRT2\goodsignalaccel35.csv", index_col='wagon_ID')
+data = read_preprocessed_csv(r"D:\MLAP\PRT2\goodsignalaccel35.csv", index_col='wagon_ID')
 
 # Keep only latitude, longitude, and quality
 data = data.drop(labels=['timestamp_index', 't_measure', 'time_delta', 't_transfer'], axis=1)
@@ -33,23 +47,29 @@ data = data.drop(labels=['timestamp_index', 't_measure', 'time_delta', 't_transf
 x = data.iloc[:, :2]
 
 # Run KMeans clustering with 2000 clusters
-mod = KMeans(n_clusters=2000, random_state=42)
-y_pre = mod.fit_predict(x)
+if KMEANS_MODE == 'warm_start':
+    mod, timings = warm_start_kmeans(x.to_numpy(), n_clusters=N_CLUSTERS, random_state=42)
+    print("seeding {seed:.1f} s on {sample_size} points, refinement {refine:.1f} s ({algorithm})".format(**timings))
+else:
+    mod = KMeans(n_clusters=N_CLUSTERS, random_state=42)
+    mod.fit(x)
+y_pre = mod.labels_
 
 end = time.time()  # End timing
 print("run time = {}".format(end - start))  # Print execution time
+print("Calinski-Harabasz score (sample) = {:.1f}".format(sample_score(x.to_numpy(), y_pre)))
 
 del x
 gc.collect()
 
-# Create DataFrame of cluster labels
-labels = pd.DataFrame(mod.labels_)
-labels.index = data.index
-labels.rename(columns={0: 'group'}, inplace=True)
-
-# Concatenate labels with original data
-Final_data = pd.concat((data, labels), axis=1)
-
-# Compute mean of quality metrics for each cluster and export
-quality_mean = Final_data.groupby(['group']).agg([np.mean])
+# Statistics of quality metrics for each cluster and export
+quality_column = data.columns[2]  # Columns after the drop: latitude, longitude, quality
+# Delay based quality of good_signal_extraction.py: 0-256 histogram
+sketch = build_sketch(mod.labels_, data.reset_index(drop=True), quantile_column=quality_column,
+                      edges=SIGNAL_QUALITY_EDGES)
+quality_mean = summarize(sketch, list(data.columns), quantile_column=quality_column)
 quality_mean.to_csv(r'D:\MLAP\PRT2\2000kmeanstry.csv')
+
+# Save the fitted centroids
+CentroidModel.from_kmeans(mod, sources=[r"D:\MLAP\PRT2\goodsignalaccel35.csv"], n_points=len(data)).save(
+    r'D:\MLAP\PRT2\2000kmeans_model')
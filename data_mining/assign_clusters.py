@@ -0,0 +1,71 @@
+"""
+This script labels new preprocessed GNSS (lat, lon, quality) files with a saved
+centroid model (see centroid_model.py) instead of refitting k-means.
+
+Steps:
+1. Load the centroid model saved by GNSS_MinibatchKmeansClustering.py or GPS_kmeans_cluster.py.
+2. Read each new CSV file in chunks and assign every point to its nearest centroid
+   (KD-tree query, all cores; euclidean in degrees or haversine).
+3. Save the labelled points and the per-cluster statistics of every file (same columns
+   as the clustering output), plus its cluster sketch ('sketches' subfolder, mergeable
+   across files because all files share the model's cluster IDs).
+"""
+
+import pandas as pd
+import time
+import glob  # For automatic file handling
+import os
+import sys
+
+from centroid_model import CentroidModel  # Persisted centroids with KD-tree assignment
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_preprocessing'))
+from tuda_schema import PREPROCESSED_DTYPES  # Compact typed schema (float32 coordinates)
+from cluster_sketch import build_sketch, merge_sketches, summarize, write_sketch  # Mergeable per-cluster statistics
+
+# Saved model, new preprocessed files and output folder; environment variables override them
+model_dir = os.environ.get('CENTROID_MODEL', r"E:\MLA(GROUP WORK)\Data\GNSS_artifacts\model_global")
+file_pathr = os.environ.get('ASSIGN_INPUT_GLOB', r"E:\MLA(GROUP WORK)\Data\Longterm_preprocessed_new\*.csv")
+file_pathw = os.environ.get('ASSIGN_OUTPUT_DIR', r"E:\MLA(GROUP WORK)\Data\GNSS_assigned")
+METRIC = os.environ.get('ASSIGN_METRIC', 'euclidean')  # 'euclidean' (as KMeans) or 'haversine'
+CHUNK_ROWS = 1_000_000  # Rows read at a time
+
+# Output names of the value columns (as expected by the merge step)
+OUTPUT_COLUMNS = {'lat': 'latitude', 'lon': 'longitude', 'quality': 'signal_quality'}
+
+
+# Label one file; writes labelled points, per-cluster statistics and sketch
+def assign_file(csv_path, model):
+    start = time.time()
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    output_file = os.path.join(file_pathw, f"GNSS_assigned_labels_{name}.csv")
+
+    sketches = []
+    n_points = 0
+    first = True
+    for chunk in pd.read_csv(csv_path, chunksize=CHUNK_ROWS, dtype=PREPROCESSED_DTYPES):
+        chunk = chunk.iloc[:, :3]
+        labels = model.assign(chunk.iloc[:, 0], chunk.iloc[:, 1], metric=METRIC)
+        sketches.append(build_sketch(labels, chunk.rename(columns=OUTPUT_COLUMNS), quantile_column='signal_quality'))
+        chunk.assign(group=labels).to_csv(output_file, mode='w' if first else 'a', header=first, index=None)
+        n_points += len(chunk)
+        first = False
+
+    sketch = merge_sketches(sketches)
+    write_sketch(sketch, os.path.join(file_pathw, 'sketches', f"GNSS_assigned_sketch_{name}.csv"))
+    if len(sketch):
+        stats = summarize(sketch, list(OUTPUT_COLUMNS.values()), quantile_column='signal_quality')
+        stats.to_csv(os.path.join(file_pathw, f"GNSS_assigned_{name}.csv"))
+
+    run_time = time.time() - start
+    print(f"[{name}] {n_points} points, run time = {run_time:.2f} seconds ({n_points / max(run_time, 1e-9):.0f} points/s)")
+
+
+if __name__ == '__main__':
+    model = CentroidModel.load(model_dir)
+    print(f"model: {model.metadata['algorithm']}, k={model.metadata['n_clusters']}, centroids {model.fingerprint()[:12]}")
+    os.makedirs(os.path.join(file_pathw, 'sketches'), exist_ok=True)
+
+    # Files are labelled one after the other; every KD-tree query already uses all cores
+    for csv_path in sorted(glob.glob(file_pathr)):
+        assign_file(csv_path, model)
@@ -0,0 +1,120 @@
+"""
+Persisted k-means centroids with fast batch assignment of new GNSS points.
+
+Refitting k-means only to label new daily files against clusters that are
+already known takes hours. A fitted model is saved once as its centroids
+(.npy) next to a JSON header with version metadata (format version, SHA-256 of
+the centroids, algorithm and parameters, library versions, training files). New
+points are labelled with a KD-tree over the centroids instead of a refit.
+
+The header holds no wall-clock time: models are saved into pipeline output
+folders whose content hash decides whether later stages rerun (run_pipeline.py),
+so an identical refit has to write identical files.
+
+Metrics:
+- 'euclidean': distance in (lat, lon) degrees, as KMeans.predict() (computed in float64,
+  so near-ties on float32 data may resolve to the truly nearer centroid).
+- 'haversine': great-circle distance. Centroids and points are mapped to 3D unit
+  vectors, where the nearest chord is also the nearest great circle, so the same
+  KD-tree answers the query exactly.
+
+Steps:
+1. CentroidModel.from_kmeans(mod, ...) after fitting, then save(directory).
+2. CentroidModel.load(directory) in the labelling script.
+3. assign(lat, lon) for every chunk of new points.
+"""
+
+import os
+import json
+import hashlib
+import numpy as np
+import scipy
+import sklearn
+from scipy.spatial import cKDTree
+
+MODEL_FORMAT_VERSION = 1
+EARTH_RADIUS_KM = 6371  # Earth radius in kilometers
+
+
+# 3D unit vectors of points given in degrees
+def _unit_vectors(lat, lon):
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+# SHA-256 of the centroids as float64 (identifies a model without a timestamp)
+def _fingerprint(centroids):
+    return hashlib.sha256(np.ascontiguousarray(centroids, dtype=np.float64).tobytes()).hexdigest()
+
+
+class CentroidModel:
+    """Cluster centroids (lat, lon) with version metadata and KD-tree assignment."""
+
+    def __init__(self, centroids, metadata=None):
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        self.metadata = dict(metadata or {})
+        self._trees = {}
+
+    # Wrap a fitted sklearn KMeans / MiniBatchKMeans model
+    @classmethod
+    def from_kmeans(cls, mod, sources=(), **extra):
+        params = {k: v for k, v in mod.get_params().items() if isinstance(v, (int, float, str, bool, type(None)))}
+        metadata = {
+            'format_version': MODEL_FORMAT_VERSION,
+            'centroids_sha256': _fingerprint(mod.cluster_centers_),
+            'algorithm': type(mod).__name__,
+            'params': params,
+            'n_clusters': int(mod.cluster_centers_.shape[0]),
+            'inertia': float(getattr(mod, 'inertia_', float('nan'))),
+            'sklearn_version': sklearn.__version__,
+            'scipy_version': scipy.__version__,
+            'sources': [os.path.basename(p) for p in sources],
+        }
+        metadata.update(extra)
+        return cls(mod.cluster_centers_, metadata)
+
+    # Write the centroids (.npy) and the metadata (.json) to `directory`
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'centroids.npy'), self.centroids)
+        with open(os.path.join(directory, 'model.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.metadata, f, indent=1)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, 'model.json'), encoding='utf-8') as f:
+            metadata = json.load(f)
+        if metadata.get('format_version') != MODEL_FORMAT_VERSION:
+            raise ValueError(f"{directory}: model format {metadata.get('format_version')}, "
+                             f"expected {MODEL_FORMAT_VERSION}")
+        return cls(np.load(os.path.join(directory, 'centroids.npy')), metadata)
+
+    def fingerprint(self):
+        return _fingerprint(self.centroids)
+
+    # KD-tree over the centroids, built once per metric
+    def tree(self, metric='euclidean'):
+        if metric not in self._trees:
+            if metric == 'euclidean':
+                self._trees[metric] = cKDTree(self.centroids)
+            elif metric == 'haversine':
+                self._trees[metric] = cKDTree(_unit_vectors(self.centroids[:, 0], self.centroids[:, 1]))
+            else:
+                raise ValueError(f"unknown metric {metric!r}")
+        return self._trees[metric]
+
+    # Label of the nearest centroid for every point; with return_distance also the distance
+    # (degrees for 'euclidean', km for 'haversine')
+    def assign(self, lat, lon, metric='euclidean', return_distance=False, workers=-1):
+        if metric == 'haversine':
+            points = _unit_vectors(lat, lon)
+        else:
+            points = np.column_stack([np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)])
+        dist, labels = self.tree(metric).query(points, k=1, workers=workers)
+        labels = labels.astype(np.int32)
+        if not return_distance:
+            return labels
+        if metric == 'haversine':
+            dist = 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(dist / 2, 0, 1))  # Chord length -> arc length
+        return labels, dist
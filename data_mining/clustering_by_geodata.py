@@ -5,22 +5,34 @@ and calculates cluster centers and counts.
 
 Steps:
 1. Load preprocessed signal data (lat/lon/quality).
-2. Run KMeans clustering with 2000 clusters.
-3. Visualize the cluster results.
+2. Run KMeans clustering with 2000 clusters (KMEANS_MODE 'warm_start': seeded from a stratified
+   subsample and refined on all points, see kmeans_warmstart.py; 'full': plain KMeans) and
+   report the Calinski-Harabasz score on a sample.
+3. Visualize the cluster results as a raster image (dominant cluster per pixel, density_render.py;
+   independent of the number of points) and save it as PNG.
 4. Compute and save cluster centers and sample counts.
 """
 
 import matplotlib.pyplot as plt
-from sklearn.datasets._samples_generator import make_blobs
 from sklearn.cluster import KMeans
-from sklearn.metrics import calinski_harabasz_score
 import pandas as pd
 import time
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_preprocessing'))
+from tuda_schema import read_preprocessed_csv  # Compact typed schema (float32 coordinates)
+from kmeans_warmstart import warm_start_kmeans, sample_score  # Subsample-seeded KMeans
+from density_render import DensityRaster, fit_bounds, colorize_labels, save_png  # Rasterized cluster plots
+
+KMEANS_MODE = 'warm_start'  # 'warm_start' or 'full'
+N_CLUSTERS = 2000  # k_sweep.py compares the cost and quality of other values
+RENDER_WIDTH = 2000  # Width of the cluster image in pixels
 
 start = time.time()  # Start timing
 
 # Load cleaned GPS signal data and set 'wagon_ID' as index
-data = pd.read_csv(r"C:\Users\82796\OneDrive\桌面\TU\Machine Learning\新建文件夹\longterm2_good_signal.csv", index_col='wagon_ID')
+data = read_preprocessed_csv(r"C:\Users\82796\OneDrive\桌面\TU\Machine Learning\新建文件夹\longterm2_good_signal.csv", index_col='wagon_ID')
 
 # Drop non-location and non-quality columns
 data = data.drop(labels=['timestamp_index', 't_measure', 'time_delta', 't_transfer'], axis=1)
@@ -29,15 +41,24 @@ data = data.drop(labels=['timestamp_index', 't_measure', 'time_delta', 't_transf
 x = data.iloc[:, :2]
 
 # KMeans clustering (2000 clusters)
-mod = KMeans(n_clusters=2000, random_state=42)
-y_pre = mod.fit_predict(x)
+if KMEANS_MODE == 'warm_start':
+    mod, timings = warm_start_kmeans(x.to_numpy(), n_clusters=N_CLUSTERS, random_state=42)
+    print("seeding {seed:.1f} s on {sample_size} points, refinement {refine:.1f} s ({algorithm})".format(**timings))
+else:
+    mod = KMeans(n_clusters=N_CLUSTERS, random_state=42)
+    mod.fit(x)
+y_pre = mod.labels_
 
 end = time.time()  # End timing
 print("run time = {}".format(end - start))
+print("Calinski-Harabasz score (sample) = {:.1f}".format(sample_score(x.to_numpy(), y_pre)))
 
-# Visualize clustering result
+# Visualize clustering result: dominant cluster per pixel instead of one marker per point
+raster = DensityRaster(fit_bounds(x.iloc[:, 0], x.iloc[:, 1]), RENDER_WIDTH).add(x.iloc[:, 0], x.iloc[:, 1], labels=y_pre)
+image = colorize_labels(raster.dominant())
+save_png(image, 'clusters.png')
 plt.figure(figsize=(20, 8), dpi=80)
-plt.scatter(x.iloc[:, 1], x.iloc[:, 0], c=y_pre, s=1)
+plt.imshow(image, extent=raster.extent(), aspect='auto', interpolation='nearest')
 plt.show()
 
 # Compute number of points per cluster
@@ -0,0 +1,213 @@
+"""
+Rasterized rendering of very large GNSS point sets (density, mean quality, dominant cluster).
+
+plt.scatter draws every point as a marker, so its time and memory grow with the
+number of points and millions of points overplot into one blob. Here the points
+are instead binned onto a fixed pixel grid:
+1. Every point gets the index of its pixel in one vectorized pass (points outside
+   the bounds are dropped and counted).
+2. Counts and quality sums per pixel are np.bincount histograms of those indices;
+   the dominant cluster of a pixel comes from hash-counting (pixel, label) pairs
+   (counted per chunk and added up once, when the label image is read).
+3. The images are coloured and written as PNG (or returned as arrays).
+
+The per-pixel accumulators of DensityRaster are simply added up chunk by chunk, so a
+whole dataset is rendered file by file. Colouring and writing depend only on the
+image size. The grid is plate carree with the pixel height stretched by 1/cos of
+the mid latitude, so shapes at that latitude keep their proportions. Row 0 is the
+northern edge.
+
+Functions:
+- fit_bounds: bounds (lat_min, lat_max, lon_min, lon_max) of points with a margin.
+- label_colors: fixed, well-separated colour of every cluster label.
+- DensityRaster: per-pixel accumulators and the count, mean and dominant-label images.
+- colorize_counts / colorize_values / colorize_labels: RGBA images (empty pixels transparent).
+- save_png: write an RGBA image.
+
+Usage (labelled points of the clustering scripts or assign_clusters.py; the first three
+columns are lat, lon, quality, the optional 'group' column holds the cluster label):
+    python density_render.py
+"""
+
+import numpy as np
+import pandas as pd
+import matplotlib
+import matplotlib.pyplot as plt
+import colorsys
+import time
+import glob  # For automatic file handling
+import os
+
+DEFAULT_WIDTH = 2000  # Image width in pixels
+LABEL_COLUMN = 'group'  # Cluster label column of the labelled point files
+CHUNK_ROWS = 1_000_000  # Rows read at a time
+
+
+# Bounds of the points with a relative margin on every side
+def fit_bounds(lat, lon, margin=0.02):
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    lat_min, lat_max = np.nanmin(lat), np.nanmax(lat)
+    lon_min, lon_max = np.nanmin(lon), np.nanmax(lon)
+    d_lat = max(lat_max - lat_min, 1e-6) * margin
+    d_lon = max(lon_max - lon_min, 1e-6) * margin
+    return lat_min - d_lat, lat_max + d_lat, lon_min - d_lon, lon_max + d_lon
+
+
+# RGB colour (0..1) of every label; golden-ratio hue steps keep neighbouring IDs apart
+def label_colors(labels):
+    labels = np.asarray(labels, dtype=np.int64)
+    hue = (labels * 0.618033988749895) % 1
+    value = np.where(labels % 2 == 0, 0.95, 0.75)
+    return np.array([colorsys.hsv_to_rgb(h, 0.8, v) for h, v in zip(hue, value)]).reshape(-1, 3)
+
+
+class DensityRaster:
+    """Per-pixel counts, value sums and label counts of points within fixed bounds."""
+
+    def __init__(self, bounds, width=DEFAULT_WIDTH, height=None):
+        self.lat_min, self.lat_max, self.lon_min, self.lon_max = map(float, bounds)
+        self.width = int(width)
+        if height is None:
+            mid = np.radians((self.lat_min + self.lat_max) / 2)
+            height = width * (self.lat_max - self.lat_min) / ((self.lon_max - self.lon_min) * np.cos(mid))
+        self.height = max(1, int(round(height)))
+        n_pixels = self.width * self.height
+        self.count = np.zeros(n_pixels, dtype=np.int64)
+        self.value_sum = np.zeros(n_pixels)
+        self.value_count = np.zeros(n_pixels, dtype=np.int64)  # Points with a value (not NaN)
+        self.label_chunks = []  # Points per key label * n_pixels + pixel of every chunk (added up in label_pairs)
+        self.n_outside = 0
+
+    # Flat pixel index of every point, -1 outside the bounds
+    def pixel_index(self, lat, lon):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        col = np.floor((lon - self.lon_min) / (self.lon_max - self.lon_min) * self.width)
+        row = np.floor((self.lat_max - lat) / (self.lat_max - self.lat_min) * self.height)
+        inside = (col >= 0) & (col < self.width) & (row >= 0) & (row < self.height)
+        return np.where(inside, row * self.width + col, -1).astype(np.int64)
+
+    # Add a chunk of points (optional values, e.g. quality, and integer labels)
+    def add(self, lat, lon, values=None, labels=None):
+        pix = self.pixel_index(lat, lon)
+        inside = pix >= 0
+        self.n_outside += int((~inside).sum())
+        pix = pix[inside]
+        n_pixels = len(self.count)
+        self.count += np.bincount(pix, minlength=n_pixels)
+        if values is not None:
+            values = np.asarray(values, dtype=np.float64)[inside]
+            valid = ~np.isnan(values)
+            self.value_sum += np.bincount(pix[valid], weights=values[valid], minlength=n_pixels)
+            self.value_count += np.bincount(pix[valid], minlength=n_pixels)
+        if labels is not None:
+            labels = np.asarray(labels, dtype=np.int64)[inside]
+            self.label_chunks.append(pd.Series(labels * n_pixels + pix).value_counts(sort=False))
+        return self
+
+    # Points per key label * n_pixels + pixel over all chunks (the chunk counts are added up once and kept)
+    def label_pairs(self):
+        if len(self.label_chunks) != 1:
+            chunks = [c for c in self.label_chunks if len(c)]
+            pairs = pd.concat(chunks).groupby(level=0, sort=False).sum() if chunks else pd.Series(dtype=np.int64)
+            self.label_chunks = [pairs.astype(np.int64)]
+        return self.label_chunks[0]
+
+    # Points per pixel (height x width)
+    def counts(self):
+        return self.count.reshape(self.height, self.width)
+
+    # Mean value per pixel, NaN where no point has a value
+    def mean(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (self.value_sum / np.where(self.value_count > 0, self.value_count, np.nan)).reshape(self.height, self.width)
+
+    # Most frequent label per pixel, -1 where empty (ties: smallest label)
+    def dominant(self):
+        n_pixels = len(self.count)
+        image = np.full(n_pixels, -1, dtype=np.int64)
+        pairs = self.label_pairs()
+        if len(pairs):
+            key = pairs.index.to_numpy(dtype=np.int64)
+            label, pix = np.divmod(key, n_pixels)
+            order = np.lexsort((label, -pairs.to_numpy(), pix))
+            first = order[np.r_[True, pix[order][1:] != pix[order][:-1]]]
+            image[pix[first]] = label[first]
+        return image.reshape(self.height, self.width)
+
+    # (left, right, bottom, top) for plt.imshow(extent=...)
+    def extent(self):
+        return self.lon_min, self.lon_max, self.lat_min, self.lat_max
+
+
+# Log-scaled density colours; empty pixels transparent
+def colorize_counts(counts, cmap='magma'):
+    counts = np.asarray(counts)
+    scaled = np.log1p(counts) / max(np.log1p(counts.max()), 1e-12)
+    rgba = matplotlib.colormaps[cmap](scaled)
+    rgba[counts == 0, 3] = 0
+    return rgba
+
+
+# Value colours between vmin and vmax (default: 2nd and 98th percentile); NaN pixels transparent
+def colorize_values(image, cmap='RdYlGn', vmin=None, vmax=None):
+    image = np.asarray(image, dtype=np.float64)
+    valid = ~np.isnan(image)
+    if not valid.any():
+        return np.zeros(image.shape + (4,))
+    vmin = np.percentile(image[valid], 2) if vmin is None else vmin
+    vmax = np.percentile(image[valid], 98) if vmax is None else vmax
+    scaled = np.clip((np.where(valid, image, vmin) - vmin) / max(vmax - vmin, 1e-12), 0, 1)
+    rgba = matplotlib.colormaps[cmap](scaled)
+    rgba[~valid, 3] = 0
+    return rgba
+
+
+# Label colours (label_colors); pixels with label -1 transparent
+def colorize_labels(image):
+    image = np.asarray(image)
+    rgba = np.zeros(image.shape + (4,))
+    valid = image >= 0
+    labels, inverse = np.unique(image[valid], return_inverse=True)
+    rgba[valid, :3] = label_colors(labels)[inverse]
+    rgba[valid, 3] = 1
+    return rgba
+
+
+def save_png(rgba, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    plt.imsave(path, rgba)
+
+
+if __name__ == '__main__':
+    # Input, output and raster (bounds "lat_min,lat_max,lon_min,lon_max"); environment variables override them
+    file_pathr = os.environ.get('RENDER_INPUT_GLOB', r"E:\MLA(GROUP WORK)\Data\GNSS_assigned\GNSS_assigned_labels_*.csv")
+    file_pathw = os.environ.get('RENDER_OUTPUT_DIR', r"E:\MLA(GROUP WORK)\Data\GNSS_render")
+    width = int(os.environ.get('RENDER_WIDTH', DEFAULT_WIDTH))
+    bounds = [float(b) for b in os.environ.get('RENDER_BOUNDS', '35,72,-11,41').split(',')]
+
+    start = time.time()
+    raster = DensityRaster(bounds, width)
+    has_labels = False
+    n_points = 0
+    for csv_path in sorted(glob.glob(file_pathr)):
+        for chunk in pd.read_csv(csv_path, chunksize=CHUNK_ROWS):
+            labels = chunk[LABEL_COLUMN] if LABEL_COLUMN in chunk.columns else None
+            has_labels = has_labels or labels is not None
+            raster.add(chunk.iloc[:, 0], chunk.iloc[:, 1], values=chunk.iloc[:, 2], labels=labels)
+            n_points += len(chunk)
+    print(f"{n_points} points binned ({raster.n_outside} outside the bounds), run time = {time.time() - start:.2f} seconds")
+
+    # Raw images for further analysis, and the PNGs
+    start = time.time()
+    images = {'counts': raster.counts(), 'quality': raster.mean()}
+    if has_labels:
+        images['clusters'] = raster.dominant()
+    os.makedirs(file_pathw, exist_ok=True)
+    np.savez_compressed(os.path.join(file_pathw, 'render.npz'), **images)
+    save_png(colorize_counts(images['counts']), os.path.join(file_pathw, 'density.png'))
+    save_png(colorize_values(images['quality']), os.path.join(file_pathw, 'quality.png'))
+    if has_labels:
+        save_png(colorize_labels(images['clusters']), os.path.join(file_pathw, 'clusters.png'))
+    print(f"{raster.width}x{raster.height} images written, run time = {time.time() - start:.2f} seconds")
@@ -0,0 +1,100 @@
+"""
+This script helps to choose the number of clusters k for the GNSS clustering
+scripts (N_CLUSTERS) from the cost-quality curve instead of a fixed guess.
+
+Steps:
+1. Draw a uniform random sample of the preprocessed (lat, lon) points of all files
+   in one streaming pass (at most FIT_POINTS points) and a fixed scoring subsample of it.
+2. Fit MiniBatchKMeans for every k in K_VALUES in parallel worker processes
+   (each worker gets an equal share of the CPU threads).
+3. For every k record the fit time, the peak memory of the fit (tracemalloc), the inertia
+   on the fitted points, and the inertia, Calinski-Harabasz and silhouette scores on the
+   scoring subsample (the same points for every k).
+4. Save the results table sorted by k to k_sweep.csv.
+"""
+
+import pandas as pd
+import numpy as np
+import time
+import glob  # For automatic file handling
+import os
+import tracemalloc  # Peak memory of every fit
+from concurrent.futures import ProcessPoolExecutor  # One worker process per k
+from threadpoolctl import threadpool_limits  # Avoid thread oversubscription inside worker processes
+from sklearn.cluster import MiniBatchKMeans
+import sys
+from sklearn.metrics import calinski_harabasz_score, silhouette_score
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_preprocessing'))
+from point_sample import sample_points  # Streaming bottom-k sample of all files
+
+# Input (preprocessed longterm data) and output file; environment variables override them
+file_pathr = os.environ.get('GNSS_PREPROCESSED_GLOB', r"E:\MLA(GROUP WORK)\Data\Longterm_preprocessed\*.csv")
+output_file = os.environ.get('K_SWEEP_OUTPUT', 'k_sweep.csv')
+
+# Sweep parameters
+K_VALUES = [int(k) for k in os.environ.get('K_VALUES', '250,500,1000,2000,3000,4000').split(',')]
+BATCH_SIZE = int(os.environ.get('BATCH_SIZE', 32768))
+FIT_POINTS = 2_000_000  # Max. points the models are fitted on
+SCORE_POINTS = 20_000  # Scoring subsample (silhouette is quadratic in its size)
+CHUNK_ROWS = 1_000_000  # Rows read at a time while sampling
+
+# Number of k values fitted in parallel (1 = serial)
+N_WORKERS = min(os.cpu_count(), len(K_VALUES))
+
+# Data shared with the worker processes (set once per worker by init_worker)
+x_fit = None
+x_score = None
+
+
+def init_worker(fit, score):
+    global x_fit, x_score
+    x_fit, x_score = fit, score
+
+
+# Fit one k and score it; returns one row of the results table
+def evaluate_k(k):
+    with threadpool_limits(limits=max(1, os.cpu_count() // N_WORKERS)):
+        tracemalloc.start()
+        start = time.time()
+        mod = MiniBatchKMeans(n_clusters=k, batch_size=BATCH_SIZE, random_state=42)
+        mod.fit(x_fit)
+        fit_seconds = time.time() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        labels = mod.predict(x_score)
+        row = {
+            'k': k,
+            'fit_seconds': fit_seconds,
+            'peak_memory_mb': peak / 2 ** 20,
+            'n_iter': mod.n_iter_,
+            'inertia': mod.inertia_,
+            'inertia_score_sample': -mod.score(x_score),
+            'calinski_harabasz': calinski_harabasz_score(x_score, labels),
+            'silhouette': silhouette_score(x_score, labels),
+        }
+    print(f"[k={k}] fit {fit_seconds:.2f} seconds, CH {row['calinski_harabasz']:.1f}, "
+          f"silhouette {row['silhouette']:.3f}")
+    return row
+
+
+if __name__ == '__main__':
+    start = time.time()
+    rng = np.random.default_rng(42)
+    fit = sample_points(sorted(glob.glob(file_pathr)), FIT_POINTS, rng, CHUNK_ROWS)
+    score = fit[rng.choice(len(fit), min(SCORE_POINTS, len(fit)), replace=False)]
+    print(f"{len(fit)} points for fitting, {len(score)} for scoring")
+
+    k_values = [k for k in K_VALUES if k <= len(fit)]
+    if N_WORKERS > 1:
+        with ProcessPoolExecutor(max_workers=N_WORKERS, initializer=init_worker, initargs=(fit, score)) as pool:
+            rows = list(pool.map(evaluate_k, k_values))
+    else:
+        init_worker(fit, score)
+        rows = [evaluate_k(k) for k in k_values]
+
+    results = pd.DataFrame(rows).sort_values('k')
+    results.to_csv(output_file, index=False)
+    print(results.to_string(index=False))
+    print(f"run time = {time.time() - start:.2f} seconds")
@@ -0,0 +1,52 @@
+"""
+This script benchmarks the warm-started KMeans of kmeans_warmstart.py against the
+plain KMeans(n_clusters=k) used before in GPS_kmeans_cluster.py and clustering_by_geodata.py.
+
+Steps:
+1. Generate synthetic GNSS points along random rail corridors over Germany
+   (dense lines with noise, like the long-term data).
+2. Fit plain KMeans (k-means++ over all points) and the warm-started variants
+   (stratified-subsample seeding, then Lloyd, the default, or the 'auto' choice, which is
+   Elkan while its per-point bounds fit into memory).
+3. Print the run time, the inertia on all points and the Calinski-Harabasz score on a
+   sample for every variant, relative to the plain KMeans.
+"""
+
+import time
+import numpy as np
+from sklearn.cluster import KMeans
+from kmeans_warmstart import warm_start_kmeans, sample_score
+
+CASES = [(100_000, 200), (300_000, 1000), (1_000_000, 2000)]  # (points, clusters)
+N_CORRIDORS = 150
+
+
+# Points along random straight corridors between random "stations"
+def rail_points(n, rng):
+    stations = np.column_stack([rng.uniform(47.5, 54.5, N_CORRIDORS * 2), rng.uniform(6.5, 14.5, N_CORRIDORS * 2)])
+    corridor = rng.integers(0, N_CORRIDORS, n)
+    t = rng.random(n)[:, None]
+    a, b = stations[2 * corridor], stations[2 * corridor + 1]
+    return (a + t * (b - a) + rng.normal(0, 0.01, (n, 2))).astype(np.float32)
+
+
+rng = np.random.default_rng(42)
+for n, k in CASES:
+    x = rail_points(n, rng)
+    print(f"points = {n}, clusters = {k}")
+
+    start = time.time()
+    full = KMeans(n_clusters=k, random_state=42).fit(x)
+    t_full = time.time() - start
+    score_full = sample_score(x, full.labels_)
+    print(f"  plain KMeans              {t_full:8.2f} s  inertia {full.inertia_:12.4f}  CH {score_full:12.1f}")
+
+    for algorithm in ['lloyd', 'auto']:
+        start = time.time()
+        mod, timings = warm_start_kmeans(x, n_clusters=k, algorithm=algorithm)
+        t_warm = time.time() - start
+        score = sample_score(x, mod.labels_)
+        label = 'auto: ' + timings['algorithm'] if algorithm == 'auto' else algorithm
+        print(f"  warm start ({label:11}) {t_warm:8.2f} s  inertia {mod.inertia_:12.4f}  CH {score:12.1f}"
+              f"  (seed {timings['seed']:.2f} s, refine {timings['refine']:.2f} s)"
+              f"  speed-up {t_full / t_warm:5.1f}x, inertia {mod.inertia_ / full.inertia_ - 1:+.2%}")
@@ -0,0 +1,94 @@
+"""
+Full KMeans on large GNSS point sets, warm-started from a stratified subsample.
+
+With the default init, KMeans(n_clusters=2000) runs k-means++ seeding over every
+point (k passes over the data) before the first Lloyd iteration, and every
+iteration then starts far from the optimum. This module instead:
+1. Draws a stratified subsample: the points are grouped into coarse lat/lon cells
+   and every occupied cell contributes in proportion to its size (at least one
+   point), so sparsely covered regions are not lost as in a plain random sample.
+2. Fits KMeans (k-means++) on the subsample only.
+3. Refines on the full data starting from those centroids (n_init=1) with Lloyd's
+   algorithm. Elkan's triangle-inequality variant (algorithm='auto', used while its
+   n * k lower bounds fit into ELKAN_MAX_BYTES) gave no consistent gain over Lloyd
+   on 2-D points in kmeans_benchmark.py, and its bounds cost a lot of memory, so it
+   is opt-in only.
+4. Reports the Calinski-Harabasz score on a random sample of the labelled points.
+
+Functions:
+- stratified_sample: indices of a stratified subsample.
+- choose_algorithm: 'elkan' or 'lloyd' for the given data and k.
+- warm_start_kmeans: fitted KMeans model and timings of each phase.
+- sample_score: Calinski-Harabasz score on a random sample.
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.metrics import calinski_harabasz_score
+
+SAMPLE_PER_CLUSTER = 20  # Subsample size = SAMPLE_PER_CLUSTER * n_clusters
+STRATUM_DEG = 0.5  # Size of the sampling cells in degrees
+SAMPLE_N_INIT = 1  # k-means++ initializations on the subsample
+ELKAN_MAX_BYTES = 1 << 30  # Memory allowed for Elkan's per-point lower bounds
+SCORE_SAMPLE = 100_000  # Points used for the Calinski-Harabasz score
+
+
+# Indices of about `size` points, taken from every coarse lat/lon cell in proportion to its size
+def stratified_sample(x, size, random_state=42, stratum_deg=STRATUM_DEG):
+    x = np.asarray(x)
+    n = len(x)
+    if size >= n:
+        return np.arange(n)
+    rng = np.random.default_rng(random_state)
+    cell = np.floor(x[:, :2] / stratum_deg).astype(np.int64)
+    codes, _ = pd.factorize(cell[:, 0] * (1 << 20) + cell[:, 1])
+
+    # Random order within each cell, then keep the first `quota` points of every cell
+    order = np.lexsort((rng.random(n), codes))
+    counts = np.bincount(codes)
+    quota = np.maximum(1, np.round(counts * (size / n))).astype(np.int64)
+    starts = np.cumsum(counts) - counts
+    rank = np.arange(n) - starts[codes[order]]
+    return np.sort(order[rank < quota[codes[order]]])
+
+
+# Elkan needs n_samples * n_clusters lower bounds; fall back to Lloyd when they do not fit
+def choose_algorithm(n_samples, n_clusters, dtype=np.float64):
+    if n_samples * n_clusters * np.dtype(dtype).itemsize <= ELKAN_MAX_BYTES:
+        return 'elkan'
+    return 'lloyd'
+
+
+# KMeans on all of x, seeded by KMeans on a stratified subsample; returns the model and phase timings
+def warm_start_kmeans(x, n_clusters, sample_size=None, algorithm='lloyd', random_state=42, max_iter=300):
+    x = np.asarray(x)
+    timings = {}
+
+    start = time.time()
+    sample_size = sample_size or SAMPLE_PER_CLUSTER * n_clusters
+    idx = stratified_sample(x, max(sample_size, n_clusters), random_state)
+    seed = KMeans(n_clusters=n_clusters, n_init=SAMPLE_N_INIT, random_state=random_state).fit(x[idx])
+    timings['seed'] = time.time() - start
+
+    start = time.time()
+    if algorithm == 'auto':
+        algorithm = choose_algorithm(len(x), n_clusters, x.dtype)
+    mod = KMeans(n_clusters=n_clusters, init=seed.cluster_centers_.astype(x.dtype), n_init=1,
+                 algorithm=algorithm, max_iter=max_iter, random_state=random_state)
+    mod.fit(x)
+    timings['refine'] = time.time() - start
+    timings['algorithm'] = algorithm
+    timings['sample_size'] = len(idx)
+    return mod, timings
+
+
+# Calinski-Harabasz score of the labelling on a random sample of at most `size` points
+def sample_score(x, labels, size=SCORE_SAMPLE, random_state=42):
+    x = np.asarray(x)
+    labels = np.asarray(labels)
+    if len(x) > size:
+        idx = np.random.default_rng(random_state).choice(len(x), size, replace=False)
+        x, labels = x[idx], labels[idx]
+    return calinski_harabasz_score(x, labels)
@@ -0,0 +1,153 @@
+"""
+Interval-based moving time of wagons from their movement state messages.
+
+Counting 'moving' messages and multiplying by 10 minutes assumes a fixed
+sampling rate. Here every message instead holds its state until the next
+message of the same wagon, so each state gets its real duration:
+- Messages are sorted by wagon and timestamp_measure_movement_state.
+- The interval of a message ends at the next message of the wagon. Intervals
+  longer than MAX_GAP (data gaps) and the last message of a wagon are not credited.
+- Consecutive credited intervals of one wagon with the same state form a run
+  (vectorized run-length encoding); a gap or a state change ends the run.
+- Intervals are split at day boundaries and summed per day, group keys (e.g.
+  wagon type, country) and state.
+
+The files are processed one at a time by IntervalStream. The last message of
+every wagon (with the start and sample count of its unfinished run) is carried
+into the next file, so intervals and runs crossing file boundaries are exact
+while only one file is in memory. Files must be fed in time order: feed raises
+ValueError if a wagon has a message earlier than its carried message (its
+intervals would otherwise be counted twice). Of several messages of one wagon
+with the same timestamp, the first one fed is kept.
+
+Timestamps are durations since the start of the data ("N days HH:MM:SS"), so
+day d covers [d days, d + 1 days).
+"""
+
+import numpy as np
+import pandas as pd
+
+TIME_COLUMN = 'timestamp_measure_movement_state'
+STATE_COLUMN = 'movement_state'
+MAX_GAP = pd.Timedelta(hours=1)  # Longer intervals between two messages are data gaps
+DAY_NS = 86400 * 10 ** 9
+
+
+# Split [start, end) intervals (int64 ns) at day boundaries; returns interval index, day and seconds of every piece
+def split_days(start, end):
+    day0 = start // DAY_NS
+    n_days = (end - 1) // DAY_NS - day0 + 1
+    idx = np.repeat(np.arange(len(start)), n_days)
+    offset = np.arange(len(idx)) - np.repeat(np.cumsum(n_days) - n_days, n_days)
+    day = day0[idx] + offset
+    seconds = (np.minimum(end[idx], (day + 1) * DAY_NS) - np.maximum(start[idx], day * DAY_NS)) / 1e9
+    return idx, day, seconds
+
+
+# Add up rollups of several files (same keys)
+def combine_rollups(frames):
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return pd.DataFrame()
+    keys = [c for c in frames[0].columns if c != 'seconds']
+    return pd.concat(frames).groupby(keys, observed=True, dropna=False, sort=True)['seconds'].sum().reset_index()
+
+
+class IntervalStream:
+    """Per-wagon state intervals and runs over a sequence of files, carrying open runs across files."""
+
+    def __init__(self, group_keys=(), max_gap=MAX_GAP):
+        self.group_keys = list(group_keys)
+        self.max_gap = pd.Timedelta(max_gap).value
+        self.carry = None
+
+    def _columns(self):
+        return ['wagon_ID', STATE_COLUMN] + self.group_keys
+
+    # Rollup (seconds per day, group keys and state) and finished runs of one file
+    def feed(self, df):
+        df = df.loc[df[TIME_COLUMN].notna(), self._columns() + [TIME_COLUMN]]
+        df = pd.DataFrame({c: df[c].to_numpy(dtype=object) if c in ('wagon_ID', STATE_COLUMN) else df[c].to_numpy()
+                           for c in df.columns})
+        df['t'] = df.pop(TIME_COLUMN).to_numpy(dtype='timedelta64[ns]').view(np.int64)
+        df['run_start'] = np.int64(-1)  # Start of the unfinished run of a carried message, -1 = none
+        df['run_samples'] = np.int64(0)  # Messages of that run before the carried message
+        if self.carry is not None:
+            self._check_order(df)
+            df = pd.concat([self.carry, df], ignore_index=True)
+
+        # Sort by wagon and time (stable: a carried message wins over a duplicate of it)
+        w, _ = pd.factorize(df['wagon_ID'])
+        order = np.lexsort((df['t'].to_numpy(), w))
+        df = df.iloc[order].reset_index(drop=True)
+        w = w[order]
+        t = df['t'].to_numpy()
+        keep = np.r_[True, (w[1:] != w[:-1]) | (t[1:] != t[:-1])]
+        df, w, t = df[keep].reset_index(drop=True), w[keep], t[keep]
+        s, _ = pd.factorize(df[STATE_COLUMN], use_na_sentinel=True)
+
+        # Interval of every message: until the next message of the same wagon, credited if no gap
+        has_next = np.r_[w[1:] == w[:-1], False]
+        end = np.where(has_next, np.r_[t[1:], 0], t)
+        credited = has_next & (end - t <= self.max_gap)
+
+        # Run-length encoding: a run starts at a new wagon, a state change or after a gap
+        new_run = np.r_[True, (w[1:] != w[:-1]) | (s[1:] != s[:-1]) | ~credited[:-1]]
+        first = np.flatnonzero(new_run)
+        last = np.r_[first[1:] - 1, len(t) - 1]
+        carried_start = df['run_start'].to_numpy()[first]
+        run_start = np.where(carried_start >= 0, carried_start, t[first])
+        run_end = np.where(credited[last], end[last], t[last])
+        run_samples = last - first + 1 + df['run_samples'].to_numpy()[first]
+
+        # The last run of every wagon may continue in the next file: carry its last message
+        run_id = np.cumsum(new_run) - 1
+        open_rows = np.flatnonzero(~has_next)
+        pending = np.zeros(len(first), dtype=bool)
+        pending[run_id[open_rows]] = True
+        carry = df.iloc[open_rows].copy()
+        carry['run_start'] = run_start[run_id[open_rows]]
+        carry['run_samples'] = run_samples[run_id[open_rows]] - 1
+        self.carry = carry
+
+        runs = self._runs(df, first[~pending], run_start[~pending], run_end[~pending], run_samples[~pending])
+
+        # Credited intervals split at day boundaries and summed
+        rows = np.flatnonzero(credited)
+        idx, day, seconds = split_days(t[rows], end[rows])
+        pieces = {'day': day}
+        for c in self.group_keys + [STATE_COLUMN]:
+            pieces[c] = df[c].to_numpy()[rows][idx]
+        pieces['seconds'] = seconds
+        rollup = pd.DataFrame(pieces).groupby(['day'] + self.group_keys + [STATE_COLUMN], observed=True,
+                                              dropna=False, sort=True)['seconds'].sum().reset_index()
+        return rollup, runs
+
+    # Raise if a wagon has a new message earlier than its carried message (files not fed in time order)
+    def _check_order(self, df):
+        carried = pd.Series(self.carry['t'].to_numpy(), index=self.carry['wagon_ID'].to_numpy())
+        earliest = df.groupby('wagon_ID', observed=True, sort=False)['t'].min()
+        common = earliest.index.intersection(carried.index)
+        early = common[earliest[common].to_numpy() < carried[common].to_numpy()]
+        if len(early):
+            raise ValueError(f"files not fed in time order: {len(early)} wagons (e.g. {early[0]!r}) have messages "
+                             "earlier than the last message of the previous files")
+
+    # Runs still open after the last file (ending at their last message)
+    def finish(self):
+        if self.carry is None:
+            return self._runs(pd.DataFrame(columns=self._columns()), [], [], [], [])
+        c = self.carry
+        self.carry = None
+        run_start = np.where(c['run_start'] >= 0, c['run_start'], c['t'])
+        return self._runs(c.reset_index(drop=True), np.arange(len(c)), run_start, c['t'].to_numpy(),
+                          c['run_samples'].to_numpy() + 1)
+
+    def _runs(self, df, first, start, end, samples):
+        first = np.asarray(first, dtype=np.int64)
+        runs = {c: df[c].to_numpy()[first] for c in self._columns()}
+        runs['start'] = pd.to_timedelta(np.asarray(start, dtype=np.int64), unit='ns')
+        runs['end'] = pd.to_timedelta(np.asarray(end, dtype=np.int64), unit='ns')
+        runs['seconds'] = (np.asarray(end, dtype=np.int64) - np.asarray(start, dtype=np.int64)) / 1e9
+        runs['samples'] = np.asarray(samples, dtype=np.int64)
+        return pd.DataFrame(runs)
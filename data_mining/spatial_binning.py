@@ -0,0 +1,116 @@
+"""
+Equal-area, multi-resolution grid binning of GNSS points.
+
+An alternative to k-means for per-area quality maps. Every point is projected
+with a Lambert azimuthal equal-area projection centred on Europe, so all cells
+of one resolution cover the same ground area (a degree grid shrinks towards the
+north). Each point is assigned to a square cell in one vectorized pass, and the
+quality is summed per cell with a hash group-by. That is O(n), compared with
+O(n*k*iterations) for k-means.
+
+Cells of level l are cell_size_m * 2**l metres wide (cell_size_m is an argument of
+the functions, CELL_SIZE_M by default). A cell of level l+1
+contains exactly 2x2 cells of level l, so coarser levels are computed from the
+per-cell sums of a finer level without touching the points again. The sums of
+different chunks or files are also simply added up.
+
+Functions:
+- project / unproject: degrees <-> metres in the equal-area projection.
+- cell_ids / cell_center: 64 bit cell ID of every point, and the centre of a cell.
+- bin_points: per-cell sums (n, lat, lon, quality) of one chunk of points.
+- combine: add up the per-cell sums of several chunks or files.
+- coarsen: per-cell sums of the next coarser level(s).
+- cell_means: mean position and quality per cell (same columns as the cluster files).
+"""
+
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_M = 6371000  # Radius of the sphere used by the projection
+CENTER_LAT, CENTER_LON = 52.0, 10.0  # Projection centre (Europe)
+CELL_SIZE_M = 1000  # Default cell width of level 0 in metres
+CELL_OFFSET = 1 << 30  # Makes the signed cell indices non-negative (31 bits each, IDs stay positive)
+
+SUM_COLUMNS = ['n', 'lat_sum', 'lon_sum', 'quality_sum']
+
+
+# Lambert azimuthal equal-area projection (spherical); returns x, y in metres
+def project(lat, lon):
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    dlon = np.radians(np.asarray(lon, dtype=np.float64) - CENTER_LON)
+    lat0 = np.radians(CENTER_LAT)
+    cos_c = np.sin(lat0) * np.sin(lat) + np.cos(lat0) * np.cos(lat) * np.cos(dlon)
+    k = np.sqrt(2 / np.maximum(1 + cos_c, 1e-12))
+    x = EARTH_RADIUS_M * k * np.cos(lat) * np.sin(dlon)
+    y = EARTH_RADIUS_M * k * (np.cos(lat0) * np.sin(lat) - np.sin(lat0) * np.cos(lat) * np.cos(dlon))
+    return x, y
+
+
+# Inverse of project(); returns lat, lon in degrees
+def unproject(x, y):
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    lat0 = np.radians(CENTER_LAT)
+    rho = np.hypot(x, y)
+    c = 2 * np.arcsin(np.clip(rho / (2 * EARTH_RADIUS_M), -1, 1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        lat = np.arcsin(np.cos(c) * np.sin(lat0) + np.where(rho > 0, y * np.sin(c) * np.cos(lat0) / rho, 0))
+    dlon = np.arctan2(x * np.sin(c), rho * np.cos(lat0) * np.cos(c) - y * np.sin(lat0) * np.sin(c))
+    return np.degrees(lat), (np.degrees(dlon) + CENTER_LON + 180) % 360 - 180
+
+
+# Cell ID (int64) of every point for the given level; column index in the high, row index in the low 32 bits
+def cell_ids(lat, lon, level=0, cell_size_m=CELL_SIZE_M):
+    x, y = project(lat, lon)
+    size = cell_size_m * 2 ** level
+    ix = np.floor(x / size).astype(np.int64) + CELL_OFFSET
+    iy = np.floor(y / size).astype(np.int64) + CELL_OFFSET
+    return (ix << 32) | iy
+
+
+# Column and row index of cell IDs
+def split_ids(ids):
+    ids = np.asarray(ids, dtype=np.int64)
+    return (ids >> 32) - CELL_OFFSET, (ids & 0xFFFFFFFF) - CELL_OFFSET
+
+
+# Centre (lat, lon) of cells of the given level
+def cell_center(ids, level=0, cell_size_m=CELL_SIZE_M):
+    ix, iy = split_ids(ids)
+    size = cell_size_m * 2 ** level
+    return unproject((ix + 0.5) * size, (iy + 0.5) * size)
+
+
+# Per-cell sums of one chunk of points; indexed by cell ID
+def bin_points(lat, lon, quality, level=0, cell_size_m=CELL_SIZE_M):
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    df = pd.DataFrame({'cell': cell_ids(lat, lon, level, cell_size_m), 'n': np.ones(len(lat), dtype=np.int64),
+                       'lat_sum': lat, 'lon_sum': lon, 'quality_sum': np.asarray(quality, dtype=np.float64)})
+    return df.groupby('cell', sort=False)[SUM_COLUMNS].sum()
+
+
+# Add up per-cell sums of several chunks or files (all of the same level)
+def combine(frames):
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return pd.DataFrame(columns=SUM_COLUMNS, index=pd.Index([], name='cell', dtype=np.int64))
+    return pd.concat(frames).groupby(level=0, sort=False).sum()
+
+
+# Per-cell sums `levels` levels coarser (each level halves the number of cells per axis)
+def coarsen(sums, levels=1):
+    ix, iy = split_ids(sums.index.to_numpy())
+    parent = (((ix >> levels) + CELL_OFFSET) << 32) | ((iy >> levels) + CELL_OFFSET)
+    return sums.groupby(pd.Index(parent, name='cell'), sort=False).sum()
+
+
+# Mean position and quality per cell, sorted by cell ID
+def cell_means(sums):
+    sums = sums.sort_index()
+    n = sums['n'].to_numpy()
+    return pd.DataFrame({'cell': sums.index.to_numpy(),
+                         'latitude': sums['lat_sum'].to_numpy() / n,
+                         'longitude': sums['lon_sum'].to_numpy() / n,
+                         'signal_quality': sums['quality_sum'].to_numpy() / n,
+                         'n': n})
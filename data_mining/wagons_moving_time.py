@@ -1,70 +1,170 @@
 """
-This script analyzes long-term wagon data to calculate the average daily moving time 
-for wagons of different types. It processes multiple CSVs, merges them with wagon type 
+This script analyzes long-term wagon data to calculate the average daily moving time
+for wagons of different types. It processes multiple CSVs, merges them with wagon type
 information, filters invalid timestamps, and calculates per-type moving time statistics.
 
 Steps:
 1. Load wagon type mapping.
-2. Iterate over each long-term data CSV file.
-3. Merge data with type mapping.
+2. Process each long-term data CSV file, read through the columnar cache (serially, or in N_WORKERS worker processes).
+3. Merge data with type mapping (optionally export the merged rows as a Parquet dataset
+   partitioned by wagon type, EXPORT_MERGED).
 4. Filter rows with valid movement timestamps.
-5. For each wagon type (1–8), compute:
+5. Count the rows per (wagon_type, wagon_ID, movement_state) in one grouped aggregation and
+   derive for every wagon type (1–8):
    - Moving count
    - Number of wagons
    - Moving events per wagon
    - Estimated average moving time per day
-6. Append results to CSV.
+6. Collect the per-file results and write them to CSV in input file order.
+
+MOVING_TIME_MODE = 'intervals' replaces steps 4-6 by real state durations (see
+moving_intervals.py): the files are streamed in time order, every movement state message
+holds until the next message of its wagon, and the durations are rolled up per day,
+wagon type, country and state (moving_time_daily.csv) and per wagon type with the
+share of observed time spent moving (moving_time_per_type.csv). The moving and
+stationary runs of every file are written to the 'runs' folder.
 """
 
 import pandas as pd
 import glob
 import gc
+import os
+import sys
+import pyarrow as pa
+import pyarrow.dataset as ds
+from concurrent.futures import ProcessPoolExecutor  # One worker process per file
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_preprocessing'))
+from columnar_cache import read_longterm  # Parquet ingest cache of the raw CSVs
+from tuda_schema import read_wagon_type_mapping  # Compact typed schema
+from country_store import open_store  # Offline country lookup raster
+from moving_intervals import IntervalStream, combine_rollups  # Interval-based state durations
 
 # Paths
 file_path = r"D:\MLAP\PRT2\Test\*.csv"  # Folder containing the 45 long-term data CSVs
-csv_list = glob.glob(file_path)
 wagon_type_file = r"D:\MLAP\PRT2\Mapping\211202_wagon_type_mapping.csv"
+merged_dir = 'merged_data'  # Parquet dataset of the merged rows (one file per input file and wagon type)
+
+EXPORT_MERGED = False  # Write the merged rows to merged_dir (only needed for later analyses)
+MOVING_TIME_MODE = 'count'  # 'count': moving messages * 10 minutes; 'intervals': real state durations
+COUNTRY_ROLLUP = True  # Intervals mode: roll up per country as well (needs the country store)
+runs_dir = 'runs'  # Intervals mode: moving and stationary runs per file
+WAGON_TYPES = range(1, 9)
+MINUTES_PER_STATE = 10  # One movement state message every 10 minutes
+
+# Number of files processed in parallel (default 1 = serial: every worker holds a whole long-term file)
+N_WORKERS = int(os.environ.get('N_WORKERS', 1))
 
 # Load wagon type mapping (drop duplicates to ensure unique mapping)
-with open(wagon_type_file) as f:
-    wagon_type_mapping = pd.read_csv(f).drop_duplicates(['wagon_ID'])
+wagon_type_mapping = read_wagon_type_mapping(wagon_type_file)
+
+
+# Append the merged rows of one file to the Parquet dataset, partitioned by wagon type
+def export_merged(merged_data, name):
+    table = pa.Table.from_pandas(merged_data, preserve_index=False)
+    ds.write_dataset(table, merged_dir, format='parquet', basename_template=name + '-{i}.parquet',
+                     partitioning=ds.partitioning(pa.schema([('wagon_type', pa.int8())]), flavor='hive'),
+                     existing_data_behavior='overwrite_or_ignore')
 
-# Process each long-term file
-for i in range(len(csv_list)):
-    with open(csv_list[i]) as f:
-        lonterm_01 = pd.read_csv(f)
+
+# Moving time per wagon type (1–8) of one long-term file
+def moving_time_per_type(csv_path):
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    columns = None if EXPORT_MERGED else ['wagon_ID', 'movement_state', 'timestamp_measure_movement_state']
+    lonterm_01 = read_longterm(csv_path, columns=columns)
 
     # Merge with wagon type info
     merged_data = pd.merge(lonterm_01, wagon_type_mapping, on="wagon_ID")
-    merged_data.to_csv('merged_data.csv', mode='a', index=False, header=(i == 0))  # Write header only for the first file
-
-    # Filter out rows with invalid timestamp
-    merged_data_withoutNaT = merged_data[~merged_data['timestamp_measure_movement_state'].isin(['NaT'])]
-
-    a_1 = []
-    # Analyze movement by wagon type (1–8)
-    for t in range(1, 9):
-        merged_data_pure = merged_data_withoutNaT[merged_data['wagon_type'] == t]
-
-        # Count 'moving' states
-        moving_number_type = merged_data_pure['movement_state'].to_list().count('moving')
-        # Count unique wagons
-        wagon_total_number_type = merged_data_pure['wagon_ID'].nunique()
-        # Avoid division by zero
-        if wagon_total_number_type > 0:
-            movingnumber_per_wagon_type = moving_number_type / wagon_total_number_type
-            moving_time_per_wagon_type = movingnumber_per_wagon_type * 10 / 60 / 24  # Convert to days
-        else:
-            moving_time_per_wagon_type = 0.0
+    if EXPORT_MERGED:
+        export_merged(merged_data, name)
+
+    # Filter out rows with invalid timestamp (parsed to NaT by the schema)
+    merged_data_withoutNaT = merged_data[merged_data['timestamp_measure_movement_state'].notna()]
 
-        a_1.append(moving_time_per_wagon_type)
+    # Rows per (type, wagon, state) in one pass; missing states are kept so every wagon is counted
+    counts = merged_data_withoutNaT.groupby(['wagon_type', 'wagon_ID', 'movement_state'],
+                                            observed=True, dropna=False).size()
+    moving = counts[counts.index.get_level_values('movement_state') == 'moving']
+    moving_number_type = moving.groupby(level='wagon_type').sum().reindex(WAGON_TYPES, fill_value=0)
+    wagons = counts.index.droplevel('movement_state').unique()
+    wagon_total_number_type = wagons.get_level_values('wagon_type').value_counts().reindex(WAGON_TYPES, fill_value=0)
 
-    print(a_1)
-    df_data = pd.DataFrame([a_1])
-    df_data.to_csv('year_change.csv', mode='a', header=False, index=False)
+    # Moving events per wagon converted to days (0 for types without wagons)
+    movingnumber_per_wagon_type = moving_number_type / wagon_total_number_type.where(wagon_total_number_type > 0)
+    moving_time_per_wagon_type = movingnumber_per_wagon_type * MINUTES_PER_STATE / 60 / 24
+    a_1 = moving_time_per_wagon_type.fillna(0.0).tolist()
+
+    print(name, a_1)
 
     # Clean up memory
     del lonterm_01, merged_data, merged_data_withoutNaT
-    del moving_number_type, wagon_total_number_type, movingnumber_per_wagon_type
-    del moving_time_per_wagon_type
     gc.collect()
+    return a_1
+
+
+# Files ordered by their earliest movement state timestamp (IntervalStream needs them in time order)
+def order_by_time(csv_list):
+    first = [read_longterm(p, columns=['timestamp_measure_movement_state']).iloc[:, 0].min() for p in csv_list]
+    return pd.Series(first, index=csv_list).sort_values(kind='stable', na_position='last').index.tolist()
+
+
+# Real moving and stationary durations over all files (streamed in time order, one file in memory)
+def moving_time_intervals(csv_list):
+    stream = IntervalStream(group_keys=['wagon_type', 'country'])
+    countries = open_store() if COUNTRY_ROLLUP else None
+    columns = ['wagon_ID', 'movement_state', 'timestamp_measure_movement_state']
+    if COUNTRY_ROLLUP:
+        columns += ['latitude', 'longitude']
+    os.makedirs(runs_dir, exist_ok=True)
+
+    rollups = []
+    for csv_path in order_by_time(csv_list):
+        name = os.path.splitext(os.path.basename(csv_path))[0]
+        data = pd.merge(read_longterm(csv_path, columns=columns), wagon_type_mapping, on="wagon_ID")
+        if countries is not None:
+            data['country'] = countries.lookup(data['latitude'].values, data['longitude'].values)
+        else:
+            data['country'] = 'all'
+
+        rollup, runs = stream.feed(data)
+        rollups.append(rollup)
+        runs.to_csv(os.path.join(runs_dir, f'runs_{name}.csv'), index=False)
+        print(name, len(runs), 'runs')
+        del data
+        gc.collect()
+    stream.finish().to_csv(os.path.join(runs_dir, 'runs_open_at_end.csv'), index=False)
+
+    # Hours per day, wagon type, country and state
+    daily = combine_rollups(rollups)
+    daily['hours'] = daily.pop('seconds') / 3600
+    daily.to_csv('moving_time_daily.csv', index=False)
+
+    # Hours per wagon type and state, and the share of the observed time spent moving
+    per_type = daily.pivot_table(index='wagon_type', columns='movement_state', values='hours', aggfunc='sum',
+                                 fill_value=0)
+    per_type['observed'] = per_type.sum(axis=1)
+    per_type['utilization'] = per_type['moving'] / per_type['observed'] if 'moving' in per_type else 0.0
+    per_type.to_csv('moving_time_per_type.csv')
+    print(per_type)
+
+
+if __name__ == '__main__':
+    # Sorted so that every run processes and reports the files in the same order
+    csv_list = sorted(glob.glob(file_path))
+    if MOVING_TIME_MODE == 'intervals':
+        moving_time_intervals(csv_list)
+        sys.exit()
+    if EXPORT_MERGED:
+        os.makedirs(merged_dir, exist_ok=True)
+
+    # Process each long-term file; map() returns the results in input order
+    if N_WORKERS > 1:
+        with ProcessPoolExecutor(max_workers=N_WORKERS) as pool:
+            results = list(pool.map(moving_time_per_type, csv_list))
+    else:
+        results = [moving_time_per_type(csv_list[i]) for i in range(len(csv_list))]
+
+    # One row per input file, one column per wagon type
+    names = [os.path.splitext(os.path.basename(p))[0] for p in csv_list]
+    df_data = pd.DataFrame(results, index=pd.Index(names, name='file'), columns=range(1, 9))
+    df_data.to_csv('year_change.csv')
@@ -2,41 +2,66 @@ import pandas as pd
 import glob
 import gc
 import os
+from concurrent.futures import ProcessPoolExecutor  # 多进程并行处理多个文件
+from columnar_cache import read_longterm, iter_longterm  # 原始CSV的Parquet列式缓存
+
+# 路径和参数可以通过环境变量覆盖（run_pipeline.py 使用）
+file_pathr = os.environ.get('GNSS_RAW_GLOB', r"E:\sid\TU Darmstadt\Module und Lehrveranstaltungen\WS2022\MLA practical\DATA1\*.csv")  #45个longterm数据所在的文件夹（注意，此文件夹中只放45个longterm文件）
+file_pathw= os.environ.get('GNSS_PREPROCESSED_DIR', r'D:\MLAP\PRT2\write')
+HDOP_MAX = float(os.environ.get('HDOP_MAX', 35))  # 只保留HDOP <= HDOP_MAX的数据
+STREAMING = True  # 分块流式处理：每个文件按固定行数的块读取和处理，峰值内存与文件大小无关
+MEMORY_LIMIT_MB = 1024  # 流式模式下每个块允许使用的内存上限 (MB)，据此确定每块的行数
+N_WORKERS = int(os.environ.get('N_WORKERS', 1))  # 并行处理文件的进程数 (默认1 = 串行)；流式模式下总内存约为 N_WORKERS * MEMORY_LIMIT_MB
+columns = ['latitude', 'longitude', 'signal_quality_hdop']  # 只读取需要的列
 
-file_pathr = r"E:\sid\TU Darmstadt\Module und Lehrveranstaltungen\WS2022\MLA practical\DATA1\*.csv"  #45个longterm数据所在的文件夹（注意，此文件夹中只放45个longterm文件）
-file_pathw= r'D:\MLAP\PRT2\write'
-csv_listr = glob.glob(file_pathr)
-for i in range(0, len(csv_listr)):
-    with open(csv_listr[i]) as r:
-        table1 = pd.read_csv(r)  #read long term data file
-        table2 = table1[table1['determination_position'].isin([1])]  # 筛选出用移动数据定位的数据
-        del table1  # 清除定义过的变量名
-        gc.collect()  # 使用此代码可删除内存中所有的无效变量
-        table3 = table2.drop(labels=['loading_state', 'loading_state_update', 'altitude', 'signal_quality_satellite',
-                                     'determination_position', 'GNSS_velocity', 'timestamp_measure_position',
-                                     'timestamp_transfer', 'movement_state', 'timestamp_measure_movement_state',
-                                     'timestamp_index', 'provider'], axis=1)
-        del table2  # 清除定义过的变量名
-        gc.collect()  # 使用此代码可删除内存中所有的无效变量
-        # 删除不需要的数据列
 
-        # max_amount = float(table3['signal_quality_hdop'].max())
-        # min_amount = float(table3['signal_quality_hdop'].min())
-        table_goodsignal = table3[(table3['signal_quality_hdop'] <= 35)]
+# 筛选HDOP <= HDOP_MAX的数据，并把HDOP映射为信号质量 (HDOP_MAX - HDOP)
+def preprocess_chunk(table3):
+    # max_amount = float(table3['signal_quality_hdop'].max())
+    # min_amount = float(table3['signal_quality_hdop'].min())
+    table_goodsignal = table3[(table3['signal_quality_hdop'] <= HDOP_MAX)]
+    quality = HDOP_MAX - table_goodsignal['signal_quality_hdop']
+    dict2 = {'lat': table_goodsignal['latitude'].values, 'lon': table_goodsignal['longitude'].values,
+             "quality": quality.values}  # 利用前两个series文件的值创建字典，用于创建后续的dataframe
+    return pd.DataFrame(dict2, index=table_goodsignal.index)
 
-        table_goodsignal.loc[:, 'signal_quality'] = (35 - table_goodsignal['signal_quality_hdop'])
-        lat2 = table_goodsignal['latitude']
-        lon2 = table_goodsignal['longitude']
-        quality = table_goodsignal["signal_quality"]
-        del table3,table_goodsignal  # 清除定义过的变量名
+
+# 处理一个long term文件；输出文件名由输入文件名决定（与glob顺序无关）
+def preprocess_file(csv_path):
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    output_file = os.path.join(file_pathw, 'GNSSPreProcessed_' + name + '.csv')
+    if STREAMING:
+        # 逐块读取用移动数据定位的数据 (determination_position == 1)，处理后追加写入输出文件
+        first = True
+        for table3 in iter_longterm(csv_path, columns=columns, determination_position=1,
+                                    memory_limit=MEMORY_LIMIT_MB << 20):
+            df_lat_lon = preprocess_chunk(table3)
+            df_lat_lon.to_csv(output_file, mode='w' if first else 'a', header=first, index=None)
+            first = False
+        if first:  # 没有任何符合条件的数据时也输出只有表头的文件
+            preprocess_chunk(pd.DataFrame(columns=columns)).to_csv(output_file, index=None)
+    else:
+        # 从列式缓存读取long term数据：只读取需要的列，且只扫描用移动数据定位的数据 (determination_position == 1)
+        table3 = read_longterm(csv_path, columns=columns, determination_position=1)
+        df_lat_lon = preprocess_chunk(table3)
+        del table3  # 清除定义过的变量名
         gc.collect()  # 使用此代码可删除内存中所有的无效变量
-        dict2 = {'lat': lat2.values, 'lon': lon2.values,
-                 "quality": quality.values}  # 利用前两个series文件的值创建字典，用于创建后续的dataframe
-        df_lat_lon = pd.DataFrame(dict2, index=lat2.index)
 
-        df_lat_lon.to_csv(os.path.join(file_pathw,'GNSSPreProcessed_' + str(i+17) + '.csv'),index=None)#单个生成并输出csv文件
-        del dict2,df_lat_lon
+        df_lat_lon.to_csv(output_file,index=None)#单个生成并输出csv文件
+        del df_lat_lon
         gc.collect()
+    return output_file
+
+
+if __name__ == '__main__':
+    csv_listr = sorted(glob.glob(file_pathr))  # 排序保证每次运行的处理顺序相同
+    if N_WORKERS > 1:
+        with ProcessPoolExecutor(max_workers=N_WORKERS) as pool:
+            for output_file in pool.map(preprocess_file, csv_listr):
+                print(output_file)
+    else:
+        for i in range(0, len(csv_listr)):
+            print(preprocess_file(csv_listr[i]))
 
 
 
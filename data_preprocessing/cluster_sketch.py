@@ -0,0 +1,131 @@
+"""
+Mergeable per-cluster statistics ("sketches") of GNSS points.
+
+Computing a cluster mean by attaching the labels to the data and running
+groupby().mean() copies the whole frame and keeps nothing but the mean. A
+sketch holds, per cluster (or grid cell, or any other integer key):
+- n: number of points
+- <column>_sum, <column>_sumsq, <column>_min, <column>_max for every value column
+- hist_<lo>_<hi>: counts of the quantile column in fixed bins [lo, hi); the bin edges
+  are part of the column names, so they are stored with the sketch (also in CSV)
+
+Sketches of different chunks or files are merged by adding the counts and sums
+and taking the min/max, so results can be combined without re-reading the
+points. Mean, standard deviation and approximate quantiles (resolution of one
+histogram bin, clamped to min/max) are derived from the merged sketch.
+
+Sketches are only meaningful to merge when the keys mean the same thing in every
+part, e.g. labels from one global codebook or grid cell IDs, and when their
+histograms have the same bin edges (merge_sketches refuses anything else). The
+edges must cover the range of the quantile column: values outside it are counted
+in the edge bins, which makes the quantiles there wrong. QUANTILE_EDGES fits the
+HDOP based quality (HDOP_MAX - HDOP, see GNSS_Preprocess.py), SIGNAL_QUALITY_EDGES
+the 0-256 delay based quality of good_signal_extraction.py.
+
+Functions:
+- build_sketch: sketch of one chunk of points from their labels.
+- sketch_edges: histogram bin edges of a sketch.
+- merge_sketches: combine sketches of several chunks or files.
+- summarize: count, mean, std and quantiles per key.
+- write_sketch / read_sketch: CSV storage of a sketch.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+
+HDOP_MAX = float(os.environ.get('HDOP_MAX', 35))  # As in GNSS_Preprocess.py
+# Bins of the quality histogram: quality = HDOP_MAX - HDOP lies in [0, HDOP_MAX], 70 bins
+QUANTILE_EDGES = np.linspace(0, HDOP_MAX, 71)
+# Bins of the delay based signal quality of good_signal_extraction.py (0-256), 128 bins
+SIGNAL_QUALITY_EDGES = np.linspace(0, 256, 129)
+QUANTILES = (0.1, 0.5, 0.9)
+
+
+def _hist_columns(edges):
+    return [f'hist_{lo:.10g}_{hi:.10g}' for lo, hi in zip(edges[:-1], edges[1:])]
+
+
+# Histogram bin edges of a sketch, read back from its hist_<lo>_<hi> column names
+def sketch_edges(sketch):
+    bins = [c.split('_')[1:] for c in sketch.columns if c.startswith('hist_')]
+    return np.array([float(lo) for lo, _ in bins] + [float(bins[-1][1])]) if bins else np.array([])
+
+
+# Sketch of one chunk: labels (one integer key per point), values (DataFrame of the value columns)
+def build_sketch(labels, values, quantile_column='quality', edges=QUANTILE_EDGES):
+    edges = np.asarray(edges, dtype=np.float64)
+    codes, keys = pd.factorize(np.asarray(labels), sort=True)  # Hash-based: works for sparse keys too
+    k = len(keys)
+    out = {'n': np.bincount(codes, minlength=k).astype(np.int64)}
+    grouped = values.groupby(codes, sort=True)
+    mins, maxs = grouped.min(), grouped.max()
+    for c in values.columns:
+        v = values[c].to_numpy(dtype=np.float64)
+        out[f'{c}_sum'] = np.bincount(codes, weights=v, minlength=k)
+        out[f'{c}_sumsq'] = np.bincount(codes, weights=v * v, minlength=k)
+        out[f'{c}_min'] = mins[c].to_numpy(dtype=np.float64)
+        out[f'{c}_max'] = maxs[c].to_numpy(dtype=np.float64)
+
+    # Fixed-bin histogram of the quantile column (values outside the range go to the edge bins)
+    n_bins = len(edges) - 1
+    b = np.searchsorted(edges, values[quantile_column].to_numpy(dtype=np.float64), side='right') - 1
+    b = np.clip(b, 0, n_bins - 1)
+    hist = np.bincount(codes * n_bins + b, minlength=k * n_bins).reshape(k, n_bins)
+    out.update(zip(_hist_columns(edges), hist.T))
+    return pd.DataFrame(out, index=pd.Index(keys, name='group'))
+
+
+# Combine sketches of several chunks or files: counts and sums are added, min/max are kept
+def merge_sketches(sketches):
+    sketches = [s for s in sketches if len(s)]
+    for s in sketches[1:]:
+        if list(s.columns) != list(sketches[0].columns):
+            raise ValueError("cannot merge sketches with different columns or histogram edges: "
+                             f"{sketch_edges(sketches[0]).tolist()} vs {sketch_edges(s).tolist()}")
+    if len(sketches) <= 1:
+        return sketches[0] if sketches else pd.DataFrame(index=pd.Index([], name='group'))
+    merged = pd.concat(sketches)
+    how = {c: ('min' if c.endswith('_min') else 'max' if c.endswith('_max') else 'sum') for c in merged.columns}
+    return merged.groupby(level=0, sort=True).agg(how)
+
+
+# Approximate quantile q of every row from the histogram columns
+def _hist_quantile(hist, edges, q, lo, hi):
+    n = hist.sum(axis=1)
+    cum = np.cumsum(hist, axis=1)
+    target = q * n
+    b = np.minimum((cum < target[:, None]).sum(axis=1), hist.shape[1] - 1)
+    rows = np.arange(len(hist))
+    before = np.where(b > 0, cum[rows, np.maximum(b - 1, 0)], 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        frac = np.where(hist[rows, b] > 0, (target - before) / hist[rows, b], 0)
+    value = edges[b] + frac * (edges[b + 1] - edges[b])
+    return np.clip(value, lo, hi)
+
+
+# Count, mean, std (and quantiles of the quantile column) per key
+def summarize(sketch, columns, quantile_column='quality', quantiles=QUANTILES):
+    n = sketch['n'].to_numpy()
+    out = {}
+    for c in columns:
+        mean = sketch[f'{c}_sum'].to_numpy() / n
+        var = np.maximum(sketch[f'{c}_sumsq'].to_numpy() / n - mean * mean, 0)
+        out[c] = mean
+        out[f'{c}_std'] = np.sqrt(var * n / np.maximum(n - 1, 1))  # Sample standard deviation
+    edges = sketch_edges(sketch)
+    hist = sketch[_hist_columns(edges)].to_numpy()
+    lo = sketch[f'{quantile_column}_min'].to_numpy()
+    hi = sketch[f'{quantile_column}_max'].to_numpy()
+    for q in quantiles:
+        out[f'{quantile_column}_p{round(q * 100)}'] = _hist_quantile(hist, edges, q, lo, hi)
+    out['n'] = n
+    return pd.DataFrame(out, index=sketch.index)
+
+
+def write_sketch(sketch, path):
+    sketch.to_csv(path)
+
+
+def read_sketch(path):
+    return pd.read_csv(path, index_col='group')
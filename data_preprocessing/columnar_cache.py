@@ -0,0 +1,175 @@
+"""
+Columnar (Parquet) ingest cache for the TUDA long-term CSV files.
+
+Every raw long-term CSV is converted once into a typed Parquet dataset that is
+partitioned by `determination_position`. Later reads load only the columns they
+need and push filters such as `determination_position == 1` (GNSS) or `== 4`
+(cellular) down to the scan, so the raw CSVs are no longer re-parsed by every script.
+
+Steps:
+1. Stream the raw CSV block by block with pyarrow and cast it to the schema of tuda_schema.py
+   ("N days HH:MM:SS" timestamps are parsed once into durations).
+2. Write the blocks to <cache_dir>/<file name>/determination_position=<n>/*.parquet.
+3. Record size and modification time of the raw file (and the schema version) so a changed
+   file is rebuilt.
+4. Read the cached dataset back with column projection and partition filters,
+   either as one DataFrame or as a stream of bounded row chunks, with categorical
+   IDs/states, float32 coordinates and timedelta64 timestamps.
+
+Run this file directly to convert all long-term CSVs of a folder up front.
+"""
+
+import os
+import glob
+import json
+import shutil
+import time
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+from timestamp_parser import parse_duration
+from tuda_schema import (LONGTERM_ARROW_TYPES, LONGTERM_ARROW_TIMESTAMP_TYPE, LONGTERM_TIMESTAMP_COLUMNS,
+                         LONGTERM_CATEGORY_COLUMNS, apply_longterm_schema)
+
+PARTITION_COLUMN = 'determination_position'
+PARTITIONING = ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.int8())]), flavor='hive')
+CSV_BLOCK_SIZE = 64 << 20  # Bytes of raw CSV parsed per block while building the cache
+ROW_GROUP_ROWS = 1 << 18  # Rows per Parquet row group (smallest unit decoded by a streaming read)
+STRING_BYTES = 32  # Assumed in-memory size of one string value when sizing chunks
+SOURCE_MARKER = '_source.json'
+SCHEMA_VERSION = 2  # Increase when the cached column types change, so old caches are rebuilt
+
+
+# Cache folder of one raw CSV (default: "parquet_cache" next to the raw file)
+def cache_path(csv_path, cache_dir=None):
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(csv_path)), 'parquet_cache')
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir, name)
+
+
+def _source_info(csv_path):
+    stat = os.stat(csv_path)
+    return {'source': os.path.abspath(csv_path), 'size': stat.st_size, 'mtime': stat.st_mtime,
+            'schema_version': SCHEMA_VERSION}
+
+
+# True if the cache exists and was built from the current version of the raw file
+def is_cached(csv_path, cache_dir=None):
+    marker = os.path.join(cache_path(csv_path, cache_dir), SOURCE_MARKER)
+    if not os.path.exists(marker):
+        return False
+    with open(marker) as f:
+        info = json.load(f)
+    current = _source_info(csv_path)
+    return all(info.get(k) == current[k] for k in ('size', 'mtime', 'schema_version'))
+
+
+# Parse the "N days HH:MM:SS" string columns of a CSV block into durations
+def _parse_timestamps(batch, schema):
+    columns = []
+    for name, column in zip(batch.schema.names, batch.columns):
+        if name in LONGTERM_TIMESTAMP_COLUMNS:
+            column = pa.array(parse_duration(column.to_pandas()), type=LONGTERM_ARROW_TIMESTAMP_TYPE,
+                              from_pandas=True)
+        columns.append(column)
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+# Convert one raw CSV into a partitioned Parquet dataset (one-time cost)
+def build_cache(csv_path, cache_dir=None, overwrite=False):
+    target = cache_path(csv_path, cache_dir)
+    if not overwrite and is_cached(csv_path, cache_dir):
+        return target
+
+    reader = pacsv.open_csv(
+        csv_path,
+        read_options=pacsv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+        convert_options=pacsv.ConvertOptions(column_types=LONGTERM_ARROW_TYPES, strings_can_be_null=True),
+    )
+
+    schema = pa.schema([pa.field(f.name, LONGTERM_ARROW_TIMESTAMP_TYPE) if f.name in LONGTERM_TIMESTAMP_COLUMNS
+                        else f for f in reader.schema])
+    batches = pa.RecordBatchReader.from_batches(schema, (_parse_timestamps(b, schema) for b in reader))
+
+    # Write into a temporary folder first so an interrupted run never leaves a half cache
+    tmp = target + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    ds.write_dataset(batches, tmp, format='parquet', partitioning=PARTITIONING,
+                     max_rows_per_group=ROW_GROUP_ROWS, existing_data_behavior='overwrite_or_ignore')
+    with open(os.path.join(tmp, SOURCE_MARKER), 'w') as f:
+        json.dump(_source_info(csv_path), f)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+    return target
+
+
+# Open the cached dataset of a raw CSV, building the cache on first use
+def open_longterm(csv_path, cache_dir=None):
+    target = build_cache(csv_path, cache_dir)
+    return ds.dataset(target, format='parquet', partitioning=PARTITIONING,
+                      exclude_invalid_files=True, ignore_prefixes=['_', '.'])
+
+
+# Build a scan filter from the determination_position value(s) and an optional extra expression
+def _scan_filter(determination_position=None, filter=None):
+    expr = filter
+    if determination_position is not None:
+        if isinstance(determination_position, (list, tuple, set)):
+            dp = ds.field(PARTITION_COLUMN).isin(list(determination_position))
+        else:
+            dp = ds.field(PARTITION_COLUMN) == determination_position
+        expr = dp if expr is None else expr & dp
+    return expr
+
+
+# Load a long-term file as DataFrame, reading only `columns` and only matching partitions
+def read_longterm(csv_path, columns=None, determination_position=None, filter=None, cache_dir=None):
+    dataset = open_longterm(csv_path, cache_dir)
+    table = dataset.to_table(columns=columns, filter=_scan_filter(determination_position, filter))
+    return _to_pandas(table)
+
+
+# Arrow table/batch -> DataFrame in the compact schema (IDs and states become categoricals)
+def _to_pandas(table):
+    categories = [c for c in LONGTERM_CATEGORY_COLUMNS if c in table.schema.names]
+    return apply_longterm_schema(table.to_pandas(categories=categories))
+
+
+# Number of rows per chunk so that `copies` DataFrame copies of the chunk stay below `memory_limit` bytes
+def chunk_rows_for_memory(dataset, columns, memory_limit, copies=4):
+    schema = dataset.schema
+    row_bytes = 0
+    for name in (columns if columns is not None else schema.names):
+        field_type = schema.field(name).type
+        try:
+            row_bytes += field_type.bit_width // 8
+        except ValueError:  # Variable-width types such as strings
+            row_bytes += STRING_BYTES
+    rows = int(memory_limit // (max(row_bytes, 1) * copies))
+    return max(1024, min(rows, ROW_GROUP_ROWS))
+
+
+# Stream a long-term file as DataFrames of at most `chunk_rows` rows (or sized by `memory_limit` bytes)
+def iter_longterm(csv_path, columns=None, determination_position=None, filter=None, cache_dir=None,
+                  chunk_rows=None, memory_limit=None):
+    dataset = open_longterm(csv_path, cache_dir)
+    if chunk_rows is None:
+        chunk_rows = ROW_GROUP_ROWS if memory_limit is None else chunk_rows_for_memory(dataset, columns, memory_limit)
+    # No read-ahead, so at most one row group and one chunk are held in memory at a time
+    batches = dataset.to_batches(columns=columns, filter=_scan_filter(determination_position, filter),
+                                 batch_size=chunk_rows, batch_readahead=0, fragment_readahead=0)
+    for batch in batches:
+        if batch.num_rows:
+            yield _to_pandas(batch)
+
+
+if __name__ == '__main__':
+    # Folder with the 45 long-term data files
+    file_pathr = r"E:\sid\TU Darmstadt\Module und Lehrveranstaltungen\WS2022\MLA practical\DATA1\*.csv"
+    csv_listr = sorted(glob.glob(file_pathr))
+    for i in range(len(csv_listr)):
+        start = time.time()
+        build_cache(csv_listr[i])
+        print(f"[{os.path.basename(csv_listr[i])}] cached in {time.time() - start:.2f} seconds")
@@ -6,74 +6,60 @@ and exports the results.
 
 Steps include:
 1. Reading and cleaning the data.
-2. Calculating haversine distance between points.
+2. Calculating haversine distance between consecutive points (vectorized, see geodesy.py).
 3. Grouping by wagon ID to compute mean/median positions.
-4. Using geojson to determine the country of each wagon based on average/median position.
+4. Using geojson to determine the country of each wagon based on average/median position
+   (batch lookup through the offline country store, see country_store.py).
 5. Writing the results to CSV.
+6. Splitting every wagon track into stops and trips (see trajectory.py) and writing the
+   stop table (dwell location and its country) and the trip table (distance, start and
+   end country) of the file.
 """
 
 import pandas as pd
-from math import radians, cos, sin, asin, sqrt
 import time
 import gc
-import requests  # For address lookup
+import os
+from columnar_cache import read_longterm  # Parquet ingest cache of the raw CSVs
+from geodesy import step_distance  # Vectorized haversine kernel
+from country_store import open_store  # Offline country-boundary store with raster lookup
+from trajectory import track_order, segment_tracks  # Integer-key track sort and stop/trip segmentation
 
-from shapely.geometry import mapping, shape  # For address lookup
-from shapely.prepared import prep            # For address lookup
-from shapely.geometry import Point           # For address lookup
-
-# Load GeoJSON for country borders
-data = requests.get("https://raw.githubusercontent.com/datasets/geo-countries/master/data/countries.geojson").json()
-countries = {}
-for feature in data["features"]:
-    geom = feature["geometry"]
-    country = feature["properties"]["ADMIN"]
-    countries[country] = prep(shape(geom))
-
-# Get country name from longitude and latitude
-def get_country(lon, lat):
-    point = Point(lon, lat)
-    for country, geom in countries.items():
-        if geom.contains(point):
-            return country
-    return "unknown"
+# Load the offline country-boundary store (memory-mapped raster, built on first use)
+countries = open_store()
 
 start = time.time()  # Start timing
 file_path = r"D:\MLAP\PRT2\Test\02_211203_TUDA_data.csv"
-longterm = pd.read_csv(file_path)
-
-# Sort by timestamp
-lonterm_01 = longterm.sort_values(by='timestamp_measure_position')
+# Only the columns used below are read from the columnar cache
+longterm = read_longterm(file_path, columns=['wagon_ID', 'loading_state', 'latitude', 'longitude',
+                                             'timestamp_measure_position'])
+
+# Stop and trip tables of every wagon
+name = os.path.splitext(os.path.basename(file_path))[0]
+stops, trips = segment_tracks(longterm, keys=['wagon_ID'])
+stops['land'] = countries.lookup(stops['latitude'].values, stops['longitude'].values)
+trips['start_land'] = countries.lookup(trips['start_latitude'].values, trips['start_longitude'].values)
+trips['end_land'] = countries.lookup(trips['end_latitude'].values, trips['end_longitude'].values)
+stops.to_csv(f'stops_{name}.csv', index=False)
+trips.to_csv(f'trips_{name}.csv', index=False)
+del stops, trips
+
+# Sort by wagon, loading state and timestamp so that every track is contiguous (integer-key lexsort)
+lonterm_01 = longterm.iloc[track_order(longterm, ['wagon_ID', 'loading_state'], 'timestamp_measure_position')]
 del longterm
 gc.collect()
 
-# Create next-latitude/longitude columns for distance calculation
-lonterm_01['lat_next'] = lonterm_01.groupby(['wagon_ID', 'loading_state'])['latitude'].shift(-1)
-lonterm_01['lon_next'] = lonterm_01.groupby(['wagon_ID', 'loading_state'])['longitude'].shift(-1)
+# Vectorized haversine distance from each point to the next point of the same track
+track = lonterm_01.groupby(['wagon_ID', 'loading_state'], sort=False).ngroup().values
+lonterm_01['Dis'] = step_distance(lonterm_01['latitude'].values, lonterm_01['longitude'].values, track)
 
-# Remove rows with NaNs
-lonterm_01_nona = lonterm_01.dropna()
+# Remove the last point of each track (no distance) and points without ID, loading state, position or time.
+# Only these columns are checked: NaNs in the other raw columns (altitude, provider, ...) do not drop a point.
+lonterm_01_nona = lonterm_01.dropna(subset=['Dis', 'wagon_ID', 'loading_state', 'latitude', 'longitude',
+                                            'timestamp_measure_position'])
 del lonterm_01
 gc.collect()
 
-# Haversine distance function
-def Dis(series):
-    lon1 = series["longitude"]
-    lat1 = series["latitude"]
-    lat2 = series["lat_next"]
-    lon2 = series["lon_next"]
-    lon1, lat1, lon2, lat2 = map(radians, map(float, [lon1, lat1, lon2, lat2]))
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * asin(sqrt(a))
-    r = 6371  # Earth radius in kilometers
-    Dis = c * r
-    return Dis
-
-# Apply distance calculation
-lonterm_01_nona['Dis'] = lonterm_01_nona.agg(Dis, axis=1)
-
 df2 = lonterm_01_nona
 del lonterm_01_nona
 gc.collect()
@@ -93,9 +79,7 @@ gc.collect()
 # Create dataframe from mean values
 dict1 = {'lat': lat1.values, 'lon': lon1.values}
 df_lat_lon_mean = pd.DataFrame(dict1, index=lat1.index)
-lat = lat1.tolist()
-lgt = lon1.tolist()
-country_mean = [get_country(int(lgt[i]), int(lat[i])) for i in range(len(lat))]
+country_mean = countries.lookup(lat1.values, lon1.values)
 country_mean_sr = pd.Series(country_mean, index=lat1.index)
 del country_mean
 gc.collect()
@@ -105,9 +89,7 @@ df_lat_lon_mean.to_csv('mean.csv', mode='a')
 # Create dataframe from median values
 dict2 = {'lat': lat2.values, 'lon': lon2.values}
 df_lat_lon_median = pd.DataFrame(dict2, index=lat2.index)
-lat = lat2.tolist()
-lgt = lon2.tolist()
-country_median = [get_country(int(lgt[i]), int(lat[i])) for i in range(len(lat2))]
+country_median = countries.lookup(lat2.values, lon2.values)
 country_median_sr = pd.Series(country_median, index=lat2.index)
 del country_median
 gc.collect()
@@ -0,0 +1,90 @@
+"""
+Batch country lookup for arrays of GPS coordinates.
+
+Instead of testing one `Point` per row against every country polygon in a Python
+loop, the country geometries are stored in a bounding-box tree (shapely STRtree)
+and all points of a batch are classified in one vectorized query with exact,
+prepared containment tests. Coordinates are used as they are (no truncation).
+
+Steps:
+1. Load country geometries from a local GeoJSON file (downloaded once if it is missing).
+2. Build an STRtree over the (prepared) geometries.
+3. Deduplicate the coordinate pairs of a batch and query the tree for containing countries.
+4. Map the results back to every input row; points outside all countries get "unknown".
+"""
+
+import os
+import json
+import numpy as np
+import requests
+import shapely
+from shapely.geometry import shape
+from shapely.strtree import STRtree
+
+COUNTRIES_URL = "https://raw.githubusercontent.com/datasets/geo-countries/master/data/countries.geojson"
+# Local copy of the country boundaries; place the file here on machines without network access
+COUNTRIES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'countries.geojson')
+
+
+class CountryIndex:
+    """Spatial index over country polygons answering batch point-in-country queries."""
+
+    def __init__(self, names, geometries):
+        self.names = np.asarray(names, dtype=object)
+        self.geometries = np.asarray(geometries, dtype=object)
+        shapely.prepare(self.geometries)  # Prepared geometries make repeated containment tests cheap
+        self.tree = STRtree(self.geometries)
+
+    # Build the index from a GeoJSON FeatureCollection; `key` is the property used as country name
+    @classmethod
+    def from_geojson(cls, data, key='ADMIN'):
+        names = [feature["properties"][key] for feature in data["features"]]
+        geometries = [shape(feature["geometry"]) for feature in data["features"]]
+        return cls(names, geometries)
+
+    # Index into `names` of the country containing each point, -1 if none
+    def lookup_index(self, lat, lon):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        result = np.full(len(lat), -1, dtype=np.int32)
+        valid = np.isfinite(lat) & np.isfinite(lon)
+        if not valid.any():
+            return result
+
+        # Wagons report the same positions many times: classify every distinct pair only once
+        coords, inverse = np.unique(np.column_stack([lat[valid], lon[valid]]), axis=0, return_inverse=True)
+        points = shapely.points(coords[:, 1], coords[:, 0])
+        point_idx, geom_idx = self.tree.query(points, predicate='within')
+
+        # If polygons overlap, keep the first country in input order (same as the former linear scan)
+        order = np.lexsort((geom_idx, point_idx))
+        point_idx, geom_idx = point_idx[order], geom_idx[order]
+        first = np.ones(len(point_idx), dtype=bool)
+        first[1:] = point_idx[1:] != point_idx[:-1]
+        unique_result = np.full(len(coords), -1, dtype=np.int32)
+        unique_result[point_idx[first]] = geom_idx[first]
+
+        result[valid] = unique_result[inverse.ravel()]
+        return result
+
+    # Country name of each point, `unknown` for points outside all countries
+    def lookup(self, lat, lon, unknown="unknown"):
+        idx = self.lookup_index(lat, lon)
+        names = np.append(self.names, unknown)  # Index -1 selects `unknown`
+        return names[idx]
+
+
+# Load the country boundaries from the local file, downloading them once if the file is missing
+def load_geojson(path=COUNTRIES_FILE, url=COUNTRIES_URL):
+    if not os.path.exists(path):
+        response = requests.get(url)
+        response.raise_for_status()
+        with open(path, 'wb') as f:
+            f.write(response.content)
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+# Load the country boundaries and build the index
+def load_countries(path=COUNTRIES_FILE, key='ADMIN'):
+    return CountryIndex.from_geojson(load_geojson(path), key=key)
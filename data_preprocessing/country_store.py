@@ -0,0 +1,164 @@
+"""
+Offline country-boundary store with a precomputed lat/lon lookup raster.
+
+The country polygons are loaded once from the local GeoJSON copy (see
+country_lookup.py) and rasterized over Europe. Every raster cell holds the index
+of the country that completely covers it, NO_COUNTRY for cells that touch no
+country (sea), or BORDER for cells crossed by a boundary. Points in interior cells
+are answered by a single array lookup; only points in border cells or outside
+the raster fall back to exact polygon tests.
+
+The raster is saved as a .npy file next to a small JSON header, so loading the
+store is a single memory-mapped read and needs no network access. The header
+holds the SHA-256 of the GeoJSON file the raster was built from; the store is
+rebuilt when the file content changes.
+
+Steps:
+1. Load the country boundaries from the local GeoJSON file.
+2. Classify the raster cells row by row with a spatial-index query and exact coverage tests.
+3. Save the raster and header to the store folder.
+4. Look up points through the raster, resolving border cells with the exact index.
+
+Run this file directly to build the store once.
+"""
+
+import os
+import json
+import time
+import hashlib
+import numpy as np
+import shapely
+from country_lookup import CountryIndex, load_geojson, COUNTRIES_FILE
+
+STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'country_store')
+EUROPE_BOUNDS = (-25.0, 34.0, 45.0, 72.0)  # lon_min, lat_min, lon_max, lat_max
+GRID_RESOLUTION = 0.05  # Cell size in degrees
+NO_COUNTRY = -1
+BORDER = -2
+
+
+# SHA-256 of a file's content
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class CountryStore:
+    """Raster lookup table of countries with exact fallback for border cells."""
+
+    def __init__(self, grid, names, bounds, resolution, geojson_path=COUNTRIES_FILE, key='ADMIN'):
+        self.grid = grid
+        self.names = np.asarray(names, dtype=object)
+        self.bounds = tuple(bounds)
+        self.resolution = resolution
+        self.geojson_path = geojson_path
+        self.key = key
+        self._exact = None
+
+    # Exact polygon index, only built when a border cell or a point outside the raster is queried
+    @property
+    def exact(self):
+        if self._exact is None:
+            self._exact = CountryIndex.from_geojson(load_geojson(self.geojson_path), key=self.key)
+        return self._exact
+
+    # Rasterize the country polygons of `index` over `bounds`
+    @classmethod
+    def build(cls, index, bounds=EUROPE_BOUNDS, resolution=GRID_RESOLUTION, geojson_path=COUNTRIES_FILE,
+              key='ADMIN'):
+        lon_min, lat_min, lon_max, lat_max = bounds
+        n_cols = int(np.ceil((lon_max - lon_min) / resolution))
+        n_rows = int(np.ceil((lat_max - lat_min) / resolution))
+        grid = np.full((n_rows, n_cols), NO_COUNTRY, dtype=np.int16)
+        x0 = lon_min + np.arange(n_cols) * resolution
+
+        # One row of cells at a time keeps the number of temporary box geometries small
+        for row in range(n_rows):
+            y0 = lat_min + row * resolution
+            cells = shapely.box(x0, y0, x0 + resolution, y0 + resolution)
+            cell_idx, geom_idx = index.tree.query(cells, predicate='intersects')
+            hits = np.bincount(cell_idx, minlength=n_cols)
+
+            # A cell is interior if exactly one country intersects it and that country covers it
+            single = hits[cell_idx] == 1
+            covered = np.zeros(len(cell_idx), dtype=bool)
+            covered[single] = shapely.covers(index.geometries[geom_idx[single]], cells[cell_idx[single]])
+            grid[row, cell_idx[covered]] = geom_idx[covered]
+            grid[row, cell_idx[~covered]] = BORDER
+        return cls(grid, index.names, bounds, resolution, geojson_path, key)
+
+    # Write the raster (.npy) and its header (.json) to `directory`
+    def save(self, directory=STORE_DIR):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'grid.npy'), np.asarray(self.grid))
+        header = {'names': self.names.tolist(), 'bounds': self.bounds, 'resolution': self.resolution,
+                  'key': self.key, 'geojson_sha256': file_digest(self.geojson_path)}
+        with open(os.path.join(directory, 'header.json'), 'w', encoding='utf-8') as f:
+            json.dump(header, f)
+
+    # Memory-map a saved store
+    @classmethod
+    def load(cls, directory=STORE_DIR, geojson_path=COUNTRIES_FILE):
+        with open(os.path.join(directory, 'header.json'), encoding='utf-8') as f:
+            header = json.load(f)
+        grid = np.load(os.path.join(directory, 'grid.npy'), mmap_mode='r')
+        return cls(grid, header['names'], header['bounds'], header['resolution'], geojson_path, header['key'])
+
+    # Index into `names` of the country containing each point, -1 if none
+    def lookup_index(self, lat, lon):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        lon_min, lat_min = self.bounds[0], self.bounds[1]
+        n_rows, n_cols = self.grid.shape
+        with np.errstate(invalid='ignore'):
+            row = np.floor((lat - lat_min) / self.resolution)
+            col = np.floor((lon - lon_min) / self.resolution)
+            inside = (row >= 0) & (row < n_rows) & (col >= 0) & (col < n_cols)
+
+        result = np.full(len(lat), BORDER, dtype=np.int32)
+        result[inside] = self.grid[row[inside].astype(np.intp), col[inside].astype(np.intp)]
+
+        # Exact polygon tests only for border cells and points outside the raster
+        exact = (result == BORDER) & np.isfinite(lat) & np.isfinite(lon)
+        if exact.any():
+            result[exact] = self.exact.lookup_index(lat[exact], lon[exact])
+        result[result == BORDER] = NO_COUNTRY  # Remaining NaN coordinates
+        return result
+
+    # Country name of each point, `unknown` for points outside all countries
+    def lookup(self, lat, lon, unknown="unknown"):
+        idx = self.lookup_index(lat, lon)
+        names = np.append(self.names, unknown)  # Index -1 selects `unknown`
+        return names[idx]
+
+
+# True if the store in `directory` was built from the current boundary file with the same settings
+def _is_current(directory, geojson_path, bounds, resolution, key):
+    header_path = os.path.join(directory, 'header.json')
+    if not os.path.exists(header_path):
+        return False
+    with open(header_path, encoding='utf-8') as f:
+        header = json.load(f)
+    # Without the boundary file the saved raster is the only copy and is kept
+    if os.path.exists(geojson_path) and header.get('geojson_sha256') != file_digest(geojson_path):
+        return False
+    return tuple(header['bounds']) == tuple(bounds) and header['resolution'] == resolution and header['key'] == key
+
+
+# Load the store from `directory`, (re)building and saving it first if it is missing or outdated
+def open_store(directory=STORE_DIR, geojson_path=COUNTRIES_FILE, bounds=EUROPE_BOUNDS,
+               resolution=GRID_RESOLUTION, key='ADMIN'):
+    if not _is_current(directory, geojson_path, bounds, resolution, key):
+        index = CountryIndex.from_geojson(load_geojson(geojson_path), key=key)
+        CountryStore.build(index, bounds, resolution, geojson_path, key).save(directory)
+    return CountryStore.load(directory, geojson_path)
+
+
+if __name__ == '__main__':
+    start = time.time()
+    store = open_store()
+    border = np.mean(np.asarray(store.grid) == BORDER)
+    print(f"country store with {store.grid.shape} cells ({border:.1%} border) ready in {time.time() - start:.2f} seconds")
@@ -1,35 +1,52 @@
 """
 This script reads multiple clustered CSV files containing GNSS and signal quality data,
-concatenates them into a single DataFrame, and saves the result to a new CSV file.
+merges them into a single file, and saves the result to a new CSV file.
 
 Steps:
 1. Load all CSV files from the input folder.
-2. Concatenate them into one DataFrame.
-3. Save the merged data to a target CSV file.
+2. Stream them chunk by chunk into one output file, checking the columns of every file
+   (see streaming_merge.py); each row is copied once instead of re-concatenating the whole frame.
+3. Optionally drop duplicate rows across all files.
+4. Optionally (SKETCH_GLOB) merge per-file cluster sketches (see cluster_sketch.py) into one
+   table of per-cluster count, mean, std and quality percentiles, without reading any points.
 """
 
-import pandas as pd
 import glob
-import gc
 import os
+import time
+from streaming_merge import merge_files  # Linear-time streaming merge
+from tuda_schema import PREPROCESSED_DTYPES  # Compact typed schema
+from cluster_sketch import read_sketch, merge_sketches, summarize  # Mergeable per-cluster statistics
 
-# Path to the folder containing the 45 long-term data CSVs
-file_pathr = r"D:\MLAP\PRT2\ClusteredCellular\*.csv"
+start = time.time()  # Start timing
+
+# Path to the folder containing the 45 long-term data CSVs (environment variables override the paths)
+file_pathr = os.environ.get('CLUSTERED_GLOB', r"D:\MLAP\PRT2\ClusteredCellular\*.csv")
 # Output directory
-file_pathw = r'D:\MLAP\PRT2\write'
+file_pathw = os.environ.get('MERGED_DIR', r'D:\MLAP\PRT2\write')
+
+OUTPUT_FORMAT = 'csv'  # 'csv' -> Cellular.csv, 'parquet' -> Cellular.parquet
+DEDUPLICATE = False  # Drop rows that appear more than once across the input files
+# Per-file cluster sketches with shared cluster IDs (e.g. global clustering mode); empty = skip
+SKETCH_GLOB = os.environ.get('SKETCH_GLOB', '')
 
-# Read all CSV file paths from the input folder
-csv_listr = glob.glob(file_pathr)
+# Read all CSV file paths from the input folder (sorted for a reproducible row order)
+csv_listr = sorted(glob.glob(file_pathr))
 
-# Initialize an empty DataFrame with expected columns
+# Expected columns of every input file
 columns1 = ['latitude', 'longitude', 'signal_quality']
-GNSS = pd.DataFrame(columns=columns1, index=None)
 
-# Loop over all CSVs and concatenate them
-for i in range(len(csv_listr)):
-    with open(csv_listr[i]) as r:
-        longterm = pd.read_csv(r)
-        GNSS = pd.concat([longterm, GNSS])
+# Append all CSVs to the merged output file
+output_file = os.path.join(file_pathw, 'Cellular.' + OUTPUT_FORMAT)
+n_rows = merge_files(csv_listr, output_file, columns=columns1, output_format=OUTPUT_FORMAT, dedupe=DEDUPLICATE,
+                     dtype=PREPROCESSED_DTYPES)
+
+# Merge cluster statistics instead of raw rows
+if SKETCH_GLOB:
+    sketch = merge_sketches([read_sketch(p) for p in sorted(glob.glob(SKETCH_GLOB))])
+    stats = summarize(sketch, columns1, quantile_column='signal_quality')
+    stats.to_csv(os.path.join(file_pathw, 'ClusterStats.csv'))
+    print("{} clusters written to ClusterStats.csv".format(len(stats)))
 
-# Save the concatenated result
-GNSS.to_csv(os.path.join(file_pathw, 'Cellular.csv'), index=None)
+end = time.time()  # End timing
+print("{} rows written to {}, run time = {}".format(n_rows, output_file, end - start))
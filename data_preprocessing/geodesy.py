@@ -0,0 +1,95 @@
+"""
+Vectorized geodesic kernels for wagon GPS tracks.
+
+All functions work on whole columns (numpy arrays or pandas Series) at once
+instead of calling Python `math` functions row by row.
+
+Track functions expect the points of one wagon (or any other group key) to be
+contiguous and sorted by time, e.g. after
+`df.sort_values(['wagon_ID', 'timestamp_measure_position'])`. The value of the
+step functions belongs to the step from a point to the next point of the same
+group; the last point of every group gets NaN.
+
+Functions:
+- haversine / bearing: distance (km) and initial bearing (degrees) between point pairs.
+- next_in_group: value of the next row within the same group.
+- step_distance / step_bearing / step_speed: consecutive-point kernels.
+- cumulative_distance: distance travelled since the first point of each group.
+"""
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371  # Earth radius in kilometers
+
+
+# Great-circle distance in km between (lat1, lon1) and (lat2, lon2), all in degrees
+def haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=np.float64)) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+# Initial bearing in degrees (0 = north, 90 = east) from (lat1, lon1) towards (lat2, lon2)
+def bearing(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=np.float64)) for a in (lat1, lon1, lat2, lon2))
+    dlon = lon2 - lon1
+    x = np.sin(dlon) * np.cos(lat2)
+    y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+    return np.degrees(np.arctan2(x, y)) % 360
+
+
+# Boolean mask of rows that are the last row of their group (groups must be contiguous)
+def last_in_group(groups, n):
+    last = np.ones(n, dtype=bool)
+    if groups is not None and n > 1:
+        groups = np.asarray(groups)
+        last[:-1] = groups[1:] != groups[:-1]
+    elif n > 0:
+        last[:-1] = False
+    return last
+
+
+# Value of the next row within the same group, NaN for the last row of each group
+def next_in_group(values, groups=None):
+    values = np.asarray(values, dtype=np.float64)
+    nxt = np.empty_like(values)
+    nxt[:-1] = values[1:]
+    nxt[last_in_group(groups, len(values))] = np.nan
+    return nxt
+
+
+# Distance in km from each point to the next point of the same group
+def step_distance(lat, lon, groups=None):
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    return haversine(lat, lon, next_in_group(lat, groups), next_in_group(lon, groups))
+
+
+# Bearing in degrees from each point to the next point of the same group
+def step_bearing(lat, lon, groups=None):
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    return bearing(lat, lon, next_in_group(lat, groups), next_in_group(lon, groups))
+
+
+# Speed in km/h from each point to the next point of the same group; `seconds` is the time of each point
+def step_speed(lat, lon, seconds, groups=None):
+    dt = next_in_group(seconds, groups) - np.asarray(seconds, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speed = step_distance(lat, lon, groups) / (dt / 3600)
+    speed[dt <= 0] = np.nan  # Duplicate or unsorted timestamps have no defined speed
+    return speed
+
+
+# Distance in km travelled since the first point of the group, 0 for the first point
+def cumulative_distance(lat, lon, groups=None):
+    n = len(lat)
+    steps = np.nan_to_num(step_distance(lat, lon, groups))
+    total = np.zeros(n)
+    if n > 1:
+        total[1:] = np.cumsum(steps[:-1])
+    # Subtract the running total at the first point of each group
+    first = np.ones(n, dtype=bool)
+    first[1:] = last_in_group(groups, n)[:-1]
+    offsets = total[first]
+    return total - offsets[np.cumsum(first) - 1]
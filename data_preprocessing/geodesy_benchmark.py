@@ -0,0 +1,62 @@
+"""
+This script benchmarks the vectorized haversine kernel of geodesy.py against
+the former row-wise `Dis()` path of country_determination_wagon.py.
+
+Steps:
+1. Generate a synthetic wagon track table with the long-term column names.
+2. Time the row-wise path (`DataFrame.agg(Dis, axis=1)` with Python `math`).
+3. Time the vectorized path (`geodesy.step_distance` on whole columns).
+4. Check that both paths give the same distances and print the speed-up.
+"""
+
+import numpy as np
+import pandas as pd
+from math import radians, cos, sin, asin, sqrt
+import time
+from geodesy import step_distance
+
+n_rows = [10_000, 100_000, 1_000_000]  # Table sizes to benchmark
+n_wagons = 500
+
+
+# Former row-wise haversine distance function
+def Dis(series):
+    lon1 = series["longitude"]
+    lat1 = series["latitude"]
+    lat2 = series["lat_next"]
+    lon2 = series["lon_next"]
+    lon1, lat1, lon2, lat2 = map(radians, map(float, [lon1, lat1, lon2, lat2]))
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
+    c = 2 * asin(sqrt(a))
+    r = 6371  # Earth radius in kilometers
+    Dis = c * r
+    return Dis
+
+
+rng = np.random.default_rng(42)
+for n in n_rows:
+    df = pd.DataFrame({
+        'wagon_ID': np.sort(rng.integers(0, n_wagons, n)),
+        'latitude': rng.uniform(47, 55, n),
+        'longitude': rng.uniform(6, 15, n),
+    })
+
+    # Row-wise path (as in the original script)
+    start = time.time()
+    df['lat_next'] = df.groupby('wagon_ID')['latitude'].shift(-1)
+    df['lon_next'] = df.groupby('wagon_ID')['longitude'].shift(-1)
+    df_nona = df.dropna()
+    dis_rowwise = df_nona.agg(Dis, axis=1).values
+    t_rowwise = time.time() - start
+
+    # Vectorized path
+    start = time.time()
+    dis_vector = step_distance(df['latitude'].values, df['longitude'].values, df['wagon_ID'].values)
+    dis_vector = dis_vector[~np.isnan(dis_vector)]
+    t_vector = time.time() - start
+
+    max_diff = np.abs(dis_rowwise - dis_vector).max()
+    print(f"rows = {n:>9}: row-wise {t_rowwise:8.3f} s, vectorized {t_vector:8.4f} s, "
+          f"speed-up {t_rowwise / t_vector:8.1f}x, max difference {max_diff:.2e} km")
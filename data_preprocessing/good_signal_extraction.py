@@ -4,84 +4,67 @@ based on timestamp delays. The signal quality is mapped to a 0–256 scale based
 latency between position measurement, transfer, and reception.
 
 Steps:
-1. Load and filter data where position was determined by cellular data.
-2. Remove unnecessary columns.
-3. Extract days and time from timestamp strings.
-4. Calculate time differences between measurement and transfer timestamps.
+1. Load data where position was determined by cellular data.
+2. Read only the necessary columns.
+3. Parse the "N days HH:MM:SS" timestamps into day and second of day (vectorized, see timestamp_parser.py).
+4. Calculate time differences (in seconds) between measurement and transfer timestamps.
 5. Identify samples with <30s delay as "good signal".
 6. Compute signal quality based on delay between transfer and reception.
 7. Export the "good signal" dataset to CSV.
 """
 
 import pandas as pd
-from datetime import datetime
 import time
+from columnar_cache import read_longterm  # Parquet ingest cache of the raw CSVs
+from timestamp_parser import duration_seconds, split_days, NAT_SECONDS  # Vectorized timestamp parser
 
 start = time.time()  # Start timing
 
-# Load dataset indexed by 'wagon_ID'
-table = pd.read_csv(r"D:\MLAP\PRT2\Test\35_211203_TUDA_data.csv", index_col='wagon_ID')
+# Load only cellular-positioned entries (filter pushed down to the cache scan), indexed by 'wagon_ID'
+table = read_longterm(r"D:\MLAP\PRT2\Test\35_211203_TUDA_data.csv",
+                      columns=['wagon_ID', 'latitude', 'longitude', 'timestamp_measure_position',
+                               'timestamp_transfer', 'timestamp_index'],
+                      determination_position=4).set_index('wagon_ID')
 
-# Filter only cellular-positioned entries
-table = table[table['determination_position'].isin([4])]
-
-# Drop unnecessary columns
-table = table.drop(labels=[
-    'loading_state', 'loading_state_update', 'altitude',
-    'signal_quality_satellite', 'signal_quality_hdop', 'determination_position',
-    'GNSS_velocity', 'movement_state', 'timestamp_measure_movement_state', 'provider'
-], axis=1)
-
-# Extract day and hour from timestamp columns
+# Parse each timestamp column once into int64 seconds and split it into day and second of day
 def transdayhour(df, position, day, hour):
-    df.loc[:, 'Timestamp_measure'] = df[position].str.split(' days ')
-    p = [df.loc[:, 'Timestamp_measure'].values[x][0] for x in range(len(df))]
-    df.loc[:, day] = p
-    p = [df.loc[:, 'Timestamp_measure'].values[x][1] for x in range(len(df))]
-    df.loc[:, hour] = p
-    return df
-
-transdayhour(table, 'timestamp_measure_position', 'Timestamp_measure_position_day', 'Timestamp_measure_position_hour')
-transdayhour(table, 'timestamp_transfer', 'Timestamp_measure_transfer_day', 'Timestamp_measure_transfer_hour')
-
-# Convert day strings to integers
-def str_num_to_int(df, time_day):
-    data_int = list(map(int, map(eval, df[time_day].values)))
-    df.loc[:, time_day] = data_int
-    return df
+    seconds = duration_seconds(df[position])
+    df.loc[:, day], df.loc[:, hour] = split_days(seconds)
+    return seconds != NAT_SECONDS  # Rows with a valid timestamp
 
-str_num_to_int(table, 'Timestamp_measure_position_day')
-str_num_to_int(table, 'Timestamp_measure_transfer_day')
+valid_measure = transdayhour(table, 'timestamp_measure_position', 'Timestamp_measure_position_day', 'Timestamp_measure_position_second')
+valid_transfer = transdayhour(table, 'timestamp_transfer', 'Timestamp_measure_transfer_day', 'Timestamp_measure_transfer_second')
 
-# Compute day and hour difference between measurement and transfer
+# Compute day and time-of-day difference (seconds) between measurement and transfer
 def timediff(df):
     df.loc[:, 'day_diff'] = df['Timestamp_measure_transfer_day'] - df['Timestamp_measure_position_day']
-    df.loc[:, 'hour_diff'] = pd.to_datetime(df['Timestamp_measure_transfer_hour']) - pd.to_datetime(df['Timestamp_measure_position_hour'])
+    df.loc[:, 'hour_diff'] = df['Timestamp_measure_transfer_second'] - df['Timestamp_measure_position_second']
     return df
 
 timediff(table)
 
-# Define 30s and 0s timedelta for thresholding
-delta_30s = datetime(2000, 7, 14, 8, 15, 30) - datetime(2000, 7, 14, 8, 15, 0)
-delta_0s = datetime(2000, 7, 14, 8, 15, 0) - datetime(2000, 7, 14, 8, 15, 0)
+# Latency thresholds in seconds
+delta_30s = 30
+delta_0s = 0
 
-# Identify good and bad signal samples
-table_goodsignal = table[(table['hour_diff'] <= delta_30s) & (table['hour_diff'] >= delta_0s) & (table['day_diff'] == 0)]
-table_nosignal = table[(table['day_diff'] != 0) | (table['hour_diff'] > delta_30s) | (table['hour_diff'] < delta_0s)]
+# Identify good and bad signal samples (plain integer comparisons)
+good = (valid_measure & valid_transfer & (table['hour_diff'] <= delta_30s) & (table['hour_diff'] >= delta_0s)
+        & (table['day_diff'] == 0))
+table_goodsignal = table[good].copy()
+table_nosignal = table[~good]
 
-# Further split timestamp_index into day and hour
-transdayhour(table_goodsignal, 'timestamp_index', 'Timestamp_receive_day', 'Timestamp_receive_hour')
-str_num_to_int(table_goodsignal, 'Timestamp_receive_day')
+# Split timestamp_index into day and second of day
+valid_receive = transdayhour(table_goodsignal, 'timestamp_index', 'Timestamp_receive_day', 'Timestamp_receive_second')
 
-# Compute time difference between transfer and receive timestamps
-def timediff_receive(df):
-    df.loc[:, 'day_diff_receive'] = df['Timestamp_receive_day'] - df['Timestamp_measure_transfer_day']
-    df.loc[:, 'hour_diff_receive'] = pd.to_datetime(df['Timestamp_receive_hour']) - pd.to_datetime(df['Timestamp_measure_transfer_hour'])
+# Compute time difference (seconds) between transfer and receive timestamps; NaN where timestamp_index is NaT
+def timediff_receive(df, valid):
+    df.loc[:, 'day_diff_receive'] = (df['Timestamp_receive_day'] - df['Timestamp_measure_transfer_day']).where(valid)
+    df.loc[:, 'hour_diff_receive'] = (df['Timestamp_receive_second'] - df['Timestamp_measure_transfer_second']).where(valid)
     return df
 
-timediff_receive(table_goodsignal)
+timediff_receive(table_goodsignal, valid_receive)
 
-# Map delay to signal quality (0 = 30s, 256 = 0s)
+# Map delay to signal quality (0 = 30s, 256 = 0s); rows without a receive timestamp get NaN
 table_goodsignal.loc[:, 'signal_quality'] = (1 - table_goodsignal['hour_diff_receive'] / delta_30s) * 256
 
 # Export good signal samples
@@ -0,0 +1,39 @@
+"""
+Chunked reading and uniform random sampling of the preprocessed (lat, lon, quality) files.
+
+A whole preprocessed file does not need to fit in memory: the points are read in
+chunks of chunk_rows rows. A uniform random sample of all points of all files is
+drawn in the same single pass by bottom-k sampling: every point gets a random key
+and the `size` points with the smallest keys seen so far are kept.
+
+Functions:
+- iter_chunks: (lat, lon, quality) chunks of one preprocessed file.
+- sample_points: uniform random (lat, lon) sample over several files.
+"""
+
+import numpy as np
+import pandas as pd
+from tuda_schema import PREPROCESSED_DTYPES  # Compact typed schema (float32 coordinates)
+
+CHUNK_ROWS = 1_000_000  # Rows read at a time
+
+
+# Stream (lat, lon, quality) chunks of at most chunk_rows rows from one preprocessed file
+def iter_chunks(csv_path, chunk_rows=CHUNK_ROWS):
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_rows, dtype=PREPROCESSED_DTYPES):
+        yield chunk.iloc[:, :3]
+
+
+# Uniform random sample of `size` (lat, lon) points over all files, drawn in one streaming pass
+def sample_points(csv_list, size, rng, chunk_rows=CHUNK_ROWS):
+    sample = np.empty((0, 2), dtype=np.float32)
+    keys = np.empty(0)
+    for csv_path in csv_list:
+        for chunk in iter_chunks(csv_path, chunk_rows):
+            # Keep the points with the smallest random keys seen so far (bottom-k sampling)
+            sample = np.vstack([sample, chunk.iloc[:, :2].to_numpy()])
+            keys = np.concatenate([keys, rng.random(len(chunk))])
+            if len(keys) > size:
+                keep = np.argpartition(keys, size)[:size]
+                sample, keys = sample[keep], keys[keep]
+    return sample
@@ -0,0 +1,95 @@
+"""
+Linear-time merge of many CSV files into one CSV file or Parquet file.
+
+Each input is read in chunks and appended straight to the output, so every row
+is copied once and peak memory is one chunk instead of the whole dataset.
+Every chunk is checked against the expected columns, and duplicate rows can
+optionally be dropped across all inputs.
+
+Steps:
+1. Read each input file chunk by chunk.
+2. Check the columns of every chunk against the expected schema.
+3. Optionally drop rows whose hash was already written.
+4. Append the chunk to the output CSV (header once) or Parquet file.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+class _HashSet:
+    """Set of uint64 row hashes kept as a few sorted numpy blocks (merged like a binary counter)."""
+
+    def __init__(self):
+        self.blocks = []
+
+    # Boolean mask of the hashes that are already in the set
+    def contains(self, hashes):
+        found = np.zeros(len(hashes), dtype=bool)
+        for block in self.blocks:
+            if not len(block):
+                continue
+            pos = np.searchsorted(block, hashes).clip(max=len(block) - 1)
+            found |= block[pos] == hashes
+        return found
+
+    def add(self, hashes):
+        block = np.unique(hashes)
+        if not len(block):
+            return
+        # Merge with the newest blocks while they are not larger, so each hash is re-copied O(log n) times
+        while self.blocks and len(self.blocks[-1]) <= len(block):
+            block = np.union1d(self.blocks.pop(), block)
+        self.blocks.append(block)
+
+
+# Merge `paths` into `output`; returns the number of rows written
+def merge_files(paths, output, columns=None, output_format='csv', dedupe=False, chunk_rows=1_000_000, dtype=None):
+    seen = _HashSet() if dedupe else None
+    writer = None  # Parquet writer, opened with the schema of the first chunk
+    first = True
+    n_rows = 0
+    if os.path.exists(output):
+        os.remove(output)
+
+    try:
+        for path in paths:
+            for chunk in pd.read_csv(path, chunksize=chunk_rows, dtype=dtype):
+                # Schema check: the expected columns must be present (extra columns are dropped)
+                if columns is None:
+                    columns = list(chunk.columns)
+                missing = [c for c in columns if c not in chunk.columns]
+                if missing:
+                    raise ValueError(f"{path}: missing columns {missing}, expected {columns}")
+                chunk = chunk[columns]
+
+                if dedupe:
+                    hashes = pd.util.hash_pandas_object(chunk, index=False).values
+                    _, first_idx = np.unique(hashes, return_index=True)
+                    keep = np.zeros(len(chunk), dtype=bool)
+                    keep[first_idx] = True  # First occurrence inside the chunk
+                    keep &= ~seen.contains(hashes)  # Not written by an earlier chunk
+                    seen.add(hashes[keep])
+                    chunk = chunk[keep]
+
+                if output_format == 'csv':
+                    chunk.to_csv(output, mode='a', header=first, index=False)
+                elif output_format == 'parquet':
+                    if first:
+                        table = pa.Table.from_pandas(chunk, preserve_index=False)
+                        writer = pq.ParquetWriter(output, table.schema)
+                    else:
+                        # Raises if a later file has incompatible column types
+                        table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+                    writer.write_table(table)
+                else:
+                    raise ValueError(f"unknown output format {output_format!r}")
+                first = False
+                n_rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n_rows
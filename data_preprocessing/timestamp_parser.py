@@ -0,0 +1,41 @@
+"""
+Column-level parser for the "N days HH:MM:SS" timestamps of the TUDA data.
+
+The long-term files store every timestamp as a duration string such as
+"3 days 08:15:30" (or "NaT" when missing). These functions convert whole
+columns in one vectorized pass into timedelta64 or int64 seconds, without
+splitting strings or evaluating the day part row by row. Day and time-of-day
+then follow from integer division.
+
+Functions:
+- parse_duration: column -> timedelta64[ns] array (NaT stays NaT).
+- duration_seconds: column -> int64 seconds, NAT_SECONDS for missing values.
+- split_days: int64 seconds -> (day, second of day).
+"""
+
+import numpy as np
+import pandas as pd
+
+SECONDS_PER_DAY = 86400
+NAT_SECONDS = np.iinfo(np.int64).min  # Value of missing timestamps in int64 seconds (same bits as NaT)
+
+
+# Parse a column of "N days HH:MM:SS" strings (or timedeltas) into a timedelta64[ns] array
+def parse_duration(values):
+    values = pd.Series(values) if not isinstance(values, pd.Series) else values
+    if not pd.api.types.is_timedelta64_dtype(values.dtype):
+        values = pd.to_timedelta(values, errors='coerce')
+    return values.to_numpy(dtype='timedelta64[ns]')
+
+
+# Parse a column of "N days HH:MM:SS" strings (or timedeltas) into int64 seconds
+def duration_seconds(values):
+    ns = parse_duration(values).view(np.int64)
+    seconds = ns // 1_000_000_000
+    seconds[ns == NAT_SECONDS] = NAT_SECONDS
+    return seconds
+
+
+# Split int64 seconds into the day number and the second of that day
+def split_days(seconds):
+    return np.divmod(seconds, SECONDS_PER_DAY)
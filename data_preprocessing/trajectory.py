@@ -0,0 +1,143 @@
+"""
+Vectorized segmentation of wagon GPS tracks into stops and trips.
+
+A track is the time-ordered sequence of fixes of one wagon (or of one
+wagon/loading state pair). Every step from a fix to the next fix of the same
+track is classified, and runs of equal steps become segments:
+1. A step is "still" if the wagon moved at most STOP_DISTANCE_KM at no more than
+   STOP_SPEED_KMH (GPS jitter, or a parked wagon whose logger reports rarely).
+2. Runs of moving steps that cover less than STOP_DISTANCE_KM in total are jitter
+   inside a stop and become still.
+3. A still run may not drift: the first step whose end fix lies more than
+   MAX_STOP_RADIUS_KM from the first fix (anchor) of its run becomes moving, and the
+   rest of the run is checked against its own anchor.
+4. Runs of still steps shorter than MIN_STOP_SECONDS are halts in traffic and
+   become moving.
+5. The remaining still runs are stops, the moving runs between them are trips.
+   Adjacent segments share their boundary fix (the arrival fix ends the trip and
+   starts the stop).
+
+Sorting uses one np.lexsort over integer keys (category codes and int64
+timestamps) instead of a DataFrame sort over the ID strings, and every step is
+computed on whole columns (see geodesy.py).
+
+Tables:
+- stops: track keys, start, end, duration_s, latitude/longitude (median of the fixes), n_fixes
+- trips: track keys, start, end, duration_s, distance_km, start/end latitude and longitude, n_fixes
+
+Functions:
+- track_order: row order that makes every track contiguous and sorted by time.
+- segment_tracks: stops and trips tables of a frame of fixes.
+"""
+
+import numpy as np
+import pandas as pd
+from geodesy import haversine, last_in_group
+
+STOP_DISTANCE_KM = 0.3  # Max. length of a still step (and min. travelled distance of a trip)
+STOP_SPEED_KMH = 5  # Max. speed of a still step
+MAX_STOP_RADIUS_KM = 1.0  # Max. distance of a fix of a stop from the first fix of the stop
+MIN_STOP_SECONDS = 15 * 60  # Shorter still runs are not stops
+
+STOP_COLUMNS = ['start', 'end', 'duration_s', 'n_fixes', 'latitude', 'longitude']
+TRIP_COLUMNS = ['start', 'end', 'duration_s', 'n_fixes', 'distance_km',
+                'start_latitude', 'start_longitude', 'end_latitude', 'end_longitude']
+
+
+# Integer codes of a key column (category codes without a copy of the strings)
+def _codes(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy()
+    return pd.factorize(values)[0]
+
+
+# Row order that groups the rows by `keys` and sorts every group by time (int64 ns)
+def track_order(df, keys, time_column):
+    t = df[time_column].to_numpy(dtype='timedelta64[ns]').view(np.int64)
+    return np.lexsort([t] + [_codes(df[k]) for k in reversed(keys)])
+
+
+# Run ID of every element: a new run starts at a new track or a new label
+def _run_ids(track, label):
+    new = np.r_[True, (track[1:] != track[:-1]) | (label[1:] != label[:-1])]
+    return np.cumsum(new) - 1, np.flatnonzero(new)
+
+
+# Stops and trips of the fixes in df (columns: keys, latitude, longitude, time_column; timestamps as timedelta)
+def segment_tracks(df, keys=('wagon_ID',), time_column='timestamp_measure_position'):
+    keys = list(keys)
+    df = df[df[time_column].notna() & df['latitude'].notna() & df['longitude'].notna()]
+    df = df.iloc[track_order(df, keys, time_column)].reset_index(drop=True)
+    # Track number of every fix: a new track starts where any key changes
+    change = np.zeros(len(df), dtype=bool)
+    for k in keys:
+        c = _codes(df[k])
+        change[1:] |= c[1:] != c[:-1]
+    track = np.cumsum(change)
+    lat = df['latitude'].to_numpy(dtype=np.float64)
+    lon = df['longitude'].to_numpy(dtype=np.float64)
+    t = df[time_column].to_numpy(dtype='timedelta64[ns]').view(np.int64)
+
+    # Steps from every fix to the next fix of its track (the last fix of a track has no step)
+    step = np.flatnonzero(~last_in_group(track, len(df)))
+    if not len(step):
+        # No track has two fixes: no stops and no trips
+        return pd.DataFrame(columns=keys + STOP_COLUMNS), pd.DataFrame(columns=keys + TRIP_COLUMNS)
+    s_track = track[step]
+    dist = haversine(lat[step], lon[step], lat[step + 1], lon[step + 1])
+    dt = (t[step + 1] - t[step]) / 1e9
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speed = np.where(dt > 0, dist / (dt / 3600), np.inf)
+    still = (dist <= STOP_DISTANCE_KM) & (speed <= STOP_SPEED_KMH)
+
+    # Moving runs with a small travelled distance (sum of the step lengths) are jitter inside a stop
+    run, first = _run_ids(s_track, still)
+    travelled = np.bincount(run, weights=dist)
+    still = still | (travelled[run] < STOP_DISTANCE_KM)
+
+    # Slow drift is no stop: the first step of a still run that leaves MAX_STOP_RADIUS_KM around the
+    # first fix of the run becomes moving, which starts a new run (and anchor) behind it
+    while True:
+        run, first = _run_ids(s_track, still)
+        idx = np.flatnonzero(still)
+        anchor = step[first[run[idx]]]
+        away = haversine(lat[anchor], lon[anchor], lat[step[idx] + 1], lon[step[idx] + 1]) > MAX_STOP_RADIUS_KM
+        if not away.any():
+            break
+        _, first_away = np.unique(run[idx[away]], return_index=True)
+        still[idx[away][first_away]] = False
+
+    # Still runs shorter than MIN_STOP_SECONDS are halts in traffic
+    run, first = _run_ids(s_track, still)
+    duration = np.bincount(run, weights=dt)
+    still = still & (duration[run] >= MIN_STOP_SECONDS)
+
+    # Final segments: steps first..last cover the fixes step[first] .. step[last] + 1
+    run, first = _run_ids(s_track, still)
+    last = np.r_[first[1:] - 1, len(step) - 1]
+    fix_first, fix_last = step[first], step[last] + 1
+    seg = pd.DataFrame({k: df[k].to_numpy()[fix_first] for k in keys})
+    seg['start'] = pd.to_timedelta(t[fix_first], unit='ns')
+    seg['end'] = pd.to_timedelta(t[fix_last], unit='ns')
+    seg['duration_s'] = (t[fix_last] - t[fix_first]) / 1e9
+    seg['n_fixes'] = fix_last - fix_first + 1
+    is_stop = still[first]
+
+    # Stops: dwell location = median of the fixes of the stop
+    n_fix = (fix_last - fix_first + 1)[is_stop]
+    stop_fix = np.repeat(np.flatnonzero(is_stop), n_fix)
+    fix_idx = np.repeat(fix_first[is_stop] - (np.cumsum(n_fix) - n_fix), n_fix) + np.arange(n_fix.sum())
+    dwell = pd.DataFrame({'seg': stop_fix, 'latitude': lat[fix_idx], 'longitude': lon[fix_idx]}) \
+        .groupby('seg', sort=True).median()
+    stops = seg[is_stop].copy()
+    stops['latitude'] = dwell['latitude'].to_numpy()
+    stops['longitude'] = dwell['longitude'].to_numpy()
+
+    # Trips: travelled distance and end points
+    trips = seg[~is_stop].copy()
+    trips['distance_km'] = np.bincount(run, weights=dist)[~is_stop]
+    trips['start_latitude'] = lat[fix_first[~is_stop]]
+    trips['start_longitude'] = lon[fix_first[~is_stop]]
+    trips['end_latitude'] = lat[fix_last[~is_stop]]
+    trips['end_longitude'] = lon[fix_last[~is_stop]]
+    return stops.reset_index(drop=True), trips.reset_index(drop=True)
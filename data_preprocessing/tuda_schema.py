@@ -0,0 +1,108 @@
+"""
+Central schema of the TUDA long-term files, the wagon type mapping and the
+preprocessed (lat, lon, quality) files.
+
+Letting pandas infer the dtypes turns wagon IDs and states into object strings
+and every number into 64 bit. The compact types below (categorical IDs and
+states, float32 coordinates, small integer codes and parsed timestamps) need
+about a third of that memory. Every loader should read through this module (or
+through the columnar cache, which stores the data in these types).
+
+Contents:
+- LONGTERM_*: column types of the raw long-term files (pandas and Arrow).
+- WAGON_TYPE_DTYPES: column types of the wagon type mapping.
+- PREPROCESSED_DTYPES: column types of preprocessed, clustered and merged files.
+- read_longterm_csv / read_wagon_type_mapping / read_preprocessed_csv: typed CSV readers.
+- apply_longterm_schema: cast an already loaded long-term frame.
+"""
+
+import pandas as pd
+import pyarrow as pa
+from timestamp_parser import parse_duration
+
+# Timestamps are stored as "N days HH:MM:SS" and parsed to timedelta64
+LONGTERM_TIMESTAMP_COLUMNS = ['timestamp_measure_position', 'timestamp_transfer',
+                              'timestamp_measure_movement_state', 'timestamp_index']
+LONGTERM_CATEGORY_COLUMNS = ['wagon_ID', 'loading_state', 'loading_state_update', 'movement_state', 'provider']
+
+# pandas dtypes of the raw long-term columns (timestamps are parsed separately)
+LONGTERM_DTYPES = {
+    'wagon_ID': 'category',
+    'loading_state': 'category',
+    'loading_state_update': 'category',
+    'altitude': 'float32',
+    'latitude': 'float32',
+    'longitude': 'float32',
+    'signal_quality_satellite': 'float32',
+    'signal_quality_hdop': 'float32',
+    'determination_position': 'Int8',
+    'GNSS_velocity': 'float32',
+    'movement_state': 'category',
+    'provider': 'category',
+}
+
+# Arrow types used to parse the raw CSV (timestamps are read as strings and parsed afterwards)
+LONGTERM_ARROW_TYPES = {
+    'wagon_ID': pa.string(),
+    'loading_state': pa.string(),
+    'loading_state_update': pa.string(),
+    'altitude': pa.float32(),
+    'latitude': pa.float32(),
+    'longitude': pa.float32(),
+    'signal_quality_satellite': pa.float32(),
+    'signal_quality_hdop': pa.float32(),
+    'determination_position': pa.int8(),
+    'GNSS_velocity': pa.float32(),
+    'timestamp_measure_position': pa.string(),
+    'timestamp_transfer': pa.string(),
+    'movement_state': pa.string(),
+    'timestamp_measure_movement_state': pa.string(),
+    'timestamp_index': pa.string(),
+    'provider': pa.string(),
+}
+LONGTERM_ARROW_TIMESTAMP_TYPE = pa.duration('ns')
+
+WAGON_TYPE_DTYPES = {
+    'wagon_ID': 'category',
+    'wagon_type': 'int8',
+}
+
+# Preprocessed GNSS files (lat, lon, quality) and clustered/merged files (latitude, longitude, signal_quality)
+PREPROCESSED_DTYPES = {
+    'lat': 'float32',
+    'lon': 'float32',
+    'quality': 'float32',
+    'latitude': 'float32',
+    'longitude': 'float32',
+    'signal_quality': 'float32',
+    'group': 'int32',
+    'n': 'int64',
+    'wagon_ID': 'category',
+}
+
+
+# Cast the columns of a loaded long-term frame to the compact schema and parse its timestamps
+def apply_longterm_schema(df):
+    dtypes = {c: t for c, t in LONGTERM_DTYPES.items() if c in df.columns and df[c].dtype != t}
+    if dtypes:
+        df = df.astype(dtypes)
+    for c in LONGTERM_TIMESTAMP_COLUMNS:
+        if c in df.columns and not pd.api.types.is_timedelta64_dtype(df[c].dtype):
+            df[c] = parse_duration(df[c])
+    return df
+
+
+# Read a raw long-term CSV directly into the compact schema
+def read_longterm_csv(path, usecols=None, **kwargs):
+    df = pd.read_csv(path, usecols=usecols, dtype=LONGTERM_DTYPES, **kwargs)
+    return apply_longterm_schema(df)
+
+
+# Read the wagon type mapping (one row per wagon)
+def read_wagon_type_mapping(path):
+    return pd.read_csv(path, dtype=WAGON_TYPE_DTYPES).drop_duplicates(['wagon_ID'])
+
+
+# Read a preprocessed, clustered or merged (lat, lon, quality) CSV
+def read_preprocessed_csv(path, **kwargs):
+    return pd.read_csv(path, dtype=PREPROCESSED_DTYPES, **kwargs)
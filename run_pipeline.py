@@ -0,0 +1,255 @@
+"""
+Incremental runner for the GNSS signal-quality workflow.
+
+The workflow is a chain of standalone scripts. This runner declares every script
+as a stage with its input and output paths and its parameters, and runs only the
+stages whose inputs changed.
+
+Stages:
+    preprocess   data_preprocessing/GNSS_Preprocess.py               raw long-term CSVs -> preprocessed/
+    cluster      data_mining/GNSS_MinibatchKmeansClustering.py       preprocessed/ -> clustered/, cluster_artifacts/
+    merge        data_preprocessing/data_preprocessing.py            clustered/ -> merged/Cellular.csv
+    country      data_preprocessing/add_country_to_data.py           Cellular.csv -> CELL_nounknown.csv
+    heatmap      visualization/quality_heatmap.py                    CELL_nounknown.csv -> quality_heatmap.html (+ tiles)
+    hdop_heatmap visualization/GNSS_HDOP_signal_quaity_heatmap.py    one raw CSV -> hdop_heatmap.html (+ tiles)
+
+clustered/ holds only the per-cluster tables that the merge stage reads; models, label
+files and sketches of the cluster stage go to cluster_artifacts/.
+
+Steps:
+1. Derive the dependencies between stages from their input and output paths.
+2. For every stage, hash the content of its input files, its parameters, its script and
+   the repository modules the script imports (directly or through other modules).
+3. Skip the stage if the hash equals the one recorded after its last successful run
+   and all of its outputs exist; otherwise clear its outputs and run the script.
+4. Start every stage as soon as all of its upstream stages are finished, so
+   independent stages run concurrently.
+
+Parameters and paths are passed to the scripts as environment variables. Changing
+one parameter (e.g. N_CLUSTERS) reruns that stage; downstream stages rerun only
+if the stage's outputs actually changed.
+
+Usage: python run_pipeline.py [stage to force ...]
+"""
+
+import os
+import sys
+import ast
+import json
+import glob
+import time
+import shutil
+import hashlib
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Raw data and working folder
+RAW_GLOB = r"E:\sid\TU Darmstadt\Module und Lehrveranstaltungen\WS2022\MLA practical\DATA1\*.csv"
+HDOP_HEATMAP_RAW = r"D:\MLAP\PRT2\Test\02_211203_TUDA_data11.csv"
+WORK_DIR = os.path.join(ROOT, 'pipeline_work')
+STATE_FILE = os.path.join(WORK_DIR, 'pipeline_state.json')
+MAX_PARALLEL_STAGES = 2
+# Folders of the helper modules the scripts import (they add them to sys.path)
+MODULE_DIRS = ['data_preprocessing', 'data_mining', 'visualization']
+
+
+def work(*parts):
+    return os.path.join(WORK_DIR, *parts)
+
+
+# name, script, inputs (files, folders or globs), outputs (files or folders), parameters (environment variables)
+STAGES = [
+    ('preprocess', 'data_preprocessing/GNSS_Preprocess.py', [RAW_GLOB], [work('preprocessed')],
+     {'GNSS_RAW_GLOB': RAW_GLOB, 'GNSS_PREPROCESSED_DIR': work('preprocessed'), 'HDOP_MAX': 35}),
+    ('cluster', 'data_mining/GNSS_MinibatchKmeansClustering.py', [work('preprocessed')],
+     [work('clustered'), work('cluster_artifacts')],
+     {'GNSS_PREPROCESSED_GLOB': work('preprocessed', '*.csv'), 'GNSS_CLUSTERED_DIR': work('clustered'),
+      'GNSS_CLUSTER_ARTIFACTS_DIR': work('cluster_artifacts'), 'N_CLUSTERS': 3000, 'BATCH_SIZE': 32768}),
+    ('merge', 'data_preprocessing/data_preprocessing.py', [work('clustered')], [work('merged')],
+     {'CLUSTERED_GLOB': work('clustered', '*.csv'), 'MERGED_DIR': work('merged')}),
+    ('country', 'data_preprocessing/add_country_to_data.py', [work('merged', 'Cellular.csv')],
+     [work('CELL_nounknown.csv')],
+     {'CELLULAR_FILE': work('merged', 'Cellular.csv'), 'COUNTRY_FILE': work('CELL_nounknown.csv')}),
+    ('heatmap', 'visualization/quality_heatmap.py', [work('CELL_nounknown.csv')],
+     [work('quality_heatmap.html'), work('quality_heatmap_tiles')],
+     {'HEATMAP_INPUT': work('CELL_nounknown.csv'), 'HEATMAP_OUTPUT': work('quality_heatmap.html'),
+      'HEATMAP_MODE': 'points', 'HEATMAP_TILE_DIR': work('quality_heatmap_tiles'), 'OPEN_BROWSER': 0}),
+    ('hdop_heatmap', 'visualization/GNSS_HDOP_signal_quaity_heatmap.py', [HDOP_HEATMAP_RAW],
+     [work('hdop_heatmap.html'), work('hdop_heatmap_tiles')],
+     {'HDOP_HEATMAP_INPUT': HDOP_HEATMAP_RAW, 'HDOP_HEATMAP_OUTPUT': work('hdop_heatmap.html'), 'HDOP_MAX': 35,
+      'HEATMAP_MODE': 'points', 'HEATMAP_TILE_DIR': work('hdop_heatmap_tiles')}),
+]
+
+
+# All files behind a list of files, folders and glob patterns, in a stable order
+def expand(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, dirs, names in os.walk(path):
+                dirs.sort()
+                files.extend(os.path.join(folder, n) for n in sorted(names))
+        else:
+            files.extend(sorted(glob.glob(path)))
+    return files
+
+
+class FileHasher:
+    """SHA-256 of file contents, remembered per (path, size, mtime) so unchanged large files are read once."""
+
+    def __init__(self, known):
+        self.known = known
+        self.lock = threading.Lock()
+
+    def digest(self, path):
+        stat = os.stat(path)
+        key = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        with self.lock:
+            if key in self.known:
+                return self.known[key]
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        with self.lock:
+            self.known[key] = h.hexdigest()
+        return self.known[key]
+
+
+# Repository modules imported by `script`, directly or through other repository modules (sorted paths)
+def module_deps(script):
+    found = set()
+    pending = [os.path.join(ROOT, script)]
+    while pending:
+        path = pending.pop()
+        with open(path, encoding='utf-8') as f:
+            tree = ast.parse(f.read(), filename=path)
+        names = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names.update(a.name.split('.')[0] for a in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names.add(node.module.split('.')[0])
+        # Same resolution as the scripts: their own folder first, then the module folders
+        folders = [os.path.dirname(path)] + [os.path.join(ROOT, d) for d in MODULE_DIRS]
+        for name in names:
+            module = next((os.path.join(d, name + '.py') for d in folders
+                           if os.path.exists(os.path.join(d, name + '.py'))), None)
+            if module and module not in found:
+                found.add(module)
+                pending.append(module)
+    found.discard(os.path.join(ROOT, script))
+    return sorted(found)
+
+
+# Hash of everything a stage depends on: script, imported modules, parameters and input file contents
+def stage_key(script, inputs, params, hasher):
+    h = hashlib.sha256()
+    h.update(hasher.digest(os.path.join(ROOT, script)).encode())
+    for module in module_deps(script):
+        h.update(os.path.relpath(module, ROOT).encode())
+        h.update(hasher.digest(module).encode())
+    h.update(json.dumps(params, sort_keys=True).encode())
+    for path in expand(inputs):
+        h.update(path.encode())
+        h.update(hasher.digest(path).encode())
+    return h.hexdigest()
+
+
+# Stages whose outputs contain one of the inputs of `stage`
+def upstream(stage):
+    deps = []
+    for other in STAGES:
+        if other is stage:
+            continue
+        for out in other[3]:
+            out = os.path.abspath(out)
+            if any(os.path.abspath(i) == out or os.path.abspath(i).startswith(out + os.sep) for i in stage[2]):
+                deps.append(other[0])
+                break
+    return deps
+
+
+def clear_outputs(outputs):
+    for out in outputs:
+        if os.path.isdir(out):
+            shutil.rmtree(out)
+        elif os.path.exists(out):
+            os.remove(out)
+        # Folder outputs are recreated empty, file outputs get their parent folder
+        os.makedirs(out if not os.path.splitext(out)[1] else os.path.dirname(out), exist_ok=True)
+
+
+def run(force=()):
+    os.makedirs(WORK_DIR, exist_ok=True)
+    state = {'stages': {}, 'files': {}}
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE) as f:
+            state = json.load(f)
+    hasher = FileHasher(state['files'])
+    state_lock = threading.Lock()
+    done = {stage[0]: threading.Event() for stage in STAGES}
+    failed = set()
+
+    def save_state():
+        with open(STATE_FILE + '.tmp', 'w') as f:
+            json.dump(state, f, indent=1)
+        os.replace(STATE_FILE + '.tmp', STATE_FILE)
+
+    def run_stage(stage):
+        name, script, inputs, outputs, params = stage
+        try:
+            deps = upstream(stage)
+            for dep in deps:
+                done[dep].wait()
+            if any(dep in failed for dep in deps):
+                print(f"[{name}] skipped: upstream stage failed")
+                failed.add(name)
+                return
+
+            key = stage_key(script, inputs, params, hasher)
+            up_to_date = (name not in force and state['stages'].get(name) == key
+                          and all(os.path.exists(out) for out in outputs))
+            if up_to_date:
+                print(f"[{name}] up to date")
+                return
+
+            print(f"[{name}] running {script}")
+            start = time.time()
+            clear_outputs(outputs)
+            env = dict(os.environ, **{k: str(v) for k, v in params.items()})
+            script_path = os.path.join(ROOT, script)
+            result = subprocess.run([sys.executable, script_path], cwd=WORK_DIR, env=env)
+            if result.returncode != 0:
+                print(f"[{name}] failed with exit code {result.returncode}")
+                failed.add(name)
+                return
+            with state_lock:
+                state['stages'][name] = key
+                save_state()
+            print(f"[{name}] finished in {time.time() - start:.2f} seconds")
+        finally:
+            done[name].set()
+
+    with ThreadPoolExecutor(max_workers=max(MAX_PARALLEL_STAGES, len(STAGES))) as pool:
+        # Stages waiting for upstream stages hold a thread, so only MAX_PARALLEL_STAGES scripts run at once
+        slots = threading.Semaphore(MAX_PARALLEL_STAGES)
+
+        def limited(stage):
+            for dep in upstream(stage):
+                done[dep].wait()
+            with slots:
+                run_stage(stage)
+
+        list(pool.map(limited, STAGES))
+
+    with state_lock:
+        save_state()
+    return not failed
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run(force=sys.argv[1:]) else 1)
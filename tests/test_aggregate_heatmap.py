@@ -0,0 +1,32 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import folium
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'visualization'))
+from aggregate_heatmap import zoom_ranges, add_aggregate_heatmap, MAX_MAP_ZOOM
+
+
+def level(step_deg, n=20):
+    lat, lon = np.meshgrid(50 + np.arange(n) * step_deg, 9 + np.arange(n) * step_deg)
+    return pd.DataFrame({'lat': lat.ravel(), 'lon': lon.ravel(), 'quality': 1.0, 'n': 1})
+
+
+EMPTY = pd.DataFrame(columns=['lat', 'lon', 'quality', 'n'], dtype=float)
+
+
+def test_ranges_cover_all_zooms_coarse_to_fine():
+    ranges = zoom_ranges([level(0.01), level(0.5)])
+    fine, coarse = ranges
+    assert coarse[0] == 0 and coarse[1] + 1 == fine[0] and fine[1] == MAX_MAP_ZOOM
+
+
+def test_empty_level_gets_no_range():
+    ranges = zoom_ranges([EMPTY, level(0.5), level(0.01)])
+    assert ranges[0] is None
+    assert ranges[1][0] == 0 and ranges[2][1] == MAX_MAP_ZOOM
+    assert zoom_ranges([EMPTY]) == [None]
+
+    m = folium.Map()
+    assert add_aggregate_heatmap(m, [EMPTY, level(0.5)]) == [None, (0, MAX_MAP_ZOOM)]
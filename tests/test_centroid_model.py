@@ -0,0 +1,31 @@
+import os
+import sys
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_mining'))
+from centroid_model import CentroidModel
+
+
+def fitted(points):
+    return MiniBatchKMeans(n_clusters=8, batch_size=256, n_init=1, random_state=0).fit(points)
+
+
+def test_identical_refit_writes_identical_files(tmp_path):
+    points = np.random.default_rng(0).normal([50, 9], 1, (2000, 2))
+    for name in ('a', 'b'):
+        CentroidModel.from_kmeans(fitted(points), sources=['x.csv']).save(str(tmp_path / name))
+    for f in ('model.json', 'centroids.npy'):
+        assert (tmp_path / 'a' / f).read_bytes() == (tmp_path / 'b' / f).read_bytes()
+
+
+def test_assign_matches_predict(tmp_path):
+    points = np.random.default_rng(1).normal([50, 9], 1, (2000, 2))
+    mod = fitted(points)
+    CentroidModel.from_kmeans(mod).save(str(tmp_path))
+    model = CentroidModel.load(str(tmp_path))
+    assert model.metadata['centroids_sha256'] == model.fingerprint()
+    np.testing.assert_array_equal(model.assign(points[:, 0], points[:, 1]), mod.predict(points))
+
+    labels, km = model.assign(points[:, 0], points[:, 1], metric='haversine', return_distance=True)
+    assert labels.shape == (2000,) and (km >= 0).all()
@@ -0,0 +1,52 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_preprocessing'))
+from cluster_sketch import (build_sketch, merge_sketches, summarize, sketch_edges, write_sketch, read_sketch,
+                            SIGNAL_QUALITY_EDGES)
+
+
+def points(n, seed, scale):
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, 5, n)
+    values = pd.DataFrame({'lat': rng.normal(50, 1, n), 'quality': rng.uniform(0, scale, n)})
+    return labels, values
+
+
+def test_merge_matches_single_sketch():
+    labels, values = points(10_000, 0, 35)
+    whole = build_sketch(labels, values)
+    parts = merge_sketches([build_sketch(labels[:3000], values.iloc[:3000]),
+                            build_sketch(labels[3000:], values.iloc[3000:])])
+    pd.testing.assert_frame_equal(summarize(parts, ['lat', 'quality']), summarize(whole, ['lat', 'quality']))
+
+    stats = summarize(whole, ['lat', 'quality'])
+    exact = values.groupby(labels)['quality']
+    np.testing.assert_allclose(stats['quality'], exact.mean())
+    np.testing.assert_allclose(stats['quality_std'], exact.std())
+    np.testing.assert_allclose(stats['quality_p50'], exact.median(), atol=0.5)
+
+
+def test_edges_beyond_hdop_range():
+    # 0-256 quality: with the default 0-35 edges every value above 35 would land in the last bin
+    labels, values = points(10_000, 1, 256)
+    stats = summarize(build_sketch(labels, values, edges=SIGNAL_QUALITY_EDGES), ['quality'])
+    exact = values.groupby(labels)['quality']
+    np.testing.assert_allclose(stats['quality_p10'], exact.quantile(0.1), atol=2)
+    np.testing.assert_allclose(stats['quality_p90'], exact.quantile(0.9), atol=2)
+
+
+def test_edges_survive_csv(tmp_path):
+    labels, values = points(1000, 2, 256)
+    sketch = build_sketch(labels, values, edges=SIGNAL_QUALITY_EDGES)
+    write_sketch(sketch, tmp_path / 'sketch.csv')
+    np.testing.assert_allclose(sketch_edges(read_sketch(tmp_path / 'sketch.csv')), SIGNAL_QUALITY_EDGES)
+
+
+def test_merge_refuses_different_edges():
+    labels, values = points(1000, 3, 35)
+    with pytest.raises(ValueError, match='histogram edges'):
+        merge_sketches([build_sketch(labels, values), build_sketch(labels, values, edges=SIGNAL_QUALITY_EDGES)])
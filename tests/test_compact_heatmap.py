@@ -0,0 +1,47 @@
+import base64
+import os
+import sys
+import zlib
+import numpy as np
+import pytest
+import folium
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'visualization'))
+from compact_heatmap import encode_points, CompactHeatMap, COORD_SCALE, WEIGHT_LEVELS
+
+
+# Python version of the decoder in the page
+def decode(payload, n, weight_scale):
+    data = zlib.decompress(base64.b64decode(payload))
+    lat = np.cumsum(np.frombuffer(data, '<i4', n, 0)) / COORD_SCALE
+    lon = np.cumsum(np.frombuffer(data, '<i4', n, 4 * n)) / COORD_SCALE
+    weight = np.frombuffer(data, '<u1', n, 8 * n) * weight_scale
+    return lat, lon, weight
+
+
+def test_round_trip():
+    rng = np.random.default_rng(0)
+    lat, lon, weight = rng.uniform(35, 70, 5000), rng.uniform(-10, 40, 5000), rng.uniform(0, 35, 5000)
+    payload, scale = encode_points(lat, lon, weight)
+    out_lat, out_lon, out_weight = decode(payload, len(lat), scale)
+
+    # The payload is sorted; compare the points as sets
+    order = np.lexsort((lon, lat))
+    np.testing.assert_allclose(out_lat, lat[order], atol=0.5 / COORD_SCALE)
+    np.testing.assert_allclose(out_lon, lon[order], atol=0.5 / COORD_SCALE)
+    np.testing.assert_allclose(out_weight, weight[order], atol=weight.max() / WEIGHT_LEVELS / 2 + 1e-9)
+
+
+def test_empty_and_zero_weights():
+    payload, scale = encode_points([], [], [])
+    assert decode(payload, 0, scale)[0].size == 0
+    payload, scale = encode_points([50.0, 50.0], [8.0, 8.0], [0.0, 0.0])
+    np.testing.assert_array_equal(decode(payload, 2, scale)[2], [0, 0])
+
+
+def test_layer_renders_and_rejects_nan():
+    m = folium.Map()
+    CompactHeatMap([50.0, 51.0], [8.0, 9.0], [1.0, 2.0]).add_to(m)
+    assert 'DecompressionStream' in m.get_root().render()
+    with pytest.raises(ValueError):
+        CompactHeatMap([50.0, np.nan], [8.0, 9.0])
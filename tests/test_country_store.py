@@ -0,0 +1,52 @@
+import os
+import sys
+import json
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_preprocessing'))
+from country_lookup import CountryIndex
+from country_store import CountryStore, open_store, BORDER, NO_COUNTRY
+
+BOUNDS = (-0.5, -0.5, 2.5, 1.5)  # lon_min, lat_min, lon_max, lat_max
+
+
+def square(name, lon0, lon1):
+    ring = [[lon0, 0], [lon1, 0], [lon1, 1], [lon0, 1], [lon0, 0]]
+    return {'type': 'Feature', 'properties': {'ADMIN': name}, 'geometry': {'type': 'Polygon', 'coordinates': [ring]}}
+
+
+def write_geojson(path, split=1.0):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'type': 'FeatureCollection', 'features': [square('A', 0, split), square('B', split, 2)]}, f)
+    return str(path)
+
+
+def test_lookup_index(tmp_path):
+    path = write_geojson(tmp_path / 'countries.geojson')
+    store = open_store(str(tmp_path / 'store'), path, BOUNDS, 0.3)
+    lat = np.array([0.5, 0.5, 0.5, 0.5, 1.4, 0.5, 0.5, np.nan, 0.5])
+    lon = np.array([0.5, 1.5, 0.99, 1.01, 0.5, 5.0, -3.0, 0.5, np.nan])
+    names = store.lookup(lat, lon)
+    assert names.tolist() == ['A', 'B', 'A', 'B', 'unknown', 'unknown', 'unknown', 'unknown', 'unknown']
+
+    # Interior points are answered by the raster, points near the boundary by the exact fallback
+    grid = np.asarray(store.grid)
+    assert grid[int((0.5 + 0.5) / 0.3), int((0.5 + 0.5) / 0.3)] == 0
+    assert grid[int((0.5 + 0.5) / 0.3), int((1.0 + 0.5) / 0.3)] == BORDER
+    assert grid[int((1.4 + 0.5) / 0.3), int((0.5 + 0.5) / 0.3)] == NO_COUNTRY
+
+    # Same answers as the exact index everywhere
+    rng = np.random.default_rng(0)
+    lat, lon = rng.uniform(-1, 2, 2000), rng.uniform(-1, 3, 2000)
+    np.testing.assert_array_equal(store.lookup_index(lat, lon), store.exact.lookup_index(lat, lon))
+
+
+def test_rebuilt_when_boundaries_change(tmp_path):
+    path = write_geojson(tmp_path / 'countries.geojson', split=1.0)
+    store_dir = str(tmp_path / 'store')
+    assert open_store(store_dir, path, BOUNDS, 0.3).lookup([0.5], [1.4]).tolist() == ['B']
+    size = os.path.getsize(path)
+    write_geojson(path, split=1.5)  # Same file size, other boundary (lon 1.4 was in an interior cell of B)
+    assert os.path.getsize(path) == size
+    assert open_store(store_dir, path, BOUNDS, 0.3).lookup([0.5], [1.4]).tolist() == ['A']
+    assert isinstance(CountryStore.load(store_dir, path), CountryStore)
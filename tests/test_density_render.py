@@ -0,0 +1,32 @@
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_mining'))
+from density_render import DensityRaster
+
+
+def test_chunks_match_one_chunk():
+    rng = np.random.default_rng(0)
+    n = 4000
+    lat, lon = rng.uniform(49, 51, n), rng.uniform(8, 10, n)
+    quality, labels = rng.uniform(0, 35, n), rng.integers(0, 5, n)
+    bounds = (49.5, 51, 8, 10)  # Part of the points lies outside
+    whole = DensityRaster(bounds, width=20).add(lat, lon, quality, labels)
+    parts = DensityRaster(bounds, width=20)
+    for i in range(0, n, 700):
+        parts.add(lat[i:i + 700], lon[i:i + 700], quality[i:i + 700], labels[i:i + 700])
+    assert parts.n_outside == whole.n_outside > 0
+    np.testing.assert_array_equal(parts.counts(), whole.counts())
+    np.testing.assert_allclose(parts.mean(), whole.mean())
+    np.testing.assert_array_equal(parts.dominant(), whole.dominant())
+    assert parts.label_pairs().sum() == parts.counts().sum()
+
+
+def test_dominant_label():
+    raster = DensityRaster((0, 1, 0, 1), width=2, height=1)
+    raster.add([0.5, 0.5, 0.5], [0.2, 0.2, 0.2], labels=[3, 1, 3])
+    raster.add([0.5, 0.5], [0.2, 0.2], labels=[1, 1])  # Label 1 overtakes label 3 in the second chunk
+    raster.add([0.5], [0.7], labels=[4])
+    assert raster.dominant().tolist() == [[1, 4]]
+    assert DensityRaster((0, 1, 0, 1), width=2, height=1).dominant().tolist() == [[-1, -1]]
@@ -0,0 +1,67 @@
+import json
+import os
+import sys
+import threading
+import time
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'visualization'))
+from geocode_cache import GeocodeCache, NominatimClient, reverse_geocode
+
+
+class FakeClient(NominatimClient):
+    """Answers from memory; fails (raises) at coordinates with latitude `fail_at`."""
+
+    def __init__(self, max_concurrency, fail_at=None, delay=0.0):
+        super().__init__(url='http://localhost', max_concurrency=max_concurrency, min_delay=0)
+        self.fail_at = fail_at
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+        self.calls = 0
+
+    def _get(self, lat, lon):
+        with self.lock:
+            self.calls += 1
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            time.sleep(self.delay)
+            if self.fail_at is not None and lat >= self.fail_at:
+                raise RuntimeError('server gone')
+            return json.dumps({'address': {'country': 'Germany', 'town': f'{lat:.4f}'}, 'display_name': 'x'})
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def test_dedup_cache_and_concurrency(tmp_path):
+    cache = GeocodeCache(str(tmp_path / 'cache.sqlite'))
+    lat = np.repeat(50 + np.arange(100) * 0.001, 3)
+    lon = np.full(len(lat), 8.0)
+    lat[5] = np.nan
+    client = FakeClient(max_concurrency=40, delay=0.05)
+    result, stats = reverse_geocode(lat, lon, cache, client)
+    assert stats['unique'] == 100 and stats['requests'] == 100
+    assert client.peak == 40  # Not capped by the default executor
+    assert result['country'].isna().tolist() == [i == 5 for i in range(len(lat))]
+    assert result['municipality'][0] == '50.0000'
+
+    # Second run: everything from the cache
+    again = FakeClient(max_concurrency=4)
+    _, stats = reverse_geocode(lat, lon, cache, again)
+    assert stats['hit_rate'] == 1.0 and again.calls == 0
+
+
+def test_answers_are_kept_when_a_run_fails(tmp_path):
+    cache = GeocodeCache(str(tmp_path / 'cache.sqlite'))
+    lat = 50 + np.arange(300) * 0.001
+    lon = np.full(len(lat), 8.0)
+    with pytest.raises(RuntimeError):
+        reverse_geocode(lat, lon, cache, FakeClient(max_concurrency=1, fail_at=50.2))
+    # The 200 answers before the failure were written, although the run did not finish
+    lat_keys, lon_keys = cache.keys(lat, lon)
+    stored = cache.get_many(lat_keys, lon_keys)
+    assert sum(a is not None for a in stored) == 200
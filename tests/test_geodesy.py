@@ -0,0 +1,34 @@
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_preprocessing'))
+from geodesy import haversine, bearing, step_distance, step_speed, cumulative_distance
+
+
+def test_haversine_known_distances():
+    # One degree of latitude, and a quarter of the equator
+    np.testing.assert_allclose(haversine(0, 0, 1, 0), 6371 * np.pi / 180)
+    np.testing.assert_allclose(haversine(0, 0, 0, 90), 6371 * np.pi / 2)
+    np.testing.assert_allclose(haversine([50.0, 50.0], [8.0, 8.0], [50.0, 50.0], [8.0, 8.0]), [0, 0])
+    np.testing.assert_allclose(haversine(50, 8, 51, 9), haversine(51, 9, 50, 8))
+
+
+def test_bearing():
+    np.testing.assert_allclose(bearing([0, 0, 0], [0, 0, 0], [1, 0, -1], [0, 1, 0]), [0, 90, 180])
+
+
+def test_step_functions_stay_within_groups():
+    lat = np.array([50.0, 50.1, 50.2, 48.0, 48.0])
+    lon = np.full(5, 8.0)
+    groups = np.array([1, 1, 1, 2, 2])
+    dist = step_distance(lat, lon, groups)
+    np.testing.assert_allclose(dist[[0, 1, 3]], [haversine(50, 8, 50.1, 8), haversine(50.1, 8, 50.2, 8), 0])
+    assert np.isnan(dist[[2, 4]]).all()
+
+    speed = step_speed(lat, lon, np.array([0, 3600, 3600, 0, 60]), groups)
+    np.testing.assert_allclose(speed[0], dist[0])
+    assert np.isnan(speed[1])  # Duplicate timestamp
+
+    total = cumulative_distance(lat, lon, groups)
+    np.testing.assert_allclose(total, [0, dist[0], dist[0] + dist[1], 0, 0])
@@ -0,0 +1,24 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_mining'))
+import GNSS_MinibatchKmeansClustering as clustering
+
+
+def test_small_first_chunk_is_buffered(tmp_path, monkeypatch):
+    # Chunks of 7 points, while the first partial_fit needs at least 20
+    monkeypatch.setattr(clustering, 'N_CLUSTERS', 20)
+    monkeypatch.setattr(clustering, 'INIT_SAMPLE', 400)
+    monkeypatch.setattr(clustering, 'CHUNK_ROWS', 7)
+    monkeypatch.setattr(clustering, 'N_EPOCHS', 1)
+    rng = np.random.default_rng(0)
+    paths = []
+    for i, n in enumerate((5, 200)):
+        path = tmp_path / f'part{i}.csv'
+        pd.DataFrame({'lat': rng.normal(50, 1, n), 'lon': rng.normal(9, 1, n), 'quality': rng.uniform(0, 35, n)}) \
+            .to_csv(path, index=False)
+        paths.append(str(path))
+    mod = clustering.fit_global(paths)
+    assert mod.cluster_centers_.shape == (20, 2)
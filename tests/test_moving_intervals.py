@@ -0,0 +1,72 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_mining'))
+from moving_intervals import IntervalStream, combine_rollups, split_days, DAY_NS
+
+
+def messages(rows):
+    return pd.DataFrame(rows, columns=['wagon_ID', 'movement_state', 'timestamp_measure_movement_state']) \
+        .assign(timestamp_measure_movement_state=lambda d: pd.to_timedelta(d['timestamp_measure_movement_state']))
+
+
+def test_split_days():
+    start = np.array([DAY_NS - 60 * 10 ** 9])
+    idx, day, seconds = split_days(start, start + 120 * 10 ** 9)
+    assert idx.tolist() == [0, 0] and day.tolist() == [0, 1] and seconds.tolist() == [60, 60]
+
+
+def test_intervals_and_runs():
+    df = messages([
+        ('a', 'moving', '0 days 23:50:00'),
+        ('a', 'moving', '1 days 00:10:00'),
+        ('a', 'standing', '1 days 00:20:00'),
+        ('a', 'standing', '1 days 03:00:00'),  # After a gap of more than an hour
+        ('b', 'moving', '0 days 01:00:00'),
+    ])
+    stream = IntervalStream()
+    rollup, runs = stream.feed(df)
+    runs = pd.concat([runs, stream.finish()], ignore_index=True)
+    seconds = rollup.set_index(['day', 'movement_state'])['seconds']
+    assert seconds.to_dict() == {(0, 'moving'): 600.0, (1, 'moving'): 1200.0}
+    moving = runs[(runs['wagon_ID'] == 'a') & (runs['movement_state'] == 'moving')]
+    assert moving['seconds'].tolist() == [1800.0] and moving['samples'].tolist() == [2]
+    assert len(runs) == 4  # a: moving, standing (ended by the gap), standing; b: one message
+
+
+def test_split_files_match_one_file():
+    rng = np.random.default_rng(0)
+    n = 3000
+    t = np.sort(rng.integers(0, 5 * DAY_NS, n))
+    df = pd.DataFrame({'wagon_ID': rng.choice(['a', 'b', 'c'], n),
+                       'movement_state': rng.choice(['moving', 'standing'], n, p=[0.2, 0.8]),
+                       'timestamp_measure_movement_state': pd.to_timedelta(t, unit='ns')})
+
+    whole = IntervalStream()
+    rollup, runs = whole.feed(df)
+    runs = pd.concat([runs, whole.finish()])
+
+    parts = IntervalStream()
+    rollups, part_runs = [], []
+    for chunk in np.array_split(np.arange(n), 4):
+        r, u = parts.feed(df.iloc[chunk])
+        rollups.append(r)
+        part_runs.append(u)
+    part_runs.append(parts.finish())
+
+    pd.testing.assert_frame_equal(combine_rollups(rollups), rollup)
+    key = ['wagon_ID', 'start']
+    pd.testing.assert_frame_equal(pd.concat(part_runs).sort_values(key).reset_index(drop=True),
+                                  runs.sort_values(key).reset_index(drop=True))
+
+
+def test_files_out_of_order_raise():
+    stream = IntervalStream()
+    stream.feed(messages([('a', 'moving', '1 days'), ('b', 'moving', '0 days 01:00:00')]))
+    # Same timestamp as the carried message and new wagons are fine
+    stream.feed(messages([('a', 'standing', '1 days'), ('c', 'moving', '0 days')]))
+    with pytest.raises(ValueError, match='time order'):
+        stream.feed(messages([('a', 'moving', '0 days 12:00:00'), ('b', 'moving', '0 days 02:00:00')]))
@@ -0,0 +1,70 @@
+import os
+import sys
+import zipfile
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'visualization'))
+import offline_geocoder
+from offline_geocoder import OfflineGeocoder, GEONAMES_COLUMNS, ADMIN1_FILE
+
+
+def gazetteer(rows):
+    return pd.DataFrame(rows, columns=['name', 'latitude', 'longitude', 'country_code', 'kind', 'state'])
+
+
+def test_reverse():
+    geocoder = OfflineGeocoder(gazetteer([
+        ('Aheim', 50.0, 9.0, 'DE', 'place', 'Hessen'),
+        ('Aheim', 50.0, 9.0, 'DE', 'place', 'Hessen'),  # Duplicate entry
+        ('Bdorf', 51.0, 9.0, 'DE', 'place', 'Niedersachsen'),
+        ('Nowhere', np.nan, 9.0, 'DE', 'place', ''),  # No coordinates
+        ('Aheim Hbf', 50.01, 9.0, 'DE', 'station', 'Hessen'),
+    ]))
+    assert len(geocoder.places) == 3 and len(geocoder.stations) == 1
+    result = geocoder.reverse([50.1, np.nan, 50.1, 50.9], [9.0, 9.0, 9.0, np.inf])
+    assert result['municipality'].tolist()[:3] == ['Aheim', None, 'Aheim']
+    assert result['state'].tolist()[:2] == ['Hessen', None]
+    assert result['station'].tolist()[:2] == ['Aheim Hbf', None]
+    assert np.isclose(result.loc[0, 'municipality_km'], 11.12, atol=0.01)
+    assert np.isclose(result.loc[0, 'station_km'], 10.01, atol=0.01)
+    assert result.loc[[1, 3], 'municipality_km'].isna().all() and result.loc[3, 'country'] is None
+
+
+def test_reverse_without_stations():
+    geocoder = OfflineGeocoder(gazetteer([('Bdorf', 51.0, 9.0, 'DE', 'place', 'Niedersachsen')]))
+    result = geocoder.reverse([51.0, 52.0], [9.0, 9.0])
+    assert result['municipality'].tolist() == ['Bdorf', 'Bdorf']
+    assert result['station'].tolist() == ['', ''] and result['station_km'].isna().all()
+    assert len(OfflineGeocoder(gazetteer([])).reverse([], [])) == 0
+
+
+def write_sources(directory, station_name='Xstadt Bf'):
+    rows = [[1, 'Xstadt', '', '', 50.0, 9.0, 'P', 'PPL', 'XX', '', '01'] + [''] * 8,
+            [2, station_name, '', '', 50.01, 9.0, 'S', 'RSTN', 'XX', '', '01'] + [''] * 8]
+    text = pd.DataFrame(rows, columns=GEONAMES_COLUMNS).to_csv(sep='\t', header=False, index=False)
+    with zipfile.ZipFile(os.path.join(directory, 'XX.zip'), 'w') as z:
+        z.writestr('XX.txt', text)
+    with open(os.path.join(directory, ADMIN1_FILE), 'w', encoding='utf-8') as f:
+        f.write('XX.01\tXland\tXland\t3\n')
+
+
+def test_gazetteer_is_rebuilt_when_sources_change(tmp_path):
+    directory = str(tmp_path)
+    write_sources(directory)
+    built = offline_geocoder.build_gazetteer(directory, ('XX',))
+    assert built['state'].tolist() == ['Xland', 'Xland']
+    assert offline_geocoder._is_current(directory, ('XX',))
+    assert not offline_geocoder._is_current(directory, ('XX', 'YY'))
+
+    # Other content of the same size
+    size = os.path.getsize(os.path.join(directory, 'XX.zip'))
+    write_sources(directory, station_name='Xstadt Bx')
+    assert os.path.getsize(os.path.join(directory, 'XX.zip')) == size
+    assert not offline_geocoder._is_current(directory, ('XX',))
+
+    # A missing source file is not current either
+    offline_geocoder.build_gazetteer(directory, ('XX',))
+    assert offline_geocoder._is_current(directory, ('XX',))
+    os.remove(os.path.join(directory, 'XX.zip'))
+    assert not offline_geocoder._is_current(directory, ('XX',))
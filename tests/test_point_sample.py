@@ -0,0 +1,30 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_preprocessing'))
+from point_sample import iter_chunks, sample_points
+
+
+def write_points(path, n, seed):
+    rng = np.random.default_rng(seed)
+    pd.DataFrame({'lat': rng.normal(50, 1, n), 'lon': rng.normal(9, 1, n), 'quality': rng.uniform(0, 35, n)}) \
+        .to_csv(path, index=False)
+    return str(path)
+
+
+def test_iter_chunks(tmp_path):
+    path = write_points(tmp_path / 'a.csv', 25, 0)
+    sizes = [len(c) for c in iter_chunks(path, chunk_rows=10)]
+    assert sizes == [10, 10, 5]
+
+
+def test_sample_is_independent_of_chunk_size(tmp_path):
+    paths = [write_points(tmp_path / 'a.csv', 30, 1), write_points(tmp_path / 'b.csv', 50, 2)]
+    small = sample_points(paths, 20, np.random.default_rng(3), chunk_rows=7)
+    large = sample_points(paths, 20, np.random.default_rng(3), chunk_rows=1000)
+    assert small.shape == (20, 2)
+    # Same random keys per point whatever the chunking, so the same points are kept
+    np.testing.assert_array_equal(np.sort(small, axis=0), np.sort(large, axis=0))
+    assert len(sample_points(paths, 500, np.random.default_rng(0))) == 80
@@ -0,0 +1,36 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import run_pipeline
+
+
+def test_module_deps_of_cluster_stage():
+    deps = {os.path.basename(p) for p in run_pipeline.module_deps('data_mining/GNSS_MinibatchKmeansClustering.py')}
+    assert {'cluster_sketch.py', 'centroid_model.py', 'tuda_schema.py'} <= deps
+    assert 'GNSS_MinibatchKmeansClustering.py' not in deps
+
+
+def test_stage_key_follows_helper_modules(tmp_path, monkeypatch):
+    # stage.py imports helper.py (module folder), which imports inner.py
+    (tmp_path / 'scripts').mkdir()
+    (tmp_path / 'lib').mkdir()
+    (tmp_path / 'scripts' / 'stage.py').write_text("import numpy\nfrom helper import f\n")
+    (tmp_path / 'lib' / 'helper.py').write_text("import inner\n")
+    (tmp_path / 'lib' / 'inner.py').write_text("X = 1\n")
+    monkeypatch.setattr(run_pipeline, 'ROOT', str(tmp_path))
+    monkeypatch.setattr(run_pipeline, 'MODULE_DIRS', ['lib'])
+
+    assert [os.path.basename(p) for p in run_pipeline.module_deps('scripts/stage.py')] == ['helper.py', 'inner.py']
+    key = run_pipeline.stage_key('scripts/stage.py', [], {}, run_pipeline.FileHasher({}))
+    (tmp_path / 'lib' / 'inner.py').write_text("X = 2\n")
+    assert run_pipeline.stage_key('scripts/stage.py', [], {}, run_pipeline.FileHasher({})) != key
+
+
+def test_cluster_artifacts_are_not_merge_inputs():
+    stages = {s[0]: s for s in run_pipeline.STAGES}
+    cluster_outputs = stages['cluster'][3]
+    assert run_pipeline.work('cluster_artifacts') in cluster_outputs
+    assert stages['cluster'][4]['GNSS_CLUSTER_ARTIFACTS_DIR'] == run_pipeline.work('cluster_artifacts')
+    assert stages['heatmap'][4]['HEATMAP_TILE_DIR'] in stages['heatmap'][3]
+    assert stages['hdop_heatmap'][4]['HEATMAP_TILE_DIR'] in stages['hdop_heatmap'][3]
@@ -0,0 +1,49 @@
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_mining'))
+from spatial_binning import project, unproject, cell_ids, cell_center, split_ids, bin_points, coarsen, combine
+
+
+def points(n, seed):
+    rng = np.random.default_rng(seed)
+    # Around the projection centre, so the cell indices are negative and positive
+    return rng.uniform(47, 57, n), rng.uniform(3, 17, n), rng.uniform(0, 35, n)
+
+
+def test_project_round_trip():
+    lat, lon, _ = points(1000, 0)
+    back_lat, back_lon = unproject(*project(lat, lon))
+    np.testing.assert_allclose(back_lat, lat, atol=1e-9)
+    np.testing.assert_allclose(back_lon, lon, atol=1e-9)
+
+
+def test_cell_id_round_trip():
+    lat, lon, _ = points(1000, 1)
+    for level, size in ((0, 1000), (3, 1000), (0, 250.0)):
+        ids = cell_ids(lat, lon, level, cell_size_m=size)
+        ix, iy = split_ids(ids)
+        assert (ix < 0).any() and (ix > 0).any() and (iy < 0).any() and (iy > 0).any()
+        assert (ids > 0).all()
+        # The centre of every cell lies in that cell
+        np.testing.assert_array_equal(cell_ids(*cell_center(ids, level, cell_size_m=size), level, cell_size_m=size), ids)
+
+
+def test_cell_size_argument():
+    lat, lon, q = points(1000, 2)
+    # Level 2 of 250 m cells are the 1 km cells of level 0
+    np.testing.assert_array_equal(cell_ids(lat, lon, 2, cell_size_m=250), cell_ids(lat, lon, 0, cell_size_m=1000))
+    assert len(bin_points(lat, lon, q, cell_size_m=500)) > len(bin_points(lat, lon, q, cell_size_m=2000))
+
+
+def test_coarsen_by_shift_matches_binning_at_coarser_level():
+    lat, lon, q = points(5000, 3)
+    fine = combine([bin_points(lat[:2000], lon[:2000], q[:2000]), bin_points(lat[2000:], lon[2000:], q[2000:])])
+    for levels in (1, 3):
+        direct = bin_points(lat, lon, q, level=levels).sort_index()
+        coarse = coarsen(fine, levels).sort_index()
+        np.testing.assert_array_equal(coarse.index, direct.index)
+        np.testing.assert_array_equal(coarse['n'], direct['n'])
+        np.testing.assert_allclose(coarse[['lat_sum', 'lon_sum', 'quality_sum']], direct[['lat_sum', 'lon_sum', 'quality_sum']])
+    np.testing.assert_array_equal(coarsen(coarsen(fine), 2).sort_index().index, coarsen(fine, 3).sort_index().index)
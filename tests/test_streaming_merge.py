@@ -0,0 +1,35 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_preprocessing'))
+from streaming_merge import _HashSet, merge_files
+
+
+def test_hash_set_contains_after_adds():
+    seen = _HashSet()
+    seen.add(np.array([5, 1, 9], dtype=np.uint64))
+    seen.add(np.array([3], dtype=np.uint64))
+    found = seen.contains(np.array([1, 2, 3, 9, 10], dtype=np.uint64))
+    assert found.tolist() == [True, False, True, True, False]
+
+
+def test_hash_set_ignores_empty_add():
+    seen = _HashSet()
+    seen.add(np.array([1, 2], dtype=np.uint64))
+    seen.add(np.array([], dtype=np.uint64))
+    assert all(len(block) for block in seen.blocks)
+    assert seen.contains(np.array([2, 4], dtype=np.uint64)).tolist() == [True, False]
+
+
+def test_merge_fully_duplicate_chunk(tmp_path):
+    # The second chunk (rows 3-4) only repeats rows of the first, so nothing of it is written
+    rows = pd.DataFrame({'a': [1, 2, 1, 2, 3, 3], 'b': ['x', 'y', 'x', 'y', 'z', 'z']})
+    path = tmp_path / 'in.csv'
+    rows.to_csv(path, index=False)
+    output = tmp_path / 'out.csv'
+    n = merge_files([str(path), str(path)], str(output), dedupe=True, chunk_rows=2)
+    merged = pd.read_csv(output)
+    assert n == 3
+    assert merged.to_dict('list') == {'a': [1, 2, 3], 'b': ['x', 'y', 'z']}
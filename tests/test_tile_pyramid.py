@@ -0,0 +1,71 @@
+import json
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'visualization'))
+import tile_pyramid
+from tile_pyramid import build_pyramid, lonlat_to_pixel, pixel_sums, coarsen, tile_counts
+
+
+def pngs(directory):
+    return {os.path.relpath(os.path.join(d, n), directory) for d, _, names in os.walk(directory)
+            for n in names if n.endswith('.png')}
+
+
+def points(n, seed, spread):
+    rng = np.random.default_rng(seed)
+    return rng.normal(50, spread, n), rng.normal(9, spread, n), rng.uniform(0, 35, n)
+
+
+def test_coarsen_matches_binning_at_lower_zoom():
+    lat, lon, q = points(5000, 0, 2)
+    direct = pixel_sums(lat, lon, q, zoom=7).sort_index()
+    coarse = coarsen(pixel_sums(lat, lon, q, zoom=8)).sort_index()
+    np.testing.assert_array_equal(direct.index, coarse.index)
+    np.testing.assert_allclose(direct['quality_sum'], coarse['quality_sum'])
+
+
+def test_tile_counts():
+    lat, lon, q = points(3000, 5, 1)
+    x, y = lonlat_to_pixel(lat, lon, 10)
+    counts = tile_counts(pixel_sums(lat, lon, q, zoom=10), 6, 10)
+    for zoom in range(6, 11):
+        shift = 8 + 10 - zoom  # Tile of a zoom-10 pixel at `zoom`
+        assert counts[zoom] == len(set(zip(x >> shift, y >> shift)))
+
+
+def test_rebuild_removes_stale_tiles(tmp_path):
+    out = str(tmp_path / 'tiles')
+    build_pyramid([points(2000, 1, 1)], out, min_zoom=4, max_zoom=8, max_tiles=None)
+    build_pyramid([points(10, 2, 0.01)], out, min_zoom=4, max_zoom=6, max_tiles=None)
+    with open(os.path.join(out, 'tiles.json')) as f:
+        meta = json.load(f)
+    assert len(pngs(out)) == sum(meta['tiles'].values())
+    assert all(int(p.split(os.sep)[0]) <= 6 for p in pngs(out))
+    assert not os.path.exists(out + '.building')
+
+
+def test_tile_budget_caps_max_zoom(tmp_path):
+    meta = build_pyramid([points(20_000, 3, 3)], str(tmp_path / 'tiles'), min_zoom=4, max_zoom=12, max_tiles=200)
+    assert meta['max_zoom'] < 12
+    assert sum(meta['tiles'].values()) <= 200
+
+
+def test_refuses_foreign_folder(tmp_path):
+    (tmp_path / 'notes.txt').write_text('keep me')
+    with pytest.raises(ValueError):
+        build_pyramid([points(10, 4, 1)], str(tmp_path), max_tiles=None)
+    assert (tmp_path / 'notes.txt').exists()
+
+
+def test_many_chunks_match_one_chunk(tmp_path, monkeypatch):
+    monkeypatch.setattr(tile_pyramid, 'COMBINE_EVERY', 3)
+    lat, lon, q = points(5000, 6, 1)
+    chunks = [(lat[i:i + 500], lon[i:i + 500], q[i:i + 500]) for i in range(0, 5000, 500)]
+    whole = build_pyramid([(lat, lon, q)], str(tmp_path / 'whole'), min_zoom=4, max_zoom=8, max_tiles=None)
+    parts = build_pyramid(chunks, str(tmp_path / 'parts'), min_zoom=4, max_zoom=8, max_tiles=None)
+    assert parts['n_points'] == 5000
+    assert parts['tiles'] == whole['tiles']
+    assert parts['vmin'] == pytest.approx(whole['vmin']) and parts['vmax'] == pytest.approx(whole['vmax'])
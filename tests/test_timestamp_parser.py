@@ -0,0 +1,20 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_preprocessing'))
+from timestamp_parser import parse_duration, duration_seconds, split_days, NAT_SECONDS
+
+
+def test_duration_seconds_and_split():
+    seconds = duration_seconds(pd.Series(['0 days 00:00:30', '3 days 08:15:30', 'NaT', None]))
+    assert seconds.tolist() == [30, 3 * 86400 + 8 * 3600 + 15 * 60 + 30, NAT_SECONDS, NAT_SECONDS]
+    day, second = split_days(seconds[:2])
+    assert day.tolist() == [0, 3] and second.tolist() == [30, 29730]
+
+
+def test_parse_duration_keeps_nat():
+    parsed = parse_duration(['1 days 00:00:01', 'NaT', 'garbage'])
+    assert parsed[0] == np.timedelta64(86401, 's')
+    assert np.isnat(parsed[1]) and np.isnat(parsed[2])
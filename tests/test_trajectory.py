@@ -0,0 +1,46 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_preprocessing'))
+from geodesy import haversine
+from trajectory import segment_tracks, MAX_STOP_RADIUS_KM
+
+
+def fixes(wagon, minutes, lat, lon):
+    return pd.DataFrame({'wagon_ID': wagon, 'timestamp_measure_position': pd.to_timedelta(minutes, unit='min'),
+                         'latitude': lat, 'longitude': lon})
+
+
+def test_empty_input():
+    stops, trips = segment_tracks(fixes([], [], [], []))
+    assert stops.empty and trips.empty
+    assert {'start', 'end', 'latitude'} <= set(stops.columns)
+    assert {'start', 'end', 'distance_km'} <= set(trips.columns)
+
+
+def test_single_fix_tracks():
+    stops, trips = segment_tracks(fixes(['a', 'b'], [0, 5], [50.0, 51.0], [8.0, 9.0]))
+    assert stops.empty and trips.empty
+
+
+def test_stop_trip_stop():
+    # One hour parked, a 20 km run at 60 km/h, one hour parked
+    minutes = np.r_[np.arange(0, 61, 10), np.arange(61, 81), np.arange(90, 151, 10)]
+    lat = np.r_[np.full(7, 50.0), 50.0 + np.arange(1, 21) * 0.009, np.full(7, 50.18)]
+    stops, trips = segment_tracks(fixes('w', minutes, lat, np.full(len(lat), 8.0)))
+    assert len(stops) == 2 and len(trips) == 1
+    assert stops['latitude'].tolist() == [50.0, 50.18]
+    assert abs(trips['distance_km'].iloc[0] - 20.0) < 0.1
+
+
+def test_slow_drift_is_not_one_stop():
+    # 30 km of drift in 0.1 km steps, one step per hour: every step is still, but the wagon does not stay put
+    n = 301
+    lat = 50.0 + np.arange(n) * 0.0009
+    stops, trips = segment_tracks(fixes('w', np.arange(n) * 60, lat, np.full(n, 8.0)))
+    assert len(stops) > 1
+    for start, end in zip(stops['start'] // pd.Timedelta(hours=1), stops['end'] // pd.Timedelta(hours=1)):
+        span = lat[start:end + 1]
+        assert haversine(span[0], 8.0, span, 8.0).max() <= MAX_STOP_RADIUS_KM
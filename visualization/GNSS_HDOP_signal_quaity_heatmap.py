@@ -5,65 +5,77 @@ and visualizes the data as a geographic heatmap.
 
 Steps:
 1. Load the input data.
-2. Filter rows where position was determined via GNSS (type 1).
-3. Drop irrelevant columns and keep only high-quality signals (HDOP ≤ 35).
+2. Read only rows where position was determined via GNSS (type 1) and the needed columns.
+3. Keep only high-quality signals (HDOP ≤ 35).
 4. Map signal quality inversely to HDOP.
-5. Create and display a heatmap using Folium.
+5. Create and display a heatmap using Folium (HEATMAP_MODE 'points': all points embedded in
+   the HTML; 'compact': the points embedded as compressed fixed-point binary, compact_heatmap.py;
+   'tiles': z/x/y tile pyramid on disk loaded through a local tile layer, tile_pyramid.py).
 """
 
 import pandas as pd
 import numpy as np
 import gc
+import os
+import sys
 import time
 import requests
 import folium
 from folium.plugins import HeatMap
+from tile_pyramid import build_pyramid, add_tile_layer  # Pre-aggregated heatmap tiles
+from compact_heatmap import CompactHeatMap  # HeatMap with a binary point payload
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_preprocessing'))
+from columnar_cache import read_longterm  # Parquet ingest cache of the raw CSVs
 
 start = time.time()  # Start timing
 
-# Load the dataset and filter for GNSS-based localization
-table1 = pd.read_csv(r"D:\MLAP\PRT2\Test\02_211203_TUDA_data11.csv", index_col='wagon_ID')
-table2 = table1[table1['determination_position'].isin([1])]
-del table1
-gc.collect()
-
-# Drop unnecessary columns
-table3 = table2.drop(labels=[
-    'loading_state', 'loading_state_update', 'altitude',
-    'signal_quality_satellite', 'determination_position', 'GNSS_velocity',
-    'timestamp_measure_position', 'timestamp_transfer',
-    'movement_state', 'timestamp_measure_movement_state',
-    'timestamp_index', 'provider'
-], axis=1)
-del table2
-gc.collect()
+# Load only GNSS-based localization (filter pushed down to the cache scan) and the needed columns
+input_file = os.environ.get('HDOP_HEATMAP_INPUT', r"D:\MLAP\PRT2\Test\02_211203_TUDA_data11.csv")
+hdop_max = float(os.environ.get('HDOP_MAX', 35))
+table3 = read_longterm(input_file,
+                       columns=['wagon_ID', 'latitude', 'longitude', 'signal_quality_hdop'],
+                       determination_position=1).set_index('wagon_ID')
 
 # Filter signals with good HDOP (≤ 35)
-table_goodsignal = table3[table3['signal_quality_hdop'] <= 35]
-table_goodsignal.loc[:, 'signal_quality'] = 35 - table_goodsignal['signal_quality_hdop']
+table_goodsignal = table3[table3['signal_quality_hdop'] <= hdop_max]
+table_goodsignal.loc[:, 'signal_quality'] = hdop_max - table_goodsignal['signal_quality_hdop']
 lat2 = table_goodsignal['latitude']
 lon2 = table_goodsignal['longitude']
 quality = table_goodsignal["signal_quality"]
 del table_goodsignal
 gc.collect()
 
-# Create DataFrame for heatmap
-dict2 = {'lat': lat2.values, 'lon': lon2.values, "quality": quality.values}
-df_lat_lon = pd.DataFrame(dict2, index=lat2.index)
-del lat2, lon2, quality, dict2
-gc.collect()
+# Output file and heatmap mode: 'points' (JSON in the HTML), 'compact' or 'tiles'
+output_file = os.environ.get('HDOP_HEATMAP_OUTPUT', '111111.html')
+heatmap_mode = os.environ.get('HEATMAP_MODE', 'points')
+tile_dir = os.environ.get('HEATMAP_TILE_DIR', os.path.splitext(output_file)[0] + '_tiles')
 
-# Convert to list for Folium
-final = df_lat_lon.to_numpy().tolist()
-del df_lat_lon
-gc.collect()
-
-# Generate HeatMap
 m = folium.Map([52.12, 9.74], tiles='OpenStreetMap', zoom_start=6)
-HeatMap(final, min_opacity=0.3, radius=14.5, blur=10).add_to(m)
+if heatmap_mode == 'tiles':
+    # Bin the points into the tile pyramid (no per-point list in the HTML)
+    meta = build_pyramid([(lat2, lon2, quality)], tile_dir)
+    print("{} points, tiles per zoom level: {}".format(meta['n_points'], meta['tiles']))
+    add_tile_layer(m, tile_dir, output_file)
+elif heatmap_mode == 'compact':
+    # Same heatmap, points embedded as compressed int32/uint8 arrays instead of JSON floats
+    CompactHeatMap(lat2, lon2, quality, min_opacity=0.3, radius=14.5, blur=10).add_to(m)
+else:
+    # Create DataFrame for heatmap
+    dict2 = {'lat': lat2.values, 'lon': lon2.values, "quality": quality.values}
+    df_lat_lon = pd.DataFrame(dict2, index=lat2.index)
+    del lat2, lon2, quality, dict2
+    gc.collect()
+
+    # Convert to list for Folium
+    final = df_lat_lon.to_numpy().tolist()
+    del df_lat_lon
+    gc.collect()
+
+    # Generate HeatMap
+    HeatMap(final, min_opacity=0.3, radius=14.5, blur=10).add_to(m)
 
 # Save map to file
-output_file = '111111.html'
 m.save(output_file)
 
 end = time.time()  # End timing
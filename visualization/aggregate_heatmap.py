@@ -0,0 +1,169 @@
+"""
+Zoom-adaptive Folium heatmap from cluster or grid-cell aggregates instead of raw points.
+
+The clustering scripts (cluster centroids with n and mean quality, e.g. ClusterStats.csv
+of the merge step) and GNSS_grid_binning.py (per-cell means of several cell sizes)
+already summarize millions of points into a few thousand. Here every aggregate
+becomes one weighted heatmap point, and the map shows one level of detail at a time:
+1. Load the aggregate files (latitude/lat, longitude/lon, signal_quality/quality, n).
+2. Estimate the spacing of every level (median distance to the nearest neighbour) and
+   give each level the zoom range in which its points are TARGET_SPACING_PX or more
+   apart on screen: coarse clusters when zoomed out, finer cells when zoomed in.
+3. Add one HeatMap layer per level and a small script that shows only the layer of
+   the current zoom level (switched on 'zoomend').
+The intensity of a point is its mean quality (as in the raw-point heatmaps) or its
+point count (log scale), normalized to 0..1 and not faded by zoom.
+
+Functions:
+- load_aggregates: aggregate table with normalized column names.
+- median_spacing_m: typical distance between neighbouring aggregates.
+- zoom_ranges: (min_zoom, max_zoom) of every level.
+- add_aggregate_heatmap: add the layers and the zoom switch to a Folium map.
+
+Usage:
+    AGGREGATE_FILES="ClusterStats.csv;levels/GNSS_grid_cell=4000m.csv;levels/GNSS_grid_cell=1000m.csv" \\
+    python aggregate_heatmap.py
+"""
+
+import os
+import time
+import numpy as np
+import pandas as pd
+import folium
+from branca.element import MacroElement
+from jinja2 import Template
+from folium.plugins import HeatMap
+from scipy.spatial import cKDTree
+
+TARGET_SPACING_PX = 8  # Min. screen distance between neighbouring points of the shown level
+MAX_MAP_ZOOM = 18  # Highest zoom level of the map
+METERS_PER_PIXEL_Z0 = 156543.03392  # Web Mercator ground resolution at the equator, zoom 0
+EARTH_RADIUS_M = 6371000
+
+# Accepted column names of the aggregate files
+COLUMN_ALIASES = {'latitude': 'lat', 'longitude': 'lon', 'signal_quality': 'quality'}
+
+
+# Aggregate table with the columns lat, lon, quality (NaN if missing) and n (1 if missing)
+def load_aggregates(path):
+    df = pd.read_csv(path).rename(columns=COLUMN_ALIASES)
+    if 'quality' not in df.columns:
+        df['quality'] = np.nan
+    if 'n' not in df.columns:
+        df['n'] = 1
+    return df[['lat', 'lon', 'quality', 'n']].dropna(subset=['lat', 'lon']).reset_index(drop=True)
+
+
+# Median distance (m) of the aggregates to their nearest neighbour (great circle via unit-vector chords)
+def median_spacing_m(df):
+    if len(df) < 2:
+        return np.inf
+    lat = np.radians(df['lat'].to_numpy(dtype=np.float64))
+    lon = np.radians(df['lon'].to_numpy(dtype=np.float64))
+    xyz = np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+    dist, _ = cKDTree(xyz).query(xyz, k=2)
+    chord = dist[:, 1][dist[:, 1] > 0]
+    if not len(chord):
+        return np.inf
+    return float(2 * EARTH_RADIUS_M * np.arcsin(np.median(chord) / 2))
+
+
+# Zoom range of every level (coarse to fine); empty levels get None
+def zoom_ranges(frames, target_px=TARGET_SPACING_PX):
+    ranges = [None] * len(frames)
+    levels = [i for i, f in enumerate(frames) if len(f)]
+    if not levels:
+        return ranges
+    lat0 = np.radians(np.nanmedian(np.concatenate([frames[i]['lat'].to_numpy() for i in levels])))
+    spacing = np.array([median_spacing_m(frames[i]) for i in levels])
+    # First zoom at which the points of a level are at least target_px apart
+    with np.errstate(divide='ignore'):
+        first = np.ceil(np.log2(target_px * METERS_PER_PIXEL_Z0 * np.cos(lat0) / spacing))
+    first = np.clip(np.nan_to_num(first, neginf=0), 0, MAX_MAP_ZOOM).astype(int)
+
+    # Every non-empty level is shown from its first zoom until the next finer level takes over;
+    # the coarsest level starts at zoom 0
+    order = np.argsort(-spacing, kind='stable')
+    start = 0
+    for rank, j in enumerate(order):
+        later = [first[k] for k in order[rank + 1:]]
+        end = min(later) - 1 if later else MAX_MAP_ZOOM
+        if end >= start:
+            ranges[levels[j]] = (start, end)
+            start = end + 1
+    return ranges
+
+
+# Heatmap intensity of the aggregates (0..1): mean quality, or point count on a log scale
+def heat_weights(df, weight='quality'):
+    if weight == 'n' or df['quality'].isna().all():
+        value = np.log1p(df['n'].to_numpy(dtype=np.float64))
+    else:
+        value = df['quality'].fillna(0).to_numpy(dtype=np.float64)
+    return value / max(value.max(), 1e-12) if len(value) else value
+
+
+class ZoomSwitch(MacroElement):
+    """Shows each layer only within its zoom range."""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var levels = [
+                {% for layer, zmin, zmax in this.levels %}
+                {layer: {{ layer.get_name() }}, min: {{ zmin }}, max: {{ zmax }}},
+                {% endfor %}
+            ];
+            function update() {
+                var zoom = map.getZoom();
+                levels.forEach(function(level) {
+                    var show = zoom >= level.min && zoom <= level.max;
+                    if (show && !map.hasLayer(level.layer)) { map.addLayer(level.layer); }
+                    if (!show && map.hasLayer(level.layer)) { map.removeLayer(level.layer); }
+                });
+            }
+            map.on('zoomend', update);
+            update();
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, levels):
+        super().__init__()
+        self._name = 'ZoomSwitch'
+        self.levels = levels
+
+
+# Add one HeatMap per aggregate level and the zoom switch; returns the zoom range of every level
+def add_aggregate_heatmap(m, frames, weight='quality', ranges=None, radius=14.5, blur=10, min_opacity=0.3):
+    ranges = ranges or zoom_ranges(frames)
+    levels = []
+    for f, zoom_range in zip(frames, ranges):
+        if zoom_range is None or not len(f):
+            continue
+        data = np.column_stack([f['lat'], f['lon'], heat_weights(f, weight)]).tolist()
+        # max_zoom=0: full intensity at every zoom (Leaflet.heat fades points below max_zoom)
+        layer = HeatMap(data, min_opacity=min_opacity, radius=radius, blur=blur, max_zoom=0, control=False)
+        layer.add_to(m)
+        levels.append((layer, zoom_range[0], zoom_range[1]))
+    ZoomSwitch(levels).add_to(m)
+    return ranges
+
+
+if __name__ == '__main__':
+    # Aggregate files (';'-separated, any order) and output; environment variables override them
+    input_files = os.environ.get('AGGREGATE_FILES', r"E:\MLA(GROUP WORK)\Data\GNSS_merged\ClusterStats.csv").split(';')
+    output_file = os.environ.get('AGGREGATE_HEATMAP_OUTPUT', 'aggregate_heatmap.html')
+    weight = os.environ.get('HEATMAP_WEIGHT', 'quality')  # 'quality' or 'n'
+
+    start = time.time()
+    frames = [load_aggregates(path) for path in input_files]
+    m = folium.Map([52.12, 9.74], tiles='OpenStreetMap', zoom_start=6)
+    ranges = add_aggregate_heatmap(m, frames, weight)
+    for path, f, zoom_range in zip(input_files, frames, ranges):
+        shown = f"zoom {zoom_range[0]}-{zoom_range[1]}" if zoom_range else "not shown (no zoom level left)"
+        print(f"{os.path.basename(path)}: {len(f)} points, spacing {median_spacing_m(f):.0f} m, {shown}")
+    m.save(output_file)
+    print(f"{sum(len(f) for f in frames)} weighted points, {os.path.getsize(output_file) / 1e6:.2f} MB, "
+          f"run time = {time.time() - start:.2f} seconds")
@@ -0,0 +1,91 @@
+"""
+Folium heatmap layer with a compact binary point payload.
+
+folium.plugins.HeatMap writes every point as a JSON triple of decimal floats
+("[52.123456789, 9.87654321, 17.0]"), so the HTML file is many times larger
+than the data and the browser has to parse all of it. CompactHeatMap embeds
+the same points as one base64 string instead:
+1. Coordinates become int32 fixed-point values (COORD_SCALE per degree, ~0.1 m), the
+   weights uint8 levels between 0 and the largest weight.
+2. The points are sorted by latitude and the coordinates delta-encoded, so that
+   repeated and nearby positions turn into runs of small numbers.
+3. The arrays are deflate-compressed (zlib) and base64-encoded.
+A small decoder in the page inflates the payload (DecompressionStream), rebuilds
+the typed arrays and hands the points to the same Leaflet.heat layer that HeatMap
+uses, so the map looks the same.
+
+Usage: CompactHeatMap(lat, lon, weight, min_opacity=0.3, radius=14.5, blur=10).add_to(m)
+"""
+
+import base64
+import zlib
+import numpy as np
+from folium.elements import JSCSSMixin
+from folium.map import Layer
+from folium.plugins import HeatMap
+from folium.template import Template
+from folium.utilities import remove_empty
+
+COORD_SCALE = 10 ** 6  # Fixed-point units per degree (1e-6 deg ~ 0.1 m)
+WEIGHT_LEVELS = 255  # uint8 weight levels
+
+
+# Base64 payload (delta-encoded int32 lat, lon, uint8 weight, deflated) and the weight scale
+def encode_points(lat, lon, weight):
+    lat = np.round(np.asarray(lat, dtype=np.float64) * COORD_SCALE).astype(np.int64)
+    lon = np.round(np.asarray(lon, dtype=np.float64) * COORD_SCALE).astype(np.int64)
+    weight = np.asarray(weight, dtype=np.float64)
+    order = np.lexsort((lon, lat))
+    lat, lon, weight = lat[order], lon[order], weight[order]
+    weight_max = float(weight.max()) if len(weight) and weight.max() > 0 else 1.0
+    levels = np.round(np.clip(weight, 0, None) / weight_max * WEIGHT_LEVELS).astype('<u1')
+    payload = b''.join([np.diff(lat, prepend=0).astype('<i4').tobytes(),
+                        np.diff(lon, prepend=0).astype('<i4').tobytes(),
+                        levels.tobytes()])
+    return base64.b64encode(zlib.compress(payload, 9)).decode('ascii'), weight_max / WEIGHT_LEVELS
+
+
+class CompactHeatMap(JSCSSMixin, Layer):
+    """HeatMap whose points are embedded as compressed fixed-point binary and decoded in the browser."""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.heatLayer([], {{ this.options|tojavascript }});
+            (async function() {
+                var text = atob("{{ this.payload }}");
+                var bytes = new Uint8Array(text.length);
+                for (var i = 0; i < text.length; i++) { bytes[i] = text.charCodeAt(i); }
+                var stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('deflate'));
+                var buffer = await new Response(stream).arrayBuffer();
+                var n = {{ this.n_points }};
+                var lat = new Int32Array(buffer, 0, n);
+                var lon = new Int32Array(buffer, 4 * n, n);
+                var weight = new Uint8Array(buffer, 8 * n, n);
+                var points = new Array(n);
+                var a = 0, b = 0;
+                for (var j = 0; j < n; j++) {
+                    a += lat[j];
+                    b += lon[j];
+                    points[j] = [a / {{ this.coord_scale }}, b / {{ this.coord_scale }}, weight[j] * {{ this.weight_scale }}];
+                }
+                {{ this.get_name() }}.setLatLngs(points);
+            })();
+        {% endmacro %}
+    """)
+
+    default_js = HeatMap.default_js
+
+    def __init__(self, lat, lon, weight=None, name=None, min_opacity=0.5, max_zoom=18, radius=25, blur=15,
+                 gradient=None, overlay=True, control=True, show=True, **kwargs):
+        super().__init__(name=name, overlay=overlay, control=control, show=show)
+        self._name = 'CompactHeatMap'
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        weight = np.ones(len(lat)) if weight is None else np.asarray(weight, dtype=np.float64)
+        if np.isnan(lat).any() or np.isnan(lon).any() or np.isnan(weight).any():
+            raise ValueError("data may not contain NaNs.")
+        self.payload, self.weight_scale = encode_points(lat, lon, weight)
+        self.n_points = len(lat)
+        self.coord_scale = COORD_SCALE
+        self.options = remove_empty(min_opacity=min_opacity, max_zoom=max_zoom, radius=radius, blur=blur,
+                                    gradient=gradient, **kwargs)
@@ -0,0 +1,234 @@
+"""
+Persistent, coordinate-keyed cache for Nominatim reverse geocoding with concurrent lookups.
+
+Wagons stand in the same yards for days, so most coordinates of a file are
+repeats, and each repeat used to cost one remote call. Here:
+1. Coordinates are rounded to PRECISION decimals (4 decimals ~ 11 m) and every
+   distinct rounded pair is looked up only once.
+2. The rounded pairs are first looked up in an SQLite cache on disk, which keeps
+   all answers across runs and files.
+3. Only the cache misses are sent to the Nominatim server by an asyncio client
+   with at most MAX_CONCURRENCY requests in flight (blocking requests calls run
+   in a thread pool of that size; new requests are only started when one has
+   finished), optionally spaced by MIN_DELAY seconds. NOMINATIM_URL can point at
+   a local Nominatim instance or stand-in server. The public server allows about
+   one request per second, so keep the defaults there.
+4. The answers are written to the cache in batches of FLUSH_EVERY as they arrive
+   (and whatever is left when the run stops, also on an interrupt), so a long run
+   keeps its progress. They are mapped back to every input row as structured
+   address fields.
+
+Cache hit rate, deduplication and request latency are returned as a stats dict
+(format_stats prints them). Failed requests are not cached, so they are retried
+by the next run.
+
+Functions:
+- GeocodeCache: SQLite store of raw answers keyed by rounded coordinates.
+- NominatimClient: bounded-concurrency asyncio client for /reverse.
+- reverse_geocode: deduplicate, look up, fetch misses and build the address table.
+- format_stats: one-line summary of the stats dict.
+"""
+
+import os
+import json
+import time
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import requests
+
+NOMINATIM_URL = os.environ.get('NOMINATIM_URL', 'https://nominatim.openstreetmap.org')
+CACHE_FILE = os.environ.get('GEOCODE_CACHE',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'geocode_cache.sqlite'))
+PRECISION = int(os.environ.get('GEOCODE_PRECISION', 4))  # Decimals of the cache key (4 ~ 11 m)
+MAX_CONCURRENCY = int(os.environ.get('GEOCODE_CONCURRENCY', 1))  # Requests in flight
+MIN_DELAY = float(os.environ.get('GEOCODE_MIN_DELAY', 1.0))  # Seconds between request starts (0 = no limit)
+USER_AGENT = 'TUDA-wagon-analysis'
+TIMEOUT = 10  # Seconds per request
+FLUSH_EVERY = 50  # Answers written to the cache at a time
+
+# Structured output columns and the Nominatim address keys they are taken from (first present wins)
+ADDRESS_FIELDS = {
+    'country': ['country'],
+    'state': ['state'],
+    'municipality': ['city', 'town', 'village', 'municipality', 'hamlet'],
+    'postcode': ['postcode'],
+    'road': ['road'],
+}
+
+
+class GeocodeCache:
+    """Raw Nominatim answers in SQLite, keyed by coordinates rounded to `precision` decimals."""
+
+    def __init__(self, path=CACHE_FILE, precision=PRECISION):
+        self.path = path
+        self.precision = precision
+        self.db = sqlite3.connect(path)
+        self.db.execute('CREATE TABLE IF NOT EXISTS geocode (precision INTEGER, lat_key INTEGER, lon_key INTEGER, '
+                        'answer TEXT, PRIMARY KEY (precision, lat_key, lon_key))')
+
+    # Integer keys of the rounded coordinates (0 for NaN)
+    def keys(self, lat, lon):
+        scale = 10 ** self.precision
+        lat = np.nan_to_num(np.asarray(lat, dtype=np.float64))
+        lon = np.nan_to_num(np.asarray(lon, dtype=np.float64))
+        return np.round(lat * scale).astype(np.int64), np.round(lon * scale).astype(np.int64)
+
+    # Cached answers (JSON text) for arrays of keys; None where missing
+    def get_many(self, lat_keys, lon_keys):
+        self.db.execute('CREATE TEMP TABLE IF NOT EXISTS wanted (i INTEGER, lat_key INTEGER, lon_key INTEGER)')
+        self.db.execute('DELETE FROM wanted')
+        self.db.executemany('INSERT INTO wanted VALUES (?, ?, ?)',
+                            zip(range(len(lat_keys)), map(int, lat_keys), map(int, lon_keys)))
+        answers = np.full(len(lat_keys), None, dtype=object)
+        rows = self.db.execute('SELECT w.i, g.answer FROM wanted w JOIN geocode g ON g.precision = ? '
+                               'AND g.lat_key = w.lat_key AND g.lon_key = w.lon_key', (self.precision,)).fetchall()
+        for i, answer in rows:
+            answers[i] = answer
+        return answers
+
+    def put_many(self, lat_keys, lon_keys, answers):
+        self.db.executemany('INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?)',
+                            [(self.precision, int(a), int(b), s) for a, b, s in zip(lat_keys, lon_keys, answers)])
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+class NominatimClient:
+    """Reverse geocoding against a Nominatim server with bounded concurrency."""
+
+    def __init__(self, url=NOMINATIM_URL, max_concurrency=MAX_CONCURRENCY, min_delay=MIN_DELAY):
+        self.url = url.rstrip('/') + '/reverse'
+        self.max_concurrency = max_concurrency
+        self.min_delay = min_delay
+        self.latencies = []
+
+    # JSON text of one answer, None if the request failed
+    def _get(self, lat, lon):
+        start = time.perf_counter()
+        try:
+            params = {'format': 'jsonv2', 'lat': lat, 'lon': lon, 'addressdetails': 1}
+            response = requests.get(self.url, params=params, headers={'User-Agent': USER_AGENT}, timeout=TIMEOUT)
+            response.raise_for_status()
+            return response.text
+        except requests.RequestException:
+            return None
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+    async def _reverse_all(self, lat, lon, on_answer):
+        loop = asyncio.get_running_loop()
+        answers = [None] * len(lat)
+        in_flight = {}  # Future -> index of its coordinates
+        next_start = loop.time()
+
+        def collect(done):
+            for future in done:
+                i = in_flight.pop(future)
+                answers[i] = future.result()
+                if on_answer is not None:
+                    on_answer(i, answers[i])
+
+        # Own pool of max_concurrency threads (the default executor would cap the concurrency itself)
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            try:
+                for i, (a, b) in enumerate(zip(lat, lon)):
+                    # At most max_concurrency requests in flight: wait for one to finish first
+                    if len(in_flight) >= self.max_concurrency:
+                        done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                        collect(done)
+                    # Space the request starts by min_delay seconds
+                    await asyncio.sleep(max(0.0, next_start - loop.time()))
+                    next_start = loop.time() + self.min_delay
+                    in_flight[loop.run_in_executor(executor, self._get, a, b)] = i
+                if in_flight:
+                    done, _ = await asyncio.wait(in_flight)
+                    collect(done)
+            finally:
+                # Interrupted: keep the answers that have already arrived
+                collect([f for f in in_flight if f.done() and not f.cancelled()])
+        return answers
+
+    # Answers (JSON text or None) for arrays of coordinates; on_answer(i, answer) is called as each one arrives
+    def reverse_many(self, lat, lon, on_answer=None):
+        if not len(lat):
+            return []
+        return asyncio.run(self._reverse_all(list(map(float, lat)), list(map(float, lon)), on_answer))
+
+
+# Structured address fields of one JSON answer
+def _parse(answer):
+    fields = dict.fromkeys(list(ADDRESS_FIELDS) + ['display_name'])
+    if answer is None:
+        return fields
+    data = json.loads(answer)
+    address = data.get('address', {})
+    for column, keys in ADDRESS_FIELDS.items():
+        fields[column] = next((address[k] for k in keys if k in address), None)
+    fields['display_name'] = data.get('display_name')
+    return fields
+
+
+# Address table of every row (deduplicated, cached lookups) and the stats of the run
+def reverse_geocode(lat, lon, cache, client):
+    start = time.perf_counter()
+    lat_keys, lon_keys = cache.keys(lat, lon)
+    valid = np.isfinite(np.asarray(lat, dtype=np.float64)) & np.isfinite(np.asarray(lon, dtype=np.float64))
+
+    # Distinct rounded coordinates, then the cache, then the server for the misses only
+    pairs, inverse = np.unique(np.column_stack([lat_keys[valid], lon_keys[valid]]), axis=0, return_inverse=True)
+    answers = cache.get_many(pairs[:, 0], pairs[:, 1])
+    miss = np.flatnonzero([a is None for a in answers])
+    n_latencies = len(client.latencies)
+    scale = 10 ** cache.precision
+
+    # Successful answers are written to the cache in batches while the requests run
+    batch = []
+
+    def flush():
+        if batch:
+            rows = np.array([i for i, _ in batch])
+            cache.put_many(pairs[rows, 0], pairs[rows, 1], [a for _, a in batch])
+            batch.clear()
+
+    def on_answer(i, answer):
+        if answer is not None:
+            batch.append((miss[i], answer))
+            if len(batch) >= FLUSH_EVERY:
+                flush()
+
+    try:
+        fetched = client.reverse_many(pairs[miss, 0] / scale, pairs[miss, 1] / scale, on_answer)
+    finally:
+        flush()
+    answers[miss] = fetched
+    ok = np.array([a is not None for a in fetched], dtype=bool)
+
+    unique = pd.DataFrame([_parse(a) for a in answers], columns=list(ADDRESS_FIELDS) + ['display_name'])
+    result = pd.DataFrame(index=range(len(valid)), columns=unique.columns, dtype=object)
+    result.loc[valid] = unique.iloc[inverse.ravel()].to_numpy()
+
+    latencies = np.asarray(client.latencies[n_latencies:])
+    stats = {
+        'rows': int(len(valid)),
+        'unique': int(len(pairs)),
+        'dedup_saving': 1 - len(pairs) / max(int(valid.sum()), 1),
+        'cache_hits': int(len(pairs) - len(miss)),
+        'hit_rate': (len(pairs) - len(miss)) / max(len(pairs), 1),
+        'requests': int(len(miss)),
+        'failed': int((~ok).sum()),
+        'latency_mean': float(latencies.mean()) if len(latencies) else 0.0,
+        'latency_p95': float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+        'seconds': time.perf_counter() - start,
+    }
+    return result, stats
+
+
+def format_stats(stats):
+    return ("{rows} rows, {unique} distinct coordinates ({dedup_saving:.1%} saved by deduplication), "
+            "cache hit rate {hit_rate:.1%}, {requests} requests ({failed} failed), latency mean "
+            "{latency_mean:.3f} s / p95 {latency_p95:.3f} s, run time {seconds:.2f} s").format(**stats)
@@ -0,0 +1,204 @@
+"""
+Offline batch reverse geocoding of GPS coordinates with a local GeoNames gazetteer.
+
+Nominatim answers about one request per second over the network, which takes
+weeks for one long-term file. This module instead resolves whole arrays of
+coordinates against local data:
+- country: exact country polygons via the offline country store (country_store.py).
+- state, municipality: the nearest populated place of the gazetteer and its
+  first-order administrative division. Point gazetteers carry no municipality
+  boundaries, so near a boundary this is the closest town rather than the
+  containing one.
+- station: the nearest railway station, stop or yard of the gazetteer.
+Distances to the nearest place and station are reported in km.
+
+Places and stations are kept in KD-trees over 3D unit vectors, where the nearest
+chord is also the nearest great circle (as in centroid_model.py), and every
+distinct coordinate pair of a batch is queried only once.
+
+Steps:
+1. Download the GeoNames country extracts and the admin1 names once (or place them
+   in GAZETTEER_DIR on machines without network access).
+2. Filter places and stations and save them as gazetteer.parquet. It is rebuilt when the
+   country list changes or a source file is missing or has changed (SHA-256 in gazetteer.json).
+3. Build the KD-trees and resolve batches of coordinates with OfflineGeocoder.reverse.
+
+Run this file directly to build the gazetteer once.
+"""
+
+import os
+import sys
+import io
+import csv
+import json
+import time
+import zipfile
+import numpy as np
+import pandas as pd
+import requests
+from scipy.spatial import cKDTree
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_preprocessing'))
+from country_store import open_store, file_digest  # Offline country-boundary store with raster lookup
+
+GEONAMES_URL = "https://download.geonames.org/export/dump/"
+# Local copies of the GeoNames files; place them here on machines without network access
+GAZETTEER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gazetteer')
+GAZETTEER_COUNTRIES = ('DE', 'AT', 'CH', 'NL', 'BE', 'LU', 'FR', 'IT', 'DK', 'SE', 'NO',
+                       'PL', 'CZ', 'SK', 'HU', 'SI', 'HR', 'RO', 'BG', 'RS', 'ES', 'PT')
+ADMIN1_FILE = 'admin1CodesASCII.txt'
+
+# Columns of the GeoNames "geoname" table (tab separated, no header)
+GEONAMES_COLUMNS = ['geonameid', 'name', 'asciiname', 'alternatenames', 'latitude', 'longitude',
+                    'feature_class', 'feature_code', 'country_code', 'cc2', 'admin1_code', 'admin2_code',
+                    'admin3_code', 'admin4_code', 'population', 'elevation', 'dem', 'timezone', 'modification_date']
+# Populated places without sections, historical, abandoned or destroyed places
+SKIPPED_PLACE_CODES = ('PPLX', 'PPLH', 'PPLQ', 'PPLW', 'PPLCH')
+STATION_CODES = ('RSTN', 'RSTP', 'RYD')  # Railroad station, railroad stop, railroad yard
+EARTH_RADIUS_KM = 6371  # Earth radius in kilometers
+
+
+# 3D unit vectors of points given in degrees
+def _unit_vectors(lat, lon):
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+# Local path of a GeoNames file, downloading it once if it is missing
+def _fetch(name, directory):
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        response = requests.get(GEONAMES_URL + name)
+        response.raise_for_status()
+        with open(path, 'wb') as f:
+            f.write(response.content)
+    return path
+
+
+# Places (feature class P) and stations of one GeoNames country extract (<CC>.zip)
+def read_geonames(path):
+    with zipfile.ZipFile(path) as z:
+        name = os.path.splitext(os.path.basename(path))[0] + '.txt'
+        text = io.TextIOWrapper(z.open(name), encoding='utf-8')
+        df = pd.read_csv(text, sep='\t', header=None, names=GEONAMES_COLUMNS, quoting=csv.QUOTE_NONE,
+                         usecols=['name', 'latitude', 'longitude', 'feature_class', 'feature_code',
+                                  'country_code', 'admin1_code'],
+                         dtype={'feature_class': str, 'feature_code': str, 'country_code': str, 'admin1_code': str},
+                         keep_default_na=False, na_values={'latitude': [''], 'longitude': ['']})
+    place = (df['feature_class'] == 'P') & ~df['feature_code'].isin(SKIPPED_PLACE_CODES)
+    station = df['feature_code'].isin(STATION_CODES)
+    df = df[place | station].copy()
+    df['kind'] = np.where(station[place | station], 'station', 'place')
+    return df.drop(columns=['feature_class', 'feature_code'])
+
+
+# Admin1 names keyed by "<country code>.<admin1 code>"
+def read_admin1(path):
+    return pd.read_csv(path, sep='\t', header=None, names=['code', 'name', 'asciiname', 'geonameid'],
+                       quoting=csv.QUOTE_NONE, keep_default_na=False, usecols=['code', 'name'],
+                       dtype=str).set_index('code')['name']
+
+
+# GeoNames files the gazetteer of `countries` is built from
+def _source_names(countries):
+    return [f"{cc}.zip" for cc in countries] + [ADMIN1_FILE]
+
+
+# Build gazetteer.parquet from the GeoNames files (downloaded if missing)
+def build_gazetteer(directory=GAZETTEER_DIR, countries=GAZETTEER_COUNTRIES):
+    sources = [_fetch(f"{cc}.zip", directory) for cc in countries]
+    admin1 = read_admin1(_fetch(ADMIN1_FILE, directory))
+    gazetteer = pd.concat([read_geonames(path) for path in sources], ignore_index=True)
+    gazetteer['state'] = (gazetteer['country_code'] + '.' + gazetteer['admin1_code']).map(admin1).fillna('')
+    gazetteer = gazetteer.drop(columns=['admin1_code'])
+    gazetteer.to_parquet(os.path.join(directory, 'gazetteer.parquet'), index=False)
+    header = {'countries': list(countries),
+              'source_sha256': {name: file_digest(os.path.join(directory, name)) for name in _source_names(countries)}}
+    with open(os.path.join(directory, 'gazetteer.json'), 'w', encoding='utf-8') as f:
+        json.dump(header, f)
+    return gazetteer
+
+
+# True if gazetteer.parquet was built from the current content of all source files and the same country list
+def _is_current(directory, countries):
+    header_path = os.path.join(directory, 'gazetteer.json')
+    if not os.path.exists(os.path.join(directory, 'gazetteer.parquet')) or not os.path.exists(header_path):
+        return False
+    with open(header_path, encoding='utf-8') as f:
+        header = json.load(f)
+    if header['countries'] != list(countries):
+        return False
+    digests = header.get('source_sha256', {})
+    for name in _source_names(countries):
+        path = os.path.join(directory, name)
+        if not os.path.exists(path) or digests.get(name) != file_digest(path):
+            return False
+    return True
+
+
+class OfflineGeocoder:
+    """Nearest place and station KD-trees with country polygons for batch reverse geocoding."""
+
+    def __init__(self, gazetteer, country_store=None):
+        # Entries without coordinates cannot be nearest to anything (and the KD-trees need finite values)
+        located = np.isfinite(gazetteer['latitude'].to_numpy(dtype=np.float64)) & \
+            np.isfinite(gazetteer['longitude'].to_numpy(dtype=np.float64))
+        gazetteer = gazetteer[located]
+        is_station = (gazetteer['kind'] == 'station').to_numpy()
+        self.places = gazetteer[~is_station].reset_index(drop=True)
+        self.stations = gazetteer[is_station].reset_index(drop=True)
+        self.place_tree = cKDTree(_unit_vectors(self.places['latitude'], self.places['longitude']))
+        self.station_tree = cKDTree(_unit_vectors(self.stations['latitude'], self.stations['longitude']))
+        self.country_store = country_store
+
+    # Nearest entry of `table` for every point: names, distances in km
+    @staticmethod
+    def _nearest(tree, table, points, columns, workers):
+        if not len(table):
+            return pd.DataFrame({c: [''] * len(points) for c in columns}), np.full(len(points), np.nan)
+        dist, idx = tree.query(points, k=1, workers=workers)
+        return table.loc[idx, columns].reset_index(drop=True), 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(dist / 2, 0, 1))
+
+    # Address fields of every point: country, state, municipality, station and distances
+    def reverse(self, lat, lon, workers=-1):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        columns = ['country', 'state', 'municipality', 'municipality_km', 'station', 'station_km']
+        valid = np.isfinite(lat) & np.isfinite(lon)
+        result = pd.DataFrame({c: pd.Series([None] * len(lat), dtype=object) for c in columns})
+        if not valid.any():
+            return result
+
+        # Wagons report the same positions many times: resolve every distinct pair only once
+        coords, inverse = np.unique(np.column_stack([lat[valid], lon[valid]]), axis=0, return_inverse=True)
+        points = _unit_vectors(coords[:, 0], coords[:, 1])
+        place, place_km = self._nearest(self.place_tree, self.places, points, ['name', 'state'], workers)
+        station, station_km = self._nearest(self.station_tree, self.stations, points, ['name'], workers)
+        unique = pd.DataFrame({
+            'country': self.country_store.lookup(coords[:, 0], coords[:, 1]) if self.country_store else None,
+            'state': place['state'].to_numpy(),
+            'municipality': place['name'].to_numpy(),
+            'municipality_km': place_km,
+            'station': station['name'].to_numpy(),
+            'station_km': station_km,
+        })
+        result.loc[valid, columns] = unique.iloc[inverse.ravel()].to_numpy()
+        return result.astype({'municipality_km': float, 'station_km': float})
+
+
+# Load the gazetteer (building it first if it is missing or outdated) and the country store
+def open_geocoder(directory=GAZETTEER_DIR, countries=GAZETTEER_COUNTRIES, with_country=True):
+    if _is_current(directory, countries):
+        gazetteer = pd.read_parquet(os.path.join(directory, 'gazetteer.parquet'))
+    else:
+        gazetteer = build_gazetteer(directory, countries)
+    return OfflineGeocoder(gazetteer, open_store() if with_country else None)
+
+
+if __name__ == '__main__':
+    start = time.time()
+    geocoder = open_geocoder()
+    print(f"gazetteer with {len(geocoder.places)} places and {len(geocoder.stations)} stations "
+          f"ready in {time.time() - start:.2f} seconds")
@@ -6,7 +6,10 @@ then generates a geographical heatmap of signal intensity.
 Steps:
 1. Read data from CSV.
 2. Extract latitude, longitude, and quality.
-3. Create a Folium map with HeatMap overlay.
+3. Create a Folium map with HeatMap overlay (HEATMAP_MODE 'points'), or bin the points into
+   a z/x/y tile pyramid on disk and add it as a local tile layer (HEATMAP_MODE 'tiles',
+   tile_pyramid.py; the HTML stays small and the map only loads the tiles in view), or embed
+   the points as compressed fixed-point binary (HEATMAP_MODE 'compact', compact_heatmap.py).
 4. Save the map as an HTML file and open it in the browser.
 """
 
@@ -18,40 +21,61 @@ import time
 import requests
 import folium
 import os
+import sys
 import webbrowser
 from folium.plugins import HeatMap
+from tile_pyramid import build_pyramid, add_tile_layer  # Pre-aggregated heatmap tiles
+from compact_heatmap import CompactHeatMap  # HeatMap with a binary point payload
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_preprocessing'))
+from tuda_schema import PREPROCESSED_DTYPES  # Compact typed schema (float32 coordinates)
 
 start = time.time()  # Start timing
 
+# Input and output files (environment variables override them)
+input_file = os.environ.get('HEATMAP_INPUT', r"E:\sid\TU Darmstadt\Module und Lehrveranstaltungen\WS2022\MLA practical\Maschen_211207_TUDA_data.csv")
+output_file = os.environ.get('HEATMAP_OUTPUT', 'Maschen.html')
+open_browser = os.environ.get('OPEN_BROWSER', '1') == '1'
+heatmap_mode = os.environ.get('HEATMAP_MODE', 'points')  # 'points' (JSON in the HTML), 'compact' or 'tiles'
+tile_dir = os.environ.get('HEATMAP_TILE_DIR', os.path.splitext(output_file)[0] + '_tiles')
+
 # Load the GNSS signal data
-goodsignal1 = pd.read_csv(r"E:\sid\TU Darmstadt\Module und Lehrveranstaltungen\WS2022\MLA practical\Maschen_211207_TUDA_data.csv")
+goodsignal1 = pd.read_csv(input_file, usecols=['latitude', 'longitude', 'signal_quality'], dtype=PREPROCESSED_DTYPES)
 
 # Extract latitude, longitude, and signal quality
 lat2 = goodsignal1['latitude']
 lon2 = goodsignal1['longitude']
+quality = goodsignal1['signal_quality']
 
-# ⚠️ Potential fix: replace with actual quality column if it exists
-quality = goodsignal1["longitude"]  # ← replace with 'signal_quality' if that's correct
+# Create the Folium map
+m = folium.Map([52.12, 9.74], tiles='OpenStreetMap', zoom_start=6)
 
-# Prepare data for heatmap
-df_lat_lon = pd.DataFrame({'lat': lat2.values, 'lon': lon2.values, 'quality': quality.values}, index=lat2.index)
-del lat2, lon2, quality
-gc.collect()
+if heatmap_mode == 'tiles':
+    # Bin the points into the tile pyramid (no per-point list in the HTML)
+    meta = build_pyramid([(lat2, lon2, quality)], tile_dir)
+    print("{} points, tiles per zoom level: {}".format(meta['n_points'], meta['tiles']))
+    add_tile_layer(m, tile_dir, output_file)
+elif heatmap_mode == 'compact':
+    # Same heatmap, points embedded as compressed int32/uint8 arrays instead of JSON floats
+    CompactHeatMap(lat2, lon2, quality, min_opacity=0.3, radius=14.5, blur=10).add_to(m)
+else:
+    # Prepare data for heatmap
+    df_lat_lon = pd.DataFrame({'lat': lat2.values, 'lon': lon2.values, 'quality': quality.values}, index=lat2.index)
+    del lat2, lon2, quality
+    gc.collect()
 
-# Convert to list for Folium
-array = df_lat_lon.to_numpy()
-final = array.tolist()
-del array, df_lat_lon
-gc.collect()
+    # Convert to list for Folium
+    array = df_lat_lon.to_numpy()
+    final = array.tolist()
+    del array, df_lat_lon
+    gc.collect()
 
-# Create and populate Folium map
-m = folium.Map([52.12, 9.74], tiles='OpenStreetMap', zoom_start=6)
-HeatMap(final, min_opacity=0.3, radius=14.5, blur=10).add_to(m)
+    HeatMap(final, min_opacity=0.3, radius=14.5, blur=10).add_to(m)
 
 # Save and open the heatmap
-output_file = 'Maschen.html'
 m.save(output_file)
-webbrowser.open(output_file, new=2)
+if open_browser:
+    webbrowser.open(output_file, new=2)
 
 end = time.time()  # End timing
 print("run time = {}".format(end - start))
@@ -1,51 +1,53 @@
 """
-This script performs reverse geocoding on GPS data using the Nominatim service from OpenStreetMap.
-It reads a CSV containing latitude and longitude columns, converts them into location strings,
-and retrieves full address information for each coordinate.
+This script performs reverse geocoding on GPS data, offline with a local gazetteer or
+with the Nominatim service from OpenStreetMap.
+It reads a CSV containing latitude and longitude columns and retrieves address
+information for each coordinate.
 
 Steps:
 1. Load one CSV file from the specified folder.
-2. Generate "latitude,longitude" strings.
-3. Perform reverse geocoding using geopy with a rate limiter.
-4. Parse and split address strings into structured columns.
-5. Print or optionally save the structured result.
+2. GEOCODER 'offline' (default): resolve all coordinates in one batch to country, state,
+   municipality and nearest station (offline_geocoder.py; seconds per file, no network).
+3. GEOCODER 'nominatim': reverse geocode every distinct coordinate (rounded to GEOCODE_PRECISION
+   decimals) once through a persistent SQLite cache; only cache misses are sent to the Nominatim
+   server (NOMINATIM_URL, bounded concurrency). Prints deduplication, cache hit rate and latency.
+4. Print or optionally save the structured result.
 """
 
 import pandas as pd
 import glob
-from geopy.geocoders import Nominatim
-from geopy.extra.rate_limiter import RateLimiter
+import os
+import sys
 import matplotlib.pyplot as plt
 import plotly_express as px
-from tqdm import tqdm
+from offline_geocoder import open_geocoder  # Batch reverse geocoding with a local gazetteer
+from geocode_cache import GeocodeCache, NominatimClient, reverse_geocode, format_stats  # Cached Nominatim lookups
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_preprocessing'))
+from columnar_cache import read_longterm  # Parquet ingest cache with the compact typed schema
 
 # Path to folder containing 45 long-term CSVs
 file_path = r"D:\MLAP\PRT2\Test\*.csv"
 csv_list = glob.glob(file_path)
 
-# Load the first CSV file
-with open(csv_list[0]) as f:
-    df = pd.read_csv(f)
-
-# Create 'latitude,longitude' strings
-df["geom"] = df["latitude"].map(str) + ',' + df["longitude"].map(str)
-
-# Initialize geocoder and rate limiter
-locator = Nominatim(user_agent="myGeocoder", timeout=10)
-rgeocode = RateLimiter(locator.reverse, min_delay_seconds=0.001)
+# Geocoder: 'offline' (local gazetteer) or 'nominatim' (web requests for uncached coordinates)
+GEOCODER = os.environ.get('GEOCODER', 'offline')
 
-# Apply reverse geocoding with progress bar
-tqdm.pandas()
-df["address"] = df["geom"].progress_apply(rgeocode)
-
-# Convert address results into a string for splitting
-df["address_str"] = df["address"].astype(str)
-
-# Create a new DataFrame splitting the address into components
-address_components = df["address_str"].str.split(",", expand=True)
-
-# Concatenate original index or dummy column with address components
-result = pd.concat([df[["latitude", "longitude"]], address_components], axis=1)
+# Load the first CSV file
+df = read_longterm(csv_list[0], columns=['latitude', 'longitude'])
+
+if GEOCODER == 'offline':
+    # Resolve all coordinates at once against the local gazetteer (structured fields, no parsing)
+    geocoder = open_geocoder()
+    address = geocoder.reverse(df["latitude"], df["longitude"]).set_axis(df.index)
+    result = pd.concat([df[["latitude", "longitude"]], address], axis=1)
+else:
+    # Deduplicated, cached lookups; only cache misses go to the Nominatim server (geocode_cache.py)
+    cache = GeocodeCache()
+    address, stats = reverse_geocode(df["latitude"], df["longitude"], cache, NominatimClient())
+    cache.close()
+    print(format_stats(stats))
+    result = pd.concat([df[["latitude", "longitude"]], address.set_axis(df.index)], axis=1)
 
 # Print sample result
 print(result.head())
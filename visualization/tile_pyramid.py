@@ -0,0 +1,227 @@
+"""
+Pre-aggregated z/x/y tile pyramid of GNSS signal quality for the Folium heatmaps.
+
+HeatMap embeds every point as JSON in the HTML file, so file size and browser
+work grow with the number of points. Here the points are aggregated offline into
+PNG tiles of the standard web map scheme (Web Mercator, 256 px tiles, y counted
+from the north), and the map loads only the tiles in view through a local tile layer:
+1. Every point is binned to its pixel at MAX_ZOOM, and count and quality sum are
+   added up per pixel with a hash group-by. Chunks (or files) are binned one at a
+   time; their per-pixel sums are collected and added up every COMBINE_EVERY chunks,
+   so the running table is not regrouped for every chunk.
+2. Each coarser zoom level is computed from the per-pixel sums of the next finer
+   level (2x2 pixels -> 1 pixel) without touching the points again.
+3. Every occupied tile is rendered from the pixel sums in and around it (so the
+   smoothing does not show tile seams): the colour is the mean quality, the opacity
+   grows with the logarithm of the point density. Tiles without points are not written.
+
+Generation is O(n) for the binning plus the number of occupied tiles; viewing
+cost depends only on the viewport. The number of occupied tiles grows about 4x
+per zoom level for widely spread data, so the finest levels are dropped until the
+whole pyramid has at most MAX_TILES tiles (the map scales the finest written level
+up). The pyramid is written to a temporary folder and then replaces out_dir, so a
+rebuild with fewer tiles or levels leaves no stale tiles behind.
+
+Functions:
+- lonlat_to_pixel: global pixel coordinates of points at a zoom level.
+- pixel_sums / combine / coarsen: per-pixel count and quality sum.
+- tile_counts: number of occupied tiles per zoom level.
+- render_tiles: write the PNG tiles of one zoom level.
+- build_pyramid: bin chunks of points and write all zoom levels plus tiles.json.
+- add_tile_layer: add the tiles (and a colour legend) to a Folium map.
+"""
+
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import matplotlib
+import matplotlib.pyplot as plt
+import folium
+import branca.colormap
+from scipy.ndimage import gaussian_filter
+
+TILE_SIZE = 256  # Tile width and height in pixels
+MIN_ZOOM = 4  # Coarsest zoom level written
+MAX_ZOOM = 12  # Finest zoom level written (the map scales these tiles up beyond it)
+MAX_TILES = 4096  # Max. tiles of the whole pyramid (finer levels are dropped beyond it; None = no limit)
+BLUR_PX = 1.5  # Gaussian smoothing radius (sigma) in pixels
+MIN_OPACITY = 0.3  # Opacity of the sparsest pixels (as min_opacity of HeatMap)
+CMAP = 'RdYlGn'  # Colour map of the mean quality (red = poor)
+PNG_COMPRESS_LEVEL = 1  # zlib level of the tiles (fast; the smooth tiles compress well anyway)
+MAX_LAT = 85.0511287798  # Latitude limit of Web Mercator
+COMBINE_EVERY = 32  # Chunks whose per-pixel sums are collected before they are added to the running sums
+
+SUM_COLUMNS = ['n', 'quality_sum']
+
+
+# Global pixel coordinates (x east, y south, int64) of points at zoom level `zoom`
+def lonlat_to_pixel(lat, lon, zoom):
+    lat = np.radians(np.clip(np.asarray(lat, dtype=np.float64), -MAX_LAT, MAX_LAT))
+    lon = np.asarray(lon, dtype=np.float64)
+    size = TILE_SIZE * 2 ** zoom
+    x = (lon + 180) / 360 * size
+    y = (1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / np.pi) / 2 * size
+    return np.clip(np.floor(x), 0, size - 1).astype(np.int64), np.clip(np.floor(y), 0, size - 1).astype(np.int64)
+
+
+# Per-pixel count and quality sum of one chunk of points; index = (x << 32) | y
+def pixel_sums(lat, lon, quality, zoom=MAX_ZOOM):
+    quality = np.asarray(quality, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    valid = ~(np.isnan(lat) | np.isnan(lon) | np.isnan(quality))
+    x, y = lonlat_to_pixel(lat[valid], lon[valid], zoom)
+    df = pd.DataFrame({'pixel': (x << 32) | y, 'n': np.int64(1), 'quality_sum': quality[valid]})
+    return df.groupby('pixel', sort=False)[SUM_COLUMNS].sum()
+
+
+# Add up the per-pixel sums of several chunks or files
+def combine(frames):
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return pd.DataFrame(columns=SUM_COLUMNS, index=pd.Index([], dtype=np.int64, name='pixel'))
+    return pd.concat(frames).groupby(level=0, sort=False)[SUM_COLUMNS].sum()
+
+
+# Per-pixel sums of the next coarser zoom level
+def coarsen(sums):
+    key = sums.index.to_numpy(dtype=np.int64)
+    parent = ((key >> 33) << 32) | ((key & 0xFFFFFFFF) >> 1)
+    return sums.groupby(parent, sort=False)[SUM_COLUMNS].sum().rename_axis('pixel')
+
+
+# Number of occupied tiles of every zoom level from min_zoom to the zoom of `sums`
+def tile_counts(sums, min_zoom, max_zoom):
+    key = sums.index.to_numpy(dtype=np.int64)
+    tiles = np.unique(((key >> 32) // TILE_SIZE << 32) | ((key & 0xFFFFFFFF) // TILE_SIZE))
+    counts = {}
+    for zoom in range(max_zoom, min_zoom - 1, -1):
+        counts[zoom] = len(tiles)
+        tiles = np.unique(((tiles >> 33) << 32) | ((tiles & 0xFFFFFFFF) >> 1))
+    return counts
+
+
+# Write the PNG tiles of one zoom level to out_dir/zoom/x/y.png; returns the number of tiles
+def render_tiles(sums, zoom, out_dir, vmin, vmax, blur=BLUR_PX, cmap=CMAP):
+    key = sums.index.to_numpy(dtype=np.int64)
+    px, py = key >> 32, key & 0xFFFFFFFF
+    n = sums['n'].to_numpy(dtype=np.float64)
+    q = sums['quality_sum'].to_numpy(dtype=np.float64)
+    margin = int(np.ceil(3 * blur))
+    side = TILE_SIZE + 2 * margin
+    n_tiles = 2 ** zoom
+
+    # Every pixel goes to its own tile and, if it lies within `margin` of an edge, to the neighbouring tiles
+    parts = []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            tx, ty = px // TILE_SIZE + dx, py // TILE_SIZE + dy
+            lx, ly = px - tx * TILE_SIZE + margin, py - ty * TILE_SIZE + margin
+            keep = (lx >= 0) & (lx < side) & (ly >= 0) & (ly < side) & (tx >= 0) & (tx < n_tiles) & (ty >= 0) & (ty < n_tiles)
+            own = np.zeros(len(px), dtype=bool) if (dx or dy) else np.ones(len(px), dtype=bool)
+            parts.append((tx[keep], ty[keep], ly[keep] * side + lx[keep], n[keep], q[keep], own[keep]))
+    tx, ty, local, n, q, own = (np.concatenate(c) for c in zip(*parts))
+
+    # Only tiles that contain points of their own are rendered
+    tile = tx * n_tiles + ty
+    occupied = np.isin(tile, np.unique(tile[own]))
+    tile, local, n, q = tile[occupied], local[occupied], n[occupied], q[occupied]
+    order = np.argsort(tile, kind='stable')
+    tile, local, n, q = tile[order], local[order], n[order], q[order]
+    bounds = np.flatnonzero(np.r_[True, tile[1:] != tile[:-1], True])
+
+    # Opacity scale: log density relative to the 99th percentile pixel of this level
+    n_ref = np.log1p(np.percentile(sums['n'].to_numpy(), 99)) if len(sums) else 1
+    colors = matplotlib.colormaps[cmap]
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        count = np.bincount(local[start:end], weights=n[start:end], minlength=side * side).reshape(side, side)
+        total = np.bincount(local[start:end], weights=q[start:end], minlength=side * side).reshape(side, side)
+        count = gaussian_filter(count.astype(np.float32), blur)[margin:-margin, margin:-margin]
+        total = gaussian_filter(total.astype(np.float32), blur)[margin:-margin, margin:-margin]
+        visible = count > 1e-3
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(visible, total / count, vmin)
+        rgba = colors(np.clip((mean - vmin) / max(vmax - vmin, 1e-12), 0, 1))
+        alpha = MIN_OPACITY + (1 - MIN_OPACITY) * np.clip(np.log1p(count) / max(n_ref, 1e-12), 0, 1)
+        rgba[..., 3] = np.where(visible, alpha, 0)
+        x, y = divmod(int(tile[start]), n_tiles)
+        os.makedirs(os.path.join(out_dir, str(zoom), str(x)), exist_ok=True)
+        plt.imsave(os.path.join(out_dir, str(zoom), str(x), f"{y}.png"), rgba,
+                   pil_kwargs={'compress_level': PNG_COMPRESS_LEVEL})
+    return len(bounds) - 1
+
+
+# Bin chunks of (lat, lon, quality) and write the tiles of all zoom levels; returns the pyramid metadata
+def build_pyramid(chunks, out_dir, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, vmin=None, vmax=None, max_tiles=MAX_TILES):
+    # out_dir is replaced as a whole: refuse to delete a folder that is not a tile pyramid
+    if os.path.isdir(out_dir) and os.listdir(out_dir) and not os.path.exists(os.path.join(out_dir, 'tiles.json')):
+        raise ValueError(f"{out_dir} is not empty and holds no tile pyramid (tiles.json)")
+
+    # Per-chunk sums are collected and added up in batches (one group-by per COMBINE_EVERY chunks)
+    sums, pending = combine([]), []
+    for lat, lon, quality in chunks:
+        pending.append(pixel_sums(lat, lon, quality, max_zoom))
+        if len(pending) >= COMBINE_EVERY:
+            sums, pending = combine([sums] + pending), []
+    sums = combine([sums] + pending)
+
+    # Drop the finest levels while the pyramid has more than max_tiles tiles
+    if max_tiles is not None:
+        counts = tile_counts(sums, min_zoom, max_zoom)
+        while max_zoom > min_zoom and sum(counts[z] for z in range(min_zoom, max_zoom + 1)) > max_tiles:
+            sums = coarsen(sums)
+            max_zoom -= 1
+
+    # Fixed colour range for all levels: 2nd to 98th percentile of the pixel means
+    means = (sums['quality_sum'] / sums['n']).to_numpy()
+    if vmin is None:
+        vmin = float(np.percentile(means, 2)) if len(means) else 0.0
+    if vmax is None:
+        vmax = float(np.percentile(means, 98)) if len(means) else 1.0
+
+    # Build into a temporary folder next to out_dir, then swap it in
+    build_dir = out_dir.rstrip('/\\') + '.building'
+    if os.path.exists(build_dir):
+        shutil.rmtree(build_dir)
+    os.makedirs(build_dir)
+
+    meta = {'min_zoom': min_zoom, 'max_zoom': max_zoom, 'tile_size': TILE_SIZE, 'vmin': vmin, 'vmax': vmax,
+            'cmap': CMAP, 'n_points': int(sums['n'].sum()), 'tiles': {}}
+    for zoom in range(max_zoom, min_zoom - 1, -1):
+        meta['tiles'][zoom] = render_tiles(sums, zoom, build_dir, vmin, vmax)
+        if zoom > min_zoom:
+            sums = coarsen(sums)
+
+    # Data bounds (south-west, north-east), so the map requests no tiles outside them
+    if len(sums):
+        key = sums.index.to_numpy(dtype=np.int64)
+        size = TILE_SIZE * 2 ** min_zoom
+        x = np.array([(key >> 32).min(), (key >> 32).max() + 1])
+        y = np.array([(key & 0xFFFFFFFF).max() + 1, (key & 0xFFFFFFFF).min()])
+        lon = x / size * 360 - 180
+        lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * y / size))))
+        meta['bounds'] = [[float(lat[0]), float(lon[0])], [float(lat[1]), float(lon[1])]]
+    with open(os.path.join(build_dir, 'tiles.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.replace(build_dir, out_dir)
+    return meta
+
+
+# Add the tile layer of a pyramid and its colour legend to a Folium map saved at html_path
+def add_tile_layer(m, tile_dir, html_path, name='signal quality'):
+    with open(os.path.join(tile_dir, 'tiles.json')) as f:
+        meta = json.load(f)
+    # Tile URLs relative to the HTML file, so map and tiles can be moved together
+    url = os.path.relpath(tile_dir, os.path.dirname(os.path.abspath(html_path))).replace(os.sep, '/')
+    options = {'bounds': meta['bounds']} if 'bounds' in meta else {}
+    folium.TileLayer(tiles=url + '/{z}/{x}/{y}.png', attr='GNSS signal quality', name=name, overlay=True,
+                     min_zoom=0, max_zoom=18, min_native_zoom=meta['min_zoom'],
+                     max_native_zoom=meta['max_zoom'], **options).add_to(m)
+    colors = matplotlib.colormaps[meta['cmap']](np.linspace(0, 1, 9))
+    branca.colormap.LinearColormap([matplotlib.colors.to_hex(c) for c in colors], vmin=meta['vmin'],
+                                   vmax=meta['vmax'], caption=name).add_to(m)
+    return m